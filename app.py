@@ -1,16 +1,29 @@
 # Enhanced app.py with filtering, last updated tracking, and quality of life improvements
 
-from flask import Flask, render_template, jsonify, request, send_file, url_for
+from flask import Flask, Response, make_response, render_template, jsonify, request, send_file, url_for
+import itertools
 import json
 import logging
 from utils.update_data import update_data
-import qrcode
-from qrcode.image.pil import PilImage
-import io
+from utils.basket import DEFAULT_MAX_STORES, optimize_basket
+from utils.catalog import FlyerCatalog
+from utils.flyer_db import FlyerDatabase, create_flyer_storage
+from utils.http_cache import conditional_response, json_body, response_cache, streaming_response
+from utils.jobs import JobRunner, sse_stream
+from utils.flyer_store import item_key
+from utils.price_history import HISTORY_FILE, PriceHistory
+from utils.prices import price_parser_stats
+from utils.qr_codes import QR_FORMATS, qr_renderer
+from utils.qr_lists import QR_LIST_TTL_SECONDS, ListTooLarge, create_list_store, start_sweeper
+from utils.shopping_list import InvalidOperation, ItemNotFound
+from utils.shopping_lists import (DEFAULT_LIST, LIST_TOKEN_COOKIE, LIST_TOKEN_HEADER, LIST_TOKEN_MAX_AGE,
+                                  ShoppingListService, new_token, valid_list_name, valid_token)
+from utils.statistics import DEFAULT_PRICE_RANGE_BOUNDS, DEFAULT_SAVINGS_RANGE_BOUNDS, parse_bounds
+from utils.pagination import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorError, decode_cursor, encode_cursor,
+                              parse_fields, project, query_fingerprint)
 import os
 import uuid
-import base64
-from datetime import datetime, timedelta
+from datetime import datetime
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
@@ -20,307 +33,413 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 DATA_FOLDER = 'data'
 os.makedirs(DATA_FOLDER, exist_ok=True)
 
-# Temporary in-memory storage for shopping lists linked to QR codes with TTL
-qr_lists_db = {}  # {list_id: {'content': list_content, 'expiry': datetime}}
-
-
-def cleanup_expired_qr_lists():
-    now = datetime.now()
-    to_remove = [list_id for list_id, data in qr_lists_db.items() if data['expiry'] < now]
-    for list_id in to_remove:
-        del qr_lists_db[list_id]
-    logging.info(f"Cleaned up {len(to_remove)} expired QR lists.")
-
-
-def load_flyer_data():
-    try:
-        with open(os.path.join(DATA_FOLDER, 'flyers.json'), 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        logging.info("flyers.json not found or is empty/corrupted. Initializing with empty data.")
-        return {}
-
-
-def get_last_updated_time():
-    """Get the last modified time of the flyers.json file"""
-    try:
-        file_path = os.path.join(DATA_FOLDER, 'flyers.json')
-        if os.path.exists(file_path):
-            timestamp = os.path.getmtime(file_path)
-            return datetime.fromtimestamp(timestamp)
-    except Exception as e:
-        logging.error(f"Error getting last updated time: {e}")
+# Flyer data lives in SQLite (or JSON segments with FLYER_STORAGE=json)
+flyer_storage = create_flyer_storage(DATA_FOLDER)
+
+# 'memory' answers /api/flyers from the in-memory columns; 'sql' pushes filters,
+# sorting and paging down into the SQLite database instead
+QUERY_ENGINE = os.environ.get('FLYER_QUERY_ENGINE', 'memory')
+sql_queries = QUERY_ENGINE == 'sql' and isinstance(flyer_storage, FlyerDatabase)
+# Items per chunk written by streamed /api/flyers responses
+STREAM_CHUNK_ITEMS = 200
+
+# Enhanced flyer data is kept in memory; changed store segments are patched in when the manifest changes
+flyer_catalog = FlyerCatalog(
+    flyer_storage,
+    price_bounds=parse_bounds(os.environ.get('PRICE_RANGE_BOUNDS'), DEFAULT_PRICE_RANGE_BOUNDS),
+    savings_bounds=parse_bounds(os.environ.get('SAVINGS_RANGE_BOUNDS'), DEFAULT_SAVINGS_RANGE_BOUNDS),
+)
+# Daily price points of every item, appended by each update run
+price_history = PriceHistory(os.path.join(DATA_FOLDER, HISTORY_FILE))
+
+# Cached response bodies belong to the previous catalog version once it reloads
+flyer_catalog.add_reload_listener(lambda snapshot: response_cache.invalidate())
+
+# Shopping lists per user token (cookie or X-List-Token header), each journaled in its own files;
+# requests without a token share the original data/shopping_list.json
+shopping_lists = ShoppingListService(DATA_FOLDER)
+
+# Shopping lists shared through QR codes, with a TTL; SQLite by default so any worker can serve them
+qr_lists = create_list_store(DATA_FOLDER)
+start_sweeper(qr_lists)
+
+
+def get_last_updated_time(snapshot):
+    """Get the last modified time of the flyer data backing a catalog snapshot"""
+    if snapshot.mtime:
+        return datetime.fromtimestamp(snapshot.mtime)
     return None
 
 
-def calculate_savings_percentage(original_price, sale_price):
-    """Calculate savings percentage between original and sale price"""
-    try:
-        # Extract numeric values from price strings
-        original = float(''.join(filter(lambda x: x.isdigit() or x == '.', str(original_price))))
-        sale = float(''.join(filter(lambda x: x.isdigit() or x == '.', str(sale_price))))
-
-        if original > 0 and sale < original:
-            return round(((original - sale) / original) * 100, 1)
-    except (ValueError, TypeError):
-        pass
-    return 0
-
-
-def enhance_flyer_data(flyers_data):
-    """Add computed fields to flyer data for filtering"""
-    enhanced_data = {}
-
-    for store, items in flyers_data.items():
-        enhanced_items = []
-        for item in items:
-            enhanced_item = item.copy()
-
-            # Determine if item is on sale
-            has_original = item.get('original_price') and item.get('original_price') != 'N/A'
-            has_sale = item.get('price') and item.get('price') != 'N/A'
-            enhanced_item['on_sale'] = has_original and has_sale and item['original_price'] != item['price']
+def request_list_token():
+    return request.headers.get(LIST_TOKEN_HEADER) or request.cookies.get(LIST_TOKEN_COOKIE)
 
-            # Calculate savings percentage
-            if enhanced_item['on_sale']:
-                enhanced_item['savings_percentage'] = calculate_savings_percentage(
-                    item.get('original_price'), item.get('price')
-                )
-            else:
-                enhanced_item['savings_percentage'] = 0
 
-            # Extract numeric price for range filtering
-            try:
-                price_str = item.get('price', '0')
-                if price_str and price_str != 'N/A':
-                    enhanced_item['numeric_price'] = float(
-                        ''.join(filter(lambda x: x.isdigit() or x == '.', str(price_str))))
-                else:
-                    enhanced_item['numeric_price'] = 0
-            except (ValueError, TypeError):
-                enhanced_item['numeric_price'] = 0
-
-            enhanced_items.append(enhanced_item)
-
-        enhanced_data[store] = enhanced_items
-
-    return enhanced_data
-
-
-def save_shopping_list(shopping_list):
-    with open(os.path.join(DATA_FOLDER, 'shopping_list.json'), 'w', encoding='utf-8') as f:
-        json.dump(shopping_list, f, indent=2)
-
-
-def load_shopping_list():
-    try:
-        with open(os.path.join(DATA_FOLDER, 'shopping_list.json'), 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        logging.info("shopping_list.json not found. Starting with an empty list.")
-        return []
+def current_shopping_list():
+    """Return (store, None) for the requesting user's list, or (None, error response)"""
+    token = request_list_token()
+    if token is not None and not valid_token(token):
+        return None, (jsonify({"error": "Invalid list token."}), 400)
+    list_name = request.args.get('list', DEFAULT_LIST)
+    if not valid_list_name(list_name):
+        return None, (jsonify({"error": "List names may only contain letters, digits, '-' and '_'."}), 400)
+    return shopping_lists.get(token, list_name), None
 
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    response = make_response(render_template('index.html'))
+    # Each browser gets its own shopping lists
+    if not valid_token(request.cookies.get(LIST_TOKEN_COOKIE)):
+        response.set_cookie(LIST_TOKEN_COOKIE, new_token(), max_age=LIST_TOKEN_MAX_AGE, httponly=True,
+                            samesite='Lax')
+    return response
 
 
 # New route to serve the standalone shopping list page
 @app.route('/list-page/<string:list_id>')
 def list_page(list_id):
-    cleanup_expired_qr_lists()
-    list_data = qr_lists_db.get(list_id)
-    if list_data:
-        return render_template('qr_list_page.html', list_content=list_data['content'])
+    list_content = qr_lists.get(list_id)
+    if list_content:
+        return render_template('qr_list_page.html', list_content=list_content)
     else:
         return "Shopping list not found or has expired.", 404
 
 
 @app.route('/api/flyers')
 def get_flyers():
-    flyers_data = load_flyer_data()
-    enhanced_data = enhance_flyer_data(flyers_data)
-
     # Get filter parameters
     search_query = request.args.get('search', '').lower()
     sale_filter = request.args.get('sale_filter', 'all')  # all, on_sale, not_on_sale
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
     min_savings = request.args.get('min_savings', type=float, default=0)
-    sort_by = request.args.get('sort_by', 'name')  # name, price, savings
+    sort_by = request.args.get('sort_by', 'name')  # name, price, savings, unit_price
     sort_order = request.args.get('sort_order', 'asc')  # asc, desc
+    # Unit prices are per 100 g, per 100 ml or per item; filter on one basis to compare like with like
+    unit_basis = request.args.get('unit_basis') or None  # 100g, 100ml, each
+    min_unit_price = request.args.get('min_unit_price', type=float)
+    max_unit_price = request.args.get('max_unit_price', type=float)
 
     # NEW: Add store filter
     store_filter = request.args.get('store')
 
-    filtered_data = {
-        "galleria": [],
-        "tnt_supermarket": [],
-        "foodbasics": [],
-        "nofrills": []
-    }
-
-    for store, items in enhanced_data.items():
-        filtered_items = []
-
-        for item in items:
-            # Apply filters
-            if search_query and search_query not in item.get('name', '').lower():
+    # Pagination and field projection; without page/page_size/cursor the
+    # full per-store lists are returned as before
+    fields = parse_fields(request.args.get('fields'))
+    cursor = request.args.get('cursor')
+    paginated = cursor is not None or 'page' in request.args or 'page_size' in request.args
+    page = max(request.args.get('page', type=int, default=1), 1)
+    page_size = min(max(request.args.get('page_size', type=int, default=DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    # stream=1 writes the body incrementally instead of building (and caching) it whole
+    stream_body = request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+    fingerprint = query_fingerprint(search_query, sale_filter, min_price, max_price, min_savings, sort_by, sort_order,
+                                    unit_basis, min_unit_price, max_unit_price)
+
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+        except CursorError as e:
+            return jsonify({"error": str(e)}), 400
+        if position['fingerprint'] != fingerprint:
+            return jsonify({"error": "Cursor does not match the current filters."}), 400
+        # Keep paging through the snapshot the cursor was issued for
+        snapshot = flyer_catalog.get_version(position['version'])
+        if snapshot is None:
+            return jsonify({"error": "Cursor has expired. Please reload the first page."}), 410
+        store_filter = position['store']
+        offset = position['offset']
+    else:
+        snapshot = flyer_catalog.get()
+        offset = (page - 1) * page_size
+
+    def selected_stores():
+        stores = ["galleria", "tnt_supermarket", "foodbasics", "nofrills"]
+        stores += [store for store in snapshot.data if store not in stores]
+
+        # NEW: Apply store filter up front so other stores are never queried
+        if store_filter and store_filter != 'all':
+            return [store_filter] if store_filter in stores else []
+        # else: keep all stores for 'all' or no filter
+        return stores
+
+    def build():
+        filtered_data = {store: [] for store in selected_stores()}
+
+        # Filtering and sorting run on the catalog's columnar arrays (or in SQL);
+        # dicts are only built for the rows that are returned
+        for store in filtered_data:
+            result = None
+            if sql_queries and snapshot.file_key is not None:
+                result = flyer_storage.query(store, search_query, sale_filter, min_price, max_price, min_savings,
+                                             sort_by, sort_order, limit=page_size if paginated else None,
+                                             offset=offset if paginated else 0, stat_key=snapshot.file_key,
+                                             unit_basis=unit_basis, min_unit_price=min_unit_price,
+                                             max_unit_price=max_unit_price)
+            if result is not None:
+                total, items = result
+                items = [project(item, fields) for item in items]
+                if not paginated:
+                    filtered_data[store] = items
+                    continue
+                next_offset = offset + len(items)
+                filtered_data[store] = {
+                    'items': items,
+                    'total': total,
+                    'offset': offset,
+                    'page_size': page_size,
+                    'next_cursor': encode_cursor(snapshot.version, store, next_offset, fingerprint)
+                    if next_offset < total else None,
+                }
                 continue
 
-            if sale_filter == 'on_sale' and not item.get('on_sale'):
-                continue
-            elif sale_filter == 'not_on_sale' and item.get('on_sale'):
+            # The database moved on (or isn't in use), so answer from the snapshot itself
+            rows = snapshot.query(store, search_query, sale_filter, min_price, max_price,
+                                  min_savings, sort_by, sort_order, unit_basis, min_unit_price, max_unit_price)
+            if not paginated:
+                filtered_data[store] = [project(snapshot.item(store, row), fields) for row in rows]
                 continue
 
-            if min_price is not None and item.get('numeric_price', 0) < min_price:
+            page_rows = rows[offset:offset + page_size]
+            next_offset = offset + len(page_rows)
+            filtered_data[store] = {
+                'items': [project(snapshot.item(store, row), fields) for row in page_rows],
+                'total': len(rows),
+                'offset': offset,
+                'page_size': page_size,
+                'next_cursor': encode_cursor(snapshot.version, store, next_offset, fingerprint)
+                if next_offset < len(rows) else None,
+            }
+
+        return filtered_data
+
+    def stream():
+        # Same bytes as json_body(build()), written store by store from the snapshot's encoded items
+        yield b'{'
+        for position, store in enumerate(sorted(selected_stores())):
+            rows = snapshot.query(store, search_query, sale_filter, min_price, max_price,
+                                  min_savings, sort_by, sort_order, unit_basis, min_unit_price, max_unit_price)
+            if paginated:
+                total = len(rows)
+                rows = rows[offset:offset + page_size]
+            yield (b',' if position else b'') + json.dumps(store, ensure_ascii=False).encode('utf-8') + \
+                (b':{"items":[' if paginated else b':[')
+            fragments = snapshot.encoded_items(store, rows, fields)
+            separator = b''
+            while True:
+                chunk = list(itertools.islice(fragments, STREAM_CHUNK_ITEMS))
+                if not chunk:
+                    break
+                yield separator + b','.join(chunk)
+                separator = b','
+            if not paginated:
+                yield b']'
                 continue
+            next_offset = offset + len(rows)
+            next_cursor = encode_cursor(snapshot.version, store, next_offset, fingerprint) \
+                if next_offset < total else None
+            yield (f'],"next_cursor":{json.dumps(next_cursor)},"offset":{offset},'
+                   f'"page_size":{page_size},"total":{total}}}').encode('utf-8')
+        yield b'}'
+
+    # Normalized parameters: equivalent requests share one ETag and cached body
+    cache_key = (search_query, sale_filter, min_price, max_price, min_savings, sort_by, sort_order,
+                 unit_basis, min_unit_price, max_unit_price, store_filter if store_filter != 'all' else None,
+                 fields, paginated and (offset, page_size))
+    if stream_body:
+        return streaming_response(snapshot.version, cache_key, stream)
+    return conditional_response(snapshot.version, cache_key, lambda: json_body(build()))
+
+
+@app.route('/api/export/flyers.json')
+def export_flyers():
+    """The raw scraped data of every store, in the legacy flyers.json format"""
+    snapshot = flyer_catalog.get()
+    return conditional_response(snapshot.version, 'export', lambda: json_body(snapshot.data),
+                                last_modified=snapshot.mtime)
+
+
+@app.route('/api/compare')
+def compare_products():
+    """Equivalent products across stores with the cheapest offer of each group"""
+    search_query = request.args.get('search', '').lower()
+    min_stores = max(request.args.get('min_stores', type=int, default=2), 1)
+    limit = min(max(request.args.get('limit', type=int, default=DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    snapshot = flyer_catalog.get()
 
-            if max_price is not None and item.get('numeric_price', 0) > max_price:
-                continue
+    def build():
+        groups = snapshot.compare(search_query, min_stores)
+        return json_body({'total': len(groups), 'groups': groups[:limit]})
 
-            if item.get('savings_percentage', 0) < min_savings:
-                continue
+    return conditional_response(snapshot.version, ('compare', search_query, min_stores, limit), build)
 
-            filtered_items.append(item)
 
-        # Apply sorting
-        if sort_by == 'price':
-            filtered_items.sort(key=lambda x: x.get('numeric_price', 0), reverse=(sort_order == 'desc'))
-        elif sort_by == 'savings':
-            filtered_items.sort(key=lambda x: x.get('savings_percentage', 0), reverse=(sort_order == 'desc'))
-        else:  # sort by name
-            filtered_items.sort(key=lambda x: x.get('name', '').lower(), reverse=(sort_order == 'desc'))
+@app.route('/api/price-history')
+def get_price_history():
+    """
+    Price series of one item with its all-time low and real discount vs the 30-day median.
 
-        filtered_data[store] = filtered_items
+    The item is identified by store plus either `key` or `name` (optionally
+    narrowed by `unit` and `image_url`, which together form the key).
+    """
+    store = request.args.get('store')
+    key = request.args.get('key')
+    name = request.args.get('name')
+    if not store or not (key or name):
+        return jsonify({"error": "store and either key or name are required."}), 400
+    if key is None and ('unit' in request.args or 'image_url' in request.args):
+        key = item_key(request.args)
+        name = None
 
-    # NEW: Apply store filter after per-store filtering/sorting
-    if store_filter and store_filter != 'all':
-        if store_filter in filtered_data:
-            filtered_data = {store_filter: filtered_data[store_filter]}
-        else:
-            filtered_data = {}
-    # else: keep all stores for 'all' or no filter
+    since = None
+    if request.args.get('since'):
+        try:
+            since = datetime.strptime(request.args['since'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({"error": "since must be a YYYY-MM-DD date."}), 400
 
-    return jsonify(filtered_data)
+    items = price_history.item_history(store, key=key, name=name, since=since)
+    if not items:
+        return jsonify({"error": "No price history for this item."}), 404
+    return jsonify({'store': store, 'items': items})
+
+
+@app.route('/api/price-history/<string:store>/summary')
+def get_price_history_summary(store):
+    """All-time low and real discount of every item in a store's latest run, keyed by item key"""
+    return jsonify({'store': store, 'items': price_history.store_summaries(store)})
 
 
 @app.route('/api/last-updated')
 def get_last_updated():
-    """Return the last updated timestamp"""
-    last_updated = get_last_updated_time()  # Call the helper function with different name
-    if last_updated:
-        return jsonify({
-            'last_updated': last_updated.isoformat(),
-            'human_readable': last_updated.strftime('%Y-%m-%d %I:%M %p')
-        })
-    return jsonify({'last_updated': None, 'human_readable': 'Never'})
+    """
+    Return when the flyer data last changed and when it was last checked.
+
+    A refresh that finds the same flyers doesn't change last_updated, but
+    still moves last_checked; data saved before checks were recorded
+    reports its last update as its last check.
+    """
+    snapshot = flyer_catalog.get()
+    last_updated = get_last_updated_time(snapshot)
+    last_checked = flyer_storage.last_checked() or last_updated
+
+    def build():
+        if last_updated:
+            return json_body({
+                'last_updated': last_updated.isoformat(),
+                'human_readable': last_updated.strftime('%Y-%m-%d %I:%M %p'),
+                'last_checked': last_checked.isoformat(),
+                'checked_human_readable': last_checked.strftime('%Y-%m-%d %I:%M %p'),
+            })
+        return json_body({'last_updated': None, 'human_readable': 'Never',
+                          'last_checked': None, 'checked_human_readable': 'Never'})
+
+    checked_at = last_checked.timestamp() if last_checked else None
+    last_modified = max(snapshot.mtime, checked_at) if snapshot.mtime and checked_at else snapshot.mtime
+    return conditional_response(snapshot.version, f'last-updated-{checked_at}', build, last_modified=last_modified)
 
 
 @app.route('/api/statistics')
 def get_statistics():
     """Return statistics about the current flyer data"""
-    flyers_data = load_flyer_data()
-    enhanced_data = enhance_flyer_data(flyers_data)
-
-    stats = {
-        'total_items': 0,
-        'items_on_sale': 0,
-        'average_savings': 0,
-        'stores': {},
-        'price_ranges': {
-            'under_5': 0,
-            '5_to_10': 0,
-            '10_to_20': 0,
-            'over_20': 0
-        }
-    }
-
-    total_savings = 0
-    sale_items = 0
-
-    for store, items in enhanced_data.items():
-        store_stats = {
-            'total': len(items),
-            'on_sale': sum(1 for item in items if item.get('on_sale')),
-            'avg_price': 0
-        }
-
-        total_price = 0
-        valid_prices = 0
-
-        for item in items:
-            stats['total_items'] += 1
-
-            if item.get('on_sale'):
-                stats['items_on_sale'] += 1
-                total_savings += item.get('savings_percentage', 0)
-                sale_items += 1
-
-            price = item.get('numeric_price', 0)
-            if price > 0:
-                total_price += price
-                valid_prices += 1
-
-                # Price range categorization
-                if price < 5:
-                    stats['price_ranges']['under_5'] += 1
-                elif price < 10:
-                    stats['price_ranges']['5_to_10'] += 1
-                elif price < 20:
-                    stats['price_ranges']['10_to_20'] += 1
-                else:
-                    stats['price_ranges']['over_20'] += 1
+    snapshot = flyer_catalog.get()
+    statistics = snapshot.statistics
 
-        if valid_prices > 0:
-            store_stats['avg_price'] = round(total_price / valid_prices, 2)
+    # Aggregates are computed once per catalog version; clients revalidate with If-None-Match
+    return conditional_response(snapshot.version, statistics.etag, lambda: statistics.body)
 
-        stats['stores'][store] = store_stats
 
-    if sale_items > 0:
-        stats['average_savings'] = round(total_savings / sale_items, 1)
+@app.route('/api/metrics')
+def get_metrics():
+    """Return in-process counters for the flyer catalog, response cache, price parser and QR lists/codes"""
+    return jsonify({'catalog': flyer_catalog.stats(), 'response_cache': response_cache.stats(),
+                    'price_parser': price_parser_stats(), 'qr_lists': qr_lists.stats(),
+                    'qr_codes': qr_renderer.stats(), 'shopping_lists': shopping_lists.stats()})
 
-    return jsonify(stats)
 
-
-@app.route('/api/shopping-list', methods=['GET', 'POST', 'DELETE'])
+@app.route('/api/shopping-list', methods=['GET', 'POST', 'DELETE', 'PATCH'])
 def manage_shopping_list():
-    shopping_list = load_shopping_list()
+    shopping_list, error = current_shopping_list()
+    if error:
+        return error
 
     if request.method == 'POST':
         new_shopping_list = request.get_json(silent=True)
         if isinstance(new_shopping_list, list):
-            save_shopping_list(new_shopping_list)
-            return jsonify(new_shopping_list), 200
+            return jsonify(shopping_list.apply({'op': 'replace', 'items': new_shopping_list})), 200
         else:
             logging.error("Invalid data format for POST. Expected a list.")
             return jsonify({"error": "Invalid data format. Expected a list."}), 400
 
     elif request.method == 'DELETE':
-        item_id_to_delete = request.json.get('id')
+        item_id_to_delete = (request.get_json(silent=True) or {}).get('id')
 
         if not item_id_to_delete:
             return jsonify({"error": "Item ID not provided for deletion."}), 400
 
-        original_list_length = len(shopping_list)
-        shopping_list = [item for item in shopping_list if item.get('id') != item_id_to_delete]
-
-        if len(shopping_list) < original_list_length:
-            save_shopping_list(shopping_list)
-            return jsonify({"message": "Item removed successfully."}), 200
-        else:
+        try:
+            shopping_list.apply({'op': 'remove', 'id': item_id_to_delete})
+        except ItemNotFound:
+            return jsonify({"error": "Item not found."}), 404
+        return jsonify({"message": "Item removed successfully."}), 200
+
+    elif request.method == 'PATCH':
+        # One operation or a list of them, applied all-or-nothing:
+        # {"op": "add", "item": {...}}, {"op": "remove", "id": ...}, {"op": "update", "id": ..., "fields": {...}}
+        try:
+            return jsonify(shopping_list.apply(request.get_json(silent=True))), 200
+        except InvalidOperation as e:
+            return jsonify({"error": str(e)}), 400
+        except ItemNotFound:
             return jsonify({"error": "Item not found."}), 404
 
-    return jsonify(shopping_list)
+    return jsonify(shopping_list.items())
 
 
 @app.route('/api/shopping-list/clear', methods=['POST'])
 def clear_shopping_list():
-    save_shopping_list([])
+    shopping_list, error = current_shopping_list()
+    if error:
+        return error
+    shopping_list.apply({'op': 'clear'})
     return jsonify({"message": "Shopping list cleared."}), 200
 
 
+@app.route('/api/shopping-list/summary')
+def shopping_list_summary():
+    """Item and quantity counts of the user's list, for badges; cached until the list changes"""
+    shopping_list, error = current_shopping_list()
+    if error:
+        return error
+    response = jsonify(shopping_list.summary())
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+@app.route('/api/shopping-lists')
+def shopping_list_names():
+    """Names of the requesting user's lists"""
+    token = request_list_token()
+    if not valid_token(token):
+        return jsonify({"error": "A list token is required."}), 400
+    names = shopping_lists.list_names(token)
+    return jsonify({"lists": names if DEFAULT_LIST in names else [DEFAULT_LIST] + names})
+
+
+@app.route('/api/shopping-list/optimize')
+def optimize_shopping_list():
+    """Where the user's list is cheapest today: at a single store and split across at most max_stores stores"""
+    shopping_list, error = current_shopping_list()
+    if error:
+        return error
+    max_stores = request.args.get('max_stores', type=int, default=DEFAULT_MAX_STORES)
+    response = jsonify(optimize_basket(flyer_catalog.get(), shopping_list.items(), max_stores))
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
 @app.route('/api/generate-qr-for-list', methods=['POST'])
 def generate_qr_for_list():
     list_content = request.json.get('listContent')
@@ -329,45 +448,90 @@ def generate_qr_for_list():
 
     # Create a unique ID for this list
     list_id = str(uuid.uuid4())
-    expiry = datetime.now() + timedelta(hours=1)  # 1 hour TTL
-    qr_lists_db[list_id] = {'content': list_content, 'expiry': expiry}
+    try:
+        qr_lists.put(list_id, list_content)  # 1 hour TTL
+    except ListTooLarge as e:
+        return jsonify({"error": str(e)}), 413
 
-    # Generate the URL for the new list page
-    list_url = url_for('list_page', list_id=list_id, _external=True)
+    # Start rendering now so the image is usually cached by the time the browser asks for it
+    qr_renderer.submit(url_for('list_page', list_id=list_id, _external=True), 'png')
 
-    # Generate QR code from the URL
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(list_url)
-    qr.make(fit=True)
+    return jsonify({
+        "qrCode": url_for('qr_code_image', list_id=list_id, fmt='png'),
+        "qrCodeSvg": url_for('qr_code_image', list_id=list_id, fmt='svg'),
+    }), 200
 
-    img = qr.make_image(fill_color="black", back_color="white")
 
-    # Save image to a BytesIO object
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    buffer.seek(0)
+@app.route('/qr/<string:list_id>.<fmt>')
+def qr_code_image(list_id, fmt):
+    """QR code of a shared list's page as PNG or SVG, cached by content hash"""
+    if fmt not in QR_FORMATS:
+        return jsonify({"error": "Format must be png or svg."}), 404
+    if qr_lists.get(list_id) is None:
+        return jsonify({"error": "Shopping list not found or has expired."}), 404
 
-    # Encode the image to base64
-    qr_code_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    qr_code_data_uri = f"data:image/png;base64,{qr_code_base64}"
+    key, image = qr_renderer.render(url_for('list_page', list_id=list_id, _external=True), fmt)
+    response = Response(image, mimetype=QR_FORMATS[fmt])
+    response.set_etag(key)
+    # The image of a list never changes, but stops being served once the list expires
+    response.headers['Cache-Control'] = f'public, max-age={QR_LIST_TTL_SECONDS}'
+    return response.make_conditional(request)
 
-    # Return the data URI as a JSON response
-    return jsonify({"qrCode": qr_code_data_uri}), 200
+
+def run_data_update():
+    """Scrape all stores, then patch the changed segments into the catalog"""
+    diffs = update_data()
+    if diffs is None:
+        raise RuntimeError("Flyer data could not be saved")
+    flyer_catalog.reload()
+    return {store: dict(diff.summary(), changed=diff.changed) for store, diff in diffs.items()}
+
+
+# Scrapes run in the background, one at a time; refresh requests during a run join it
+update_jobs = JobRunner(run_data_update)
+
+
+def job_response(job):
+    return {
+        'job': job.to_dict(),
+        'status_url': url_for('get_update_job', job_id=job.id),
+        'events_url': url_for('stream_update_job', job_id=job.id),
+    }
 
 
-@app.route('/api/update-data', methods=['POST'])
+@app.route('/api/update-data', methods=['GET', 'POST'])
 def update_data_endpoint():
+    if request.method == 'GET':
+        job = update_jobs.current()
+        if job is None:
+            return jsonify({'job': None})
+        return jsonify(job_response(job))
+
+    job, started = update_jobs.start()
+    message = "Data update initiated successfully." if started else "A data update is already running; joined it."
+    return jsonify(dict(job_response(job), message=message)), 202
+
+
+@app.route('/api/update-data/<string:job_id>')
+def get_update_job(job_id):
+    job = update_jobs.get(job_id)
+    if job is None:
+        return jsonify({'message': 'Unknown update job'}), 404
+    return jsonify(job_response(job))
+
+
+@app.route('/api/update-data/<string:job_id>/events')
+def stream_update_job(job_id):
+    """Server-Sent Events stream of a job's per-store and per-page progress"""
+    job = update_jobs.get(job_id)
+    if job is None:
+        return jsonify({'message': 'Unknown update job'}), 404
     try:
-        update_data()
-        return jsonify({"message": "Data update initiated successfully."}), 200
-    except Exception as e:
-        logging.error(f"Error during manual data update: {e}")
-        return jsonify({"message": f"Error updating data: {e}"}), 500
+        last_event_id = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_event_id = 0
+    return Response(sse_stream(job, last_event_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 if __name__ == '__main__':
@@ -46,7 +46,10 @@ document.addEventListener('DOMContentLoaded', async () => {
 
     // State variables
     let allFlyers = {};
+    let storeTotals = {};
+    let nextCursors = {};
     let shoppingList = [];
+    let shoppingListLoaded = false; // only the summary is fetched until the list is opened or edited
     let activeStore = null;
     let debounceTimer;
     let filterDebounceTimer;
@@ -60,6 +63,10 @@ document.addEventListener('DOMContentLoaded', async () => {
         sort_order: 'desc'
     };
 
+    // Flyers are fetched one page at a time; only the fields the UI renders are requested
+    const PAGE_SIZE = 48;
+    const FLYER_FIELDS = 'name,price,original_price,unit,details,amount,image_url,on_sale,savings_percentage,numeric_price,unit_price,unit_basis';
+
     // Helper function to determine sale badge color tier
     function getSaleBadgeTier(savingsPercentage) {
         if (savingsPercentage >= 50) return 'extreme';
@@ -77,6 +84,7 @@ document.addEventListener('DOMContentLoaded', async () => {
 
         if (body && sidebar) {
             body.classList.toggle('shopping-list-open');
+            if (!shoppingListLoaded) fetchShoppingList();
             console.log('Shopping list toggled:', body.classList.contains('shopping-list-open')); // Debug log
         } else {
             console.error('Body or sidebar element not found');
@@ -182,7 +190,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         createFilterPanel();
         createStatsPanel();
         setupEventListeners();
-        await fetchShoppingList();
+        await fetchShoppingListSummary();
         await fetchFlyers();
         updateLastUpdatedIndicator();
 
@@ -231,6 +239,7 @@ document.addEventListener('DOMContentLoaded', async () => {
                             <option value="savings">Savings %</option>
                             <option value="price">Price</option>
                             <option value="name">Product Name</option>
+                            <option value="unit_price">Unit Price</option>
                         </select>
                     </div>
                     <div class="filter-group">
@@ -519,7 +528,8 @@ document.addEventListener('DOMContentLoaded', async () => {
 
         if (!isVisible) {
             try {
-                const response = await fetch('/api/statistics');
+                // no-cache makes the browser revalidate with the stored ETag (304 when unchanged)
+                const response = await fetch('/api/statistics', { cache: 'no-cache' });
                 const stats = await response.json();
 
                 // FIX: Fallback if allFlyers is empty or API fails
@@ -538,21 +548,14 @@ document.addEventListener('DOMContentLoaded', async () => {
                         <div class="stat-value">${stats.average_savings || 0}%</div>
                         <div class="stat-label">Avg Savings</div>
                     </div>
+                    ${(stats.price_range_buckets || []).map(bucket => `
                     <div class="stat-item">
-                        <div class="stat-value">${stats.price_ranges?.under_5 || 0}</div>
-                        <div class="stat-label">Under $5</div>
-                    </div>
-                    <div class="stat-item">
-                        <div class="stat-value">${stats.price_ranges?.['5_to_10'] || 0}</div>
-                        <div class="stat-label">$5 - $10</div>
-                    </div>
-                    <div class="stat-item">
-                        <div class="stat-value">${stats.price_ranges?.['10_to_20'] || 0}</div>
-                        <div class="stat-label">$10 - $20</div>
-                    </div>
+                        <div class="stat-value">${stats.price_ranges?.[bucket.key] || 0}</div>
+                        <div class="stat-label">${formatPriceRange(bucket)}</div>
+                    </div>`).join('')}
                     <div class="stat-item">
-                        <div class="stat-value">${stats.price_ranges?.over_20 || 0}</div>
-                        <div class="stat-label">Over $20</div>
+                        <div class="stat-value">$${stats.price_percentiles?.median || 0}</div>
+                        <div class="stat-label">Median Price</div>
                     </div>
                     <div class="stat-item">
                         <div class="stat-value">${fallbackStores}</div>
@@ -577,6 +580,12 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     }
 
+    function formatPriceRange(bucket) {
+        if (bucket.max === null) return `Over $${bucket.min}`;
+        if (bucket.min === 0) return `Under $${bucket.max}`;
+        return `$${bucket.min} - $${bucket.max}`;
+    }
+
     function animateStatValues(statsGrid) {
         const statValues = statsGrid.querySelectorAll('.stat-value');
         statValues.forEach(statValue => {
@@ -621,25 +630,43 @@ document.addEventListener('DOMContentLoaded', async () => {
         await fetchFlyers();
     }
 
+    function buildFlyerParams() {
+        const params = new URLSearchParams();
+
+        // Add all current filters to params
+        Object.keys(currentFilters).forEach(key => {
+            if (currentFilters[key] !== null && currentFilters[key] !== '') {
+                params.append(key, currentFilters[key]);
+            }
+        });
+
+        params.append('page_size', PAGE_SIZE);
+        params.append('fields', FLYER_FIELDS);
+        return params;
+    }
+
     async function fetchFlyers() {
         showLoadingState(true);
 
         try {
-            const params = new URLSearchParams();
-
-            // Add all current filters to params
-            Object.keys(currentFilters).forEach(key => {
-                if (currentFilters[key] !== null && currentFilters[key] !== '') {
-                    params.append(key, currentFilters[key]);
-                }
-            });
+            const params = buildFlyerParams();
+            params.append('page', 1);
 
             const response = await fetch(`/api/flyers?${params.toString()}`);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            allFlyers = await response.json();
+            const pages = await response.json();
+            allFlyers = {};
+            storeTotals = {};
+            nextCursors = {};
+            Object.keys(pages).forEach(store => {
+                allFlyers[store] = pages[store].items;
+                storeTotals[store] = pages[store].total;
+                nextCursors[store] = pages[store].next_cursor;
+            });
+
             renderTabs();
             const storeToRender = activeStore || Object.keys(allFlyers)[0];
             renderFlyers(storeToRender);
@@ -652,6 +679,62 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     }
 
+    async function loadMoreFlyers(store) {
+        const cursor = nextCursors[store];
+        if (!cursor) return;
+
+        const loadMoreBtn = tabContent.querySelector('.load-more-btn');
+        if (loadMoreBtn) loadMoreBtn.disabled = true;
+
+        try {
+            const params = buildFlyerParams();
+            params.append('cursor', cursor);
+
+            const response = await fetch(`/api/flyers?${params.toString()}`);
+            if (response.status === 410) {
+                // The catalog was refreshed since the first page was loaded
+                await fetchFlyers();
+                return;
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const page = (await response.json())[store];
+            const startIndex = allFlyers[store].length;
+            allFlyers[store] = allFlyers[store].concat(page.items);
+            nextCursors[store] = page.next_cursor;
+
+            const flyerList = tabContent.querySelector('.flyer-list');
+            if (flyerList && activeStore === store) {
+                appendFlyerItems(flyerList, store, page.items, startIndex);
+                updateLoadMoreButton(store);
+            }
+        } catch (error) {
+            console.error('Failed to load more flyers:', error);
+            showNotification('Failed to load more items', 'error');
+            if (loadMoreBtn) loadMoreBtn.disabled = false;
+        }
+    }
+
+    function updateLoadMoreButton(store) {
+        let loadMoreBtn = tabContent.querySelector('.load-more-btn');
+        if (!nextCursors[store]) {
+            if (loadMoreBtn) loadMoreBtn.remove();
+            return;
+        }
+
+        if (!loadMoreBtn) {
+            loadMoreBtn = document.createElement('button');
+            loadMoreBtn.className = 'load-more-btn';
+            loadMoreBtn.addEventListener('click', () => loadMoreFlyers(store));
+            tabContent.appendChild(loadMoreBtn);
+        }
+        const remaining = storeTotals[store] - allFlyers[store].length;
+        loadMoreBtn.disabled = false;
+        loadMoreBtn.innerHTML = `<i class="fa-solid fa-chevron-down"></i> Load more (${remaining} left)`;
+    }
+
     function showLoadingState(loading) {
         if (loading) {
             statusMessage.innerHTML = '<div class="loading-spinner"></div>Loading flyers...';
@@ -677,7 +760,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         storeTabsContainer.innerHTML = '';
 
         Object.keys(allFlyers).forEach((store, index) => {
-            const itemCount = allFlyers[store].length;
+            const itemCount = storeTotals[store] ?? allFlyers[store].length;
             const tabButton = document.createElement('button');
             tabButton.classList.add('tab-button');
             tabButton.innerHTML = `
@@ -728,8 +811,15 @@ document.addEventListener('DOMContentLoaded', async () => {
             return;
         }
 
+        appendFlyerItems(flyerList, store, items, 0);
+        tabContent.appendChild(flyerList);
+        updateLoadMoreButton(store);
+    }
+
+    function appendFlyerItems(flyerList, store, items, startIndex) {
         const fragment = document.createDocumentFragment();
-        items.forEach((item, index) => {
+        items.forEach((item, pageIndex) => {
+            const index = startIndex + pageIndex;
             item.id = `${store}-${item.name.toLowerCase().replace(/[^a-z0-9]+/g, '-')}-${index}`;
             const flyerItem = document.createElement('li');
             flyerItem.classList.add('flyer-item');
@@ -786,11 +876,9 @@ document.addEventListener('DOMContentLoaded', async () => {
             fragment.appendChild(flyerItem);
         });
 
+        // Add staggered animation for the newly added items
+        const flyerItems = Array.from(fragment.children);
         flyerList.appendChild(fragment);
-        tabContent.appendChild(flyerList);
-
-        // Add staggered animation for items
-        const flyerItems = flyerList.querySelectorAll('.flyer-item');
         flyerItems.forEach((item, index) => {
             item.style.opacity = '0';
             item.style.transform = 'translateY(20px)';
@@ -836,9 +924,27 @@ document.addEventListener('DOMContentLoaded', async () => {
             }
         }
 
+        // Skip it when the unit field already shows a price per kg or lb
+        if (item.unit_price != null && !detailsHtml.includes('$')) {
+            const basis = item.unit_basis === 'each' ? 'ea' : item.unit_basis;
+            detailsHtml += `<p class="item-details-info">$${item.unit_price.toFixed(2)}/${basis}</p>`;
+        }
+
         return { mainPriceHtml, strikethroughPriceHtml, detailsHtml };
     }
 
+    function relativeTime(isoTime, humanReadable) {
+        const diffMinutes = Math.floor((new Date() - new Date(isoTime)) / (1000 * 60));
+        if (diffMinutes < 1) {
+            return 'Just now';
+        } else if (diffMinutes < 60) {
+            return `${diffMinutes}m ago`;
+        } else if (diffMinutes < 1440) {
+            return `${Math.floor(diffMinutes / 60)}h ago`;
+        }
+        return humanReadable;
+    }
+
     async function updateLastUpdatedIndicator() {
         try {
             const response = await fetch('/api/last-updated');
@@ -852,24 +958,12 @@ document.addEventListener('DOMContentLoaded', async () => {
             }
 
             if (data.last_updated) {
-                const lastUpdated = new Date(data.last_updated);
-                const now = new Date();
-                const diffMinutes = Math.floor((now - lastUpdated) / (1000 * 60));
-
-                let timeText;
-                if (diffMinutes < 1) {
-                    timeText = 'Just now';
-                } else if (diffMinutes < 60) {
-                    timeText = `${diffMinutes}m ago`;
-                } else if (diffMinutes < 1440) {
-                    timeText = `${Math.floor(diffMinutes / 60)}h ago`;
-                } else {
-                    timeText = data.human_readable;
-                }
-
-                indicator.innerHTML = `<i class="fa-solid fa-clock"></i> Updated: ${timeText}`;
+                indicator.innerHTML = `<i class="fa-solid fa-clock"></i> Updated: ${relativeTime(data.last_updated, data.human_readable)}`;
+                // A refresh that found the same flyers only moves the check time
+                indicator.title = `Checked for new deals: ${relativeTime(data.last_checked, data.checked_human_readable)}`;
             } else {
                 indicator.innerHTML = '<i class="fa-solid fa-question"></i> Never updated';
+                indicator.removeAttribute('title');
             }
         } catch (error) {
             console.error('Failed to fetch last updated time:', error);
@@ -883,6 +977,7 @@ document.addEventListener('DOMContentLoaded', async () => {
                 throw new Error('Failed to fetch shopping list');
             }
             shoppingList = await response.json();
+            shoppingListLoaded = true;
             renderShoppingList();
         } catch (error) {
             console.error('Failed to fetch shopping list:', error);
@@ -890,14 +985,39 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     }
 
+    async function fetchShoppingListSummary() {
+        try {
+            const response = await fetch('/api/shopping-list/summary');
+            if (!response.ok) {
+                throw new Error('Failed to fetch shopping list summary');
+            }
+            const summary = await response.json();
+            updateCartCount(summary.quantity);
+        } catch (error) {
+            console.error('Failed to fetch shopping list summary:', error);
+        }
+    }
+
+    function updateCartCount(totalItems) {
+        cartCountSpan.textContent = totalItems;
+        cartCountSpan.style.display = totalItems > 0 ? 'flex' : 'none';
+
+        // Animate cart count update
+        if (totalItems > 0) {
+            cartCountSpan.style.animation = 'bounce-in 0.3s ease-out';
+            setTimeout(() => {
+                cartCountSpan.style.animation = '';
+            }, 300);
+        }
+    }
+
     function renderShoppingList() {
         shoppingListUl.innerHTML = '';
         const emptyMessage = document.querySelector('.empty-list-message');
 
         if (shoppingList.length === 0) {
             if (emptyMessage) emptyMessage.style.display = 'block';
-            cartCountSpan.textContent = 0;
-            cartCountSpan.style.display = 'none';
+            updateCartCount(0);
             return;
         } else {
             if (emptyMessage) emptyMessage.style.display = 'none';
@@ -960,16 +1080,7 @@ document.addEventListener('DOMContentLoaded', async () => {
             });
         }
 
-        cartCountSpan.textContent = totalItems;
-        cartCountSpan.style.display = totalItems > 0 ? 'flex' : 'none';
-
-        // Animate cart count update
-        if (totalItems > 0) {
-            cartCountSpan.style.animation = 'bounce-in 0.3s ease-out';
-            setTimeout(() => {
-                cartCountSpan.style.animation = '';
-            }, 300);
-        }
+        updateCartCount(totalItems);
     }
 
     async function updateQuantity(itemId, delta) {
@@ -983,9 +1094,9 @@ document.addEventListener('DOMContentLoaded', async () => {
 
             try {
                 const response = await fetch('/api/shopping-list', {
-                    method: 'POST',
+                    method: 'PATCH',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify(shoppingList)
+                    body: JSON.stringify({ op: 'update', id: itemId, fields: { quantity: newQty } })
                 });
 
                 if (response.ok) {
@@ -1005,6 +1116,7 @@ document.addEventListener('DOMContentLoaded', async () => {
 
     async function addItemToShoppingList(item) {
         try {
+            if (!shoppingListLoaded) await fetchShoppingList();
             const existingItemIndex = shoppingList.findIndex(i => i.id === item.id);
             if (existingItemIndex !== -1) {
                 await updateQuantity(item.id, 1);
@@ -1016,9 +1128,9 @@ document.addEventListener('DOMContentLoaded', async () => {
             }
 
             const response = await fetch('/api/shopping-list', {
-                method: 'POST',
+                method: 'PATCH',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(shoppingList)
+                body: JSON.stringify({ op: 'add', item })
             });
 
             if (response.ok) {
@@ -1196,24 +1308,94 @@ document.addEventListener('DOMContentLoaded', async () => {
         updateDataBtn.disabled = true;
         updateDataBtn.innerHTML = '<div class="loading-spinner"></div>';
 
+        const finish = () => {
+            updateDataBtn.disabled = false;
+            updateDataBtn.innerHTML = originalText;
+            updateDataBtn.title = 'Update flyer data from all stores';
+        };
+
         try {
+            // The scrape runs as a background job; this only starts it (or joins a running one)
             const response = await fetch('/api/update-data', { method: 'POST' });
             const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.message || 'Update failed');
+            }
+            showNotification(result.message, 'info');
+            followUpdateJob(result, finish);
+        } catch (error) {
+            console.error('Failed to update data:', error);
+            showNotification(`Error updating data: ${error.message}`, 'error');
+            finish();
+        }
+    }
 
-            if (response.ok) {
+    function followUpdateJob(jobInfo, finish) {
+        const stores = {};
+
+        const showProgress = () => {
+            const done = Object.values(stores).filter(s => s.status === 'finished' || s.status === 'timed_out').length;
+            const total = Object.keys(stores).length;
+            updateDataBtn.innerHTML = `<div class="loading-spinner"></div><span class="update-progress">${done}/${total}</span>`;
+        };
+
+        const onDone = async (job) => {
+            finish();
+            if (job.status === 'succeeded') {
                 showNotification('Data updated successfully!', 'success');
                 await fetchFlyers();
                 updateLastUpdatedIndicator();
             } else {
-                throw new Error(result.message || 'Update failed');
+                showNotification(`Error updating data: ${job.error || 'Update failed'}`, 'error');
             }
-        } catch (error) {
-            console.error('Failed to update data:', error);
-            showNotification(`Error updating data: ${error.message}`, 'error');
-        } finally {
-            updateDataBtn.disabled = false;
-            updateDataBtn.innerHTML = originalText;
+        };
+
+        // Poll the status endpoint when the browser can't keep an event stream open
+        const poll = async () => {
+            try {
+                const response = await fetch(jobInfo.status_url, { cache: 'no-cache' });
+                const { job } = await response.json();
+                Object.assign(stores, job.stores);
+                showProgress();
+                if (job.status === 'running') {
+                    setTimeout(poll, 3000);
+                } else {
+                    onDone(job);
+                }
+            } catch (error) {
+                console.error('Failed to poll update status:', error);
+                setTimeout(poll, 5000);
+            }
+        };
+
+        if (!window.EventSource) {
+            poll();
+            return;
         }
+
+        const events = new EventSource(jobInfo.events_url);
+        events.addEventListener('store', (event) => {
+            const data = JSON.parse(event.data);
+            stores[data.store] = data;
+            updateDataBtn.title = `${data.label}: ${data.status.replace('_', ' ')}`;
+            showProgress();
+        });
+        events.addEventListener('page', (event) => {
+            const data = JSON.parse(event.data);
+            updateDataBtn.title = `${data.label}: page ${data.page} (${data.items} items)`;
+        });
+        events.addEventListener('done', (event) => {
+            events.close();
+            onDone(JSON.parse(event.data));
+        });
+        events.onerror = () => {
+            // The stream ends once the job is done; if it drops earlier, fall back to polling
+            if (events.readyState === EventSource.CLOSED) {
+                return;
+            }
+            events.close();
+            poll();
+        };
     }
 
     function showNotification(message, type = 'info') {
@@ -1,106 +1,158 @@
 import logging
-from bs4 import BeautifulSoup
-import time
+import os
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from stores.pagination import fetch_pages
+from stores.parsing import TileFilter, compile_selectors, parse_tiles, submit_parse
+from stores.waits import wait_for_tiles
 
 # Configure logging for this specific scraper
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def scrape_foodbasics_flyer(driver, flyers_data):
+BASE_URL = "https://www.foodbasics.ca/search"
+MAX_PAGES = 50  # Set the maximum number of pages to scrape
+
+# Politeness limits: pages fetched at once and minimum seconds between page requests
+PAGE_CONCURRENCY = int(os.environ.get('FOODBASICS_PAGE_CONCURRENCY', 3))
+PAGE_MIN_INTERVAL = float(os.environ.get('FOODBASICS_PAGE_MIN_INTERVAL', 0.5))
+
+TILE_FILTER = TileFilter(classes=('tile-product',))
+SELECTORS = compile_selectors({
+    'tile': '.tile-product',
+    'name': '.head__title',
+    'amount': '.head__unit-details',
+    'current_price': '.pi-price-promo',
+    'before_price': '.pricing__before-price',
+    'source': 'picture source',
+    'img': 'img',
+})
+
+
+def foodbasics_page_url(page):
+    # Construct paginated URL
+    if page == 1:
+        return BASE_URL + "?sortOrder=relevance&filter=%3Arelevance%3Adeal%3AFlyer+%26+Deals&fromEcomFlyer=true"
+    return f"{BASE_URL}-page-{page}?sortOrder=relevance&filter=%3Arelevance%3Adeal%3AFlyer+%26+Deals&fromEcomFlyer=true"
+
+
+def scrape_foodbasics_page(driver, url):
+    """
+    Loads one Food Basics search page and hands its source to the parse pool.
+
+    Returns a Future resolving to the products found on the page.
     """
-    Scrapes the Food Basics weekly flyer, limited to the first 20 pages or until there are no more items.
+    driver.get(url)
+    # Returns once the tile count settles, or quickly with 0 on an empty last page
+    wait_for_tiles(driver, '.tile-product', timeout=10, name='foodbasics.tiles')
+    return submit_parse(parse_foodbasics_page, driver.page_source)
+
+
+def scrape_foodbasics_page_http(fetcher, url):
+    """
+    Fetches one server-rendered Food Basics search page and extracts its products.
+    """
+    return parse_foodbasics_page(fetcher.get_text(url))
+
+
+def parse_foodbasics_page(html):
+    """
+    Extracts the products from the source of a Food Basics search page.
+    """
+    page_items = []
+    product_tiles = parse_tiles(html, TILE_FILTER, SELECTORS['tile'])
+
+    for tile in product_tiles:
+        try:
+            name_element = SELECTORS['name'].select_one(tile)
+            name = name_element.get_text(strip=True) if name_element else "N/A"
+
+            amount_element = SELECTORS['amount'].select_one(tile)
+            amount = amount_element.get_text(strip=True) if amount_element else "N/A"
+            if amount != "N/A":
+                amount = amount.replace(" un", " each")
+
+            current_price_element = SELECTORS['current_price'].select_one(tile)
+            current_price = current_price_element.get_text(strip=True) if current_price_element else "N/A"
+
+            original_price = "N/A"
+            unit = "N/A"
+            before_price_element = SELECTORS['before_price'].select_one(tile)
+            if before_price_element:
+                price_span = before_price_element.find('span', string=lambda text: text and '$' in text)
+                if price_span:
+                    original_price = price_span.get_text(strip=True)
+                unit_abbr = before_price_element.find('abbr')
+                if unit_abbr:
+                    unit = f'/{unit_abbr.get_text(strip=True)}'
+
+            image_url = "N/A"
+            source_element = SELECTORS['source'].select_one(tile)
+            if source_element and 'srcset' in source_element.attrs:
+                image_url = source_element['srcset'].split(',')[0].strip().split(' ')[0]
+            else:
+                img_element = SELECTORS['img'].select_one(tile)
+                if img_element and 'src' in img_element.attrs:
+                    image_url = img_element['src']
+
+            if name != "N/A" and current_price != "N/A":
+                page_items.append({
+                    "store": "Food Basics",
+                    "name": name,
+                    "price": current_price,
+                    "amount": amount,
+                    "unit": unit,
+                    "original_price": original_price,
+                    "image_url": image_url
+                })
+
+        except Exception as e:
+            logging.warning(f"Failed to parse a product tile: {e}")
+            continue
+
+    return page_items
+
+
+def scrape_foodbasics_flyer(driver, flyers_data, driver_pool=None):
+    """
+    Scrapes the Food Basics weekly flyer, up to MAX_PAGES pages or until there are no more items.
+
+    Pages are fetched PAGE_CONCURRENCY at a time when extra drivers can be
+    borrowed from driver_pool, and merged back in page order.
 
     Args:
         driver: The Selenium WebDriver instance.
         flyers_data: A list to append the scraped product dictionaries to.
+        driver_pool: Optional DriverPool to borrow additional drivers from.
     """
     logging.info("Starting Food Basics flyer scraping...")
 
-    base_url = "https://www.foodbasics.ca/search"
-    page = 1
-    max_pages = 50  # Set the maximum number of pages to scrape
+    pages = fetch_pages(driver, foodbasics_page_url, scrape_foodbasics_page, MAX_PAGES,
+                        driver_pool=driver_pool, concurrency=PAGE_CONCURRENCY,
+                        min_interval=PAGE_MIN_INTERVAL, label="Food Basics")
+    for page, page_items in pages:
+        flyers_data.extend(page_items)
 
-    while page <= max_pages:
-        # Construct paginated URL
-        if page == 1:
-            url = base_url + "?sortOrder=relevance&filter=%3Arelevance%3Adeal%3AFlyer+%26+Deals&fromEcomFlyer=true"
-        else:
-            url = f"{base_url}-page-{page}?sortOrder=relevance&filter=%3Arelevance%3Adeal%3AFlyer+%26+Deals&fromEcomFlyer=true"
+    logging.info(f"Scraping complete. Total items found: {len(flyers_data)}")
 
-        logging.info(f"Scraping Food Basics page {page}: {url}")
-        try:
-            driver.get(url)
-            time.sleep(2)
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            product_tiles = soup.select('.tile-product')
-
-            # Stop when there are no more product tiles
-            if not product_tiles:
-                logging.info(f"No products found on page {page}. Ending pagination.")
-                break
-
-            for tile in product_tiles:
-                try:
-                    name_element = tile.select_one('.head__title')
-                    name = name_element.get_text(strip=True) if name_element else "N/A"
-
-                    amount_element = tile.select_one('.head__unit-details')
-                    amount = amount_element.get_text(strip=True) if amount_element else "N/A"
-                    if amount != "N/A":
-                        amount = amount.replace(" un", " each")
-
-                    current_price_element = tile.select_one('.pi-price-promo')
-                    current_price = current_price_element.get_text(strip=True) if current_price_element else "N/A"
-
-                    original_price = "N/A"
-                    unit = "N/A"
-                    before_price_element = tile.select_one('.pricing__before-price')
-                    if before_price_element:
-                        price_span = before_price_element.find('span', string=lambda text: text and '$' in text)
-                        if price_span:
-                            original_price = price_span.get_text(strip=True)
-                        unit_abbr = before_price_element.find('abbr')
-                        if unit_abbr:
-                            unit = f'/{unit_abbr.get_text(strip=True)}'
-
-                    image_url = "N/A"
-                    source_element = tile.select_one('picture source')
-                    if source_element and 'srcset' in source_element.attrs:
-                        image_url = source_element['srcset'].split(',')[0].strip().split(' ')[0]
-                    else:
-                        img_element = tile.select_one('img')
-                        if img_element and 'src' in img_element.attrs:
-                            image_url = img_element['src']
-
-                    if name != "N/A" and current_price != "N/A":
-                        flyers_data.append({
-                            "store": "Food Basics",
-                            "name": name,
-                            "price": current_price,
-                            "amount": amount,
-                            "unit": unit,
-                            "original_price": original_price,
-                            "image_url": image_url
-                        })
-
-                except Exception as e:
-                    logging.warning(f"Failed to parse a product tile: {e}")
-                    continue
-
-        except TimeoutException:
-            logging.error("Timeout while loading Food Basics page.")
-            break
-        except WebDriverException as e:
-            logging.error(f"WebDriver error: {e}")
-            break
-        except Exception as e:
-            logging.error(f"Unexpected error: {e}")
-            break
 
-        page += 1  # Move to the next page
+def scrape_foodbasics_http(fetcher, flyers_data):
+    """
+    Fetches the Food Basics flyer pages directly over HTTP, without a browser.
+
+    All page workers share the fetcher's keep-alive connection pool and the
+    same politeness limits as the Selenium path.
+
+    Args:
+        fetcher: An HttpFetcher (or FixtureFetcher) instance.
+        flyers_data: A list to append the scraped product dictionaries to.
+    """
+    pages = fetch_pages(fetcher, foodbasics_page_url, scrape_foodbasics_page_http, MAX_PAGES,
+                        driver_pool=fetcher, concurrency=PAGE_CONCURRENCY,
+                        min_interval=PAGE_MIN_INTERVAL, label="Food Basics")
+    for page, page_items in pages:
+        flyers_data.extend(page_items)
 
-    logging.info(f"Scraping complete. Total items found: {len(flyers_data)}")
\ No newline at end of file
+    logging.info(f"Food Basics HTTP fetch complete. Total items found: {len(flyers_data)}")
\ No newline at end of file
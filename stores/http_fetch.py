@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 'auto' tries the HTTP backend first and falls back to Selenium, 'http' and
+# 'selenium' force one backend. SCRAPER_FIXTURE_DIR replays recorded responses
+# instead of touching the network; SCRAPER_RECORD_DIR records live ones.
+FETCH_MODE = os.environ.get('SCRAPER_FETCH_MODE', 'auto')
+FIXTURE_DIR = os.environ.get('SCRAPER_FIXTURE_DIR')
+RECORD_DIR = os.environ.get('SCRAPER_RECORD_DIR')
+
+POOL_SIZE = int(os.environ.get('SCRAPER_HTTP_POOL_SIZE', 8))
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+
+DEFAULT_HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/126.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-CA,en;q=0.9',
+}
+
+
+class FetchError(Exception):
+    """A page could not be fetched over HTTP, or looked like a bot challenge"""
+
+
+def fixture_name(url):
+    """File name a response for url is recorded under"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + '.txt'
+
+
+class HttpFetcher:
+    """
+    Fetches pages with one pooled, keep-alive requests.Session.
+
+    The fetcher is safe to share between threads and can stand in for a
+    DriverPool in fetch_pages: every page worker gets the same fetcher, so
+    they all reuse the session's connection pool.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, record_dir=None):
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+                        allowed_methods=('GET',))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.record_dir = record_dir
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def get_text(self, url):
+        with self._lock:
+            self.requests += 1
+        try:
+            response = self.session.get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except requests.RequestException as e:
+            raise FetchError(f"{url}: {e}") from e
+        if response.status_code != 200:
+            raise FetchError(f"{url}: HTTP {response.status_code}")
+        text = response.text
+        if self.record_dir:
+            self._record(url, text)
+        return text
+
+    def get_json(self, url):
+        try:
+            return json.loads(self.get_text(url))
+        except ValueError as e:
+            raise FetchError(f"{url}: invalid JSON ({e})") from e
+
+    def _record(self, url, text):
+        os.makedirs(self.record_dir, exist_ok=True)
+        with open(os.path.join(self.record_dir, fixture_name(url)), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    # DriverPool interface used by fetch_pages for extra page workers
+    def try_acquire(self):
+        return self
+
+    def release(self, fetcher, discard=False):
+        pass
+
+    def close(self):
+        self.session.close()
+
+
+class FixtureFetcher(HttpFetcher):
+    """Serves responses recorded by HttpFetcher(record_dir=...) without any network access"""
+
+    def __init__(self, fixture_dir):
+        super().__init__(pool_size=1)
+        self.fixture_dir = fixture_dir
+
+    def get_text(self, url):
+        with self._lock:
+            self.requests += 1
+        path = os.path.join(self.fixture_dir, fixture_name(url))
+        try:
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise FetchError(f"{url}: no fixture {path}")
+
+
+def create_fetcher():
+    """Build the fetcher for this run from SCRAPER_FIXTURE_DIR / SCRAPER_RECORD_DIR"""
+    if FIXTURE_DIR:
+        return FixtureFetcher(FIXTURE_DIR)
+    return HttpFetcher(record_dir=RECORD_DIR)
+
+
+if __name__ == '__main__':
+    # python -m stores.http_fetch record|replay <dir>: record live responses, or
+    # re-run every HTTP scraper offline against them and report item counts
+    import sys
+    import time
+    from utils.update_data import SCRAPERS
+
+    if len(sys.argv) != 3 or sys.argv[1] not in ('record', 'replay'):
+        sys.exit("usage: python -m stores.http_fetch record|replay <fixture dir>")
+    command, directory = sys.argv[1:]
+    fetcher = HttpFetcher(record_dir=directory) if command == 'record' else FixtureFetcher(directory)
+
+    for store, label, _, _, http_scraper in SCRAPERS:
+        if http_scraper is None:
+            print(f"{label:16} selenium only")
+            continue
+        items = []
+        start = time.perf_counter()
+        http_scraper(fetcher, items)
+        print(f"{label:16} {len(items):5d} items in {time.perf_counter() - start:6.2f}s")
+    print(f"{fetcher.requests} requests")
+    fetcher.close()
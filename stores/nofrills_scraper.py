@@ -2,29 +2,39 @@
 # - Set max_pages to 50 for full scraping.
 # - Uncommented and improved cookie accept handling.
 # - Improved scrolling with dynamic detection.
+# - Fixed sleeps replaced with condition-based waits from stores/waits.py.
+# - Tiles are parsed with lxml and precompiled selectors on a separate parse pool.
 # - Better error handling and logging.
 # - Added dynamic pagination stop when no more items or duplicate pages.
+# - Pages are fetched concurrently on extra pooled drivers and merged in page order.
 
-import time
+import os
 import logging
-from bs4 import BeautifulSoup
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from urllib.parse import urljoin
-
-def scroll_to_bottom(driver, pause_time=1, max_scrolls=20):
-    last_height = driver.execute_script("return document.body.scrollHeight")
-    scrolls = 0
-    while scrolls < max_scrolls:
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(pause_time)
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-        scrolls += 1
+from stores.pagination import fetch_pages
+from stores.parsing import TileFilter, compile_selectors, parse_tiles, submit_parse
+from stores.waits import scroll_until_stable, wait_for_network_idle
+
+MAX_PAGES = 50
+TILE_SELECTOR = 'div[data-testid="product-tile"], div.product-tile, div.css-yyn1h'
+TILE_FILTER = TileFilter(classes=('product-tile', 'css-yyn1h'), attrs={'data-testid': 'product-tile'})
+SELECTORS = compile_selectors({
+    'tile': TILE_SELECTOR,
+    'name': 'h3[data-testid="product-title"]',
+    'was_price': 'span[data-testid="was-price"]',
+    'regular_price': 'span[data-testid="regular-price"]',
+    'sale_price': 'span[data-testid="sale-price"]',
+    'package_size': 'p[data-testid="product-package-size"]',
+    'image': 'div[data-testid="product-image"] img',
+})
+
+# Politeness limits: pages fetched at once and minimum seconds between page requests
+PAGE_CONCURRENCY = int(os.environ.get('NOFRILLS_PAGE_CONCURRENCY', 3))
+PAGE_MIN_INTERVAL = float(os.environ.get('NOFRILLS_PAGE_MIN_INTERVAL', 1.0))
 
 def clean_value(value):
     if value is None:
@@ -34,7 +44,7 @@ def clean_value(value):
 
 def scrape_single_page(driver, page_url):
     driver.get(page_url)
-    time.sleep(2)
+    wait_for_network_idle(driver, timeout=10, name='nofrills.load')
 
     # Accept cookies if present
     try:
@@ -42,27 +52,29 @@ def scrape_single_page(driver, page_url):
             EC.element_to_be_clickable((By.ID, 'onetrust-accept-btn-handler')))
         cookie_accept.click()
         logging.info("Accepted cookies")
-        time.sleep(1)
+        WebDriverWait(driver, 2).until(EC.invisibility_of_element_located((By.ID, 'onetrust-accept-btn-handler')))
     except TimeoutException:
         logging.info("No cookie banner found or already accepted.")
 
     # Wait for products
     try:
         WebDriverWait(driver, 2).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR,
-                                            'div[data-testid="product-tile"], div.product-tile, div.css-yyn1h'))
+            EC.presence_of_element_located((By.CSS_SELECTOR, TILE_SELECTOR))
         )
     except TimeoutException:
         logging.warning(f"Product tiles container not found on page: {page_url}")
         return []
 
-    # Scroll to load all products
-    scroll_to_bottom(driver)
-    time.sleep(1)
+    # Scroll until a scroll no longer brings in new product tiles
+    scroll_until_stable(driver, TILE_SELECTOR, settle=1.0, max_scrolls=20, name='nofrills.scroll')
+
+    # Extraction runs on the parse pool while this driver moves on
+    return submit_parse(parse_nofrills_page, driver.page_source, page_url)
 
-    # Parse the page
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    tiles = soup.select('div[data-testid="product-tile"], div.product-tile, div.css-yyn1h')
+
+def parse_nofrills_page(html, page_url):
+    # Parse only the product tiles of the page
+    tiles = parse_tiles(html, TILE_FILTER, SELECTORS['tile'])
 
     if not tiles:
         logging.warning(f"No product tiles found on page: {page_url}")
@@ -87,25 +99,24 @@ def scrape_single_page(driver, page_url):
         }
 
         try:
-            name_tag = tile.select_one('h3[data-testid="product-title"]')
+            name_tag = SELECTORS['name'].select_one(tile)
             product_data["name"] = clean_value(name_tag.get_text(strip=True) if name_tag else None)
 
-            original_price_tag = tile.select_one('span[data-testid="was-price"]') or tile.select_one(
-                'span[data-testid="regular-price"]')
+            original_price_tag = SELECTORS['was_price'].select_one(tile) or SELECTORS['regular_price'].select_one(tile)
             if original_price_tag:
                 original_price_text = original_price_tag.get_text(strip=True)
                 product_data["original_price"] = clean_value(
                     original_price_text.replace('was', '').strip()
                 )
 
-            sale_price_tag = tile.select_one('span[data-testid="sale-price"]')
+            sale_price_tag = SELECTORS['sale_price'].select_one(tile)
             if sale_price_tag:
                 price_text = sale_price_tag.get_text(strip=True)
                 product_data["price"] = clean_value(price_text.replace('sale', '').strip())
             else:
                 product_data["price"] = None
 
-            amount_tag = tile.select_one('p[data-testid="product-package-size"]')
+            amount_tag = SELECTORS['package_size'].select_one(tile)
             if amount_tag:
                 text = clean_value(amount_tag.get_text(strip=True))
                 if text:
@@ -118,7 +129,7 @@ def scrape_single_page(driver, page_url):
                     else:
                         product_data["unit"] = f"/{text}"
 
-            img_tag = tile.select_one('div[data-testid="product-image"] img')
+            img_tag = SELECTORS['image'].select_one(tile)
             image_url = None
             if img_tag and 'src' in img_tag.attrs:
                 image_url = img_tag['src']
@@ -150,28 +161,22 @@ def scrape_single_page(driver, page_url):
 
     return page_items
 
-def scrape_nofrills_flyer(driver, flyers_data):
+def scrape_nofrills_flyer(driver, flyers_data, driver_pool=None):
     base_url = "https://www.nofrills.ca/en/collection/deals-centre-value?icid=gr_more-offers-low-prices_hottest-flyer-deals_menutile_3_c"
-    max_pages = 50
     items_per_page = {}
-    previous_page_items = set()
 
-    try:
-        for page_num in range(1, max_pages + 1):
-            page_url = f"{base_url}&page={page_num}" if page_num > 1 else base_url
-            logging.info(f"Scraping page {page_num}...")
+    def page_url(page_num):
+        return f"{base_url}&page={page_num}" if page_num > 1 else base_url
 
-            page_items = scrape_single_page(driver, page_url)
+    try:
+        # Pages are fetched in parallel and merged in order; pagination stops at
+        # the first empty page or a page that repeats the previous one
+        pages = fetch_pages(driver, page_url, scrape_single_page, MAX_PAGES,
+                            driver_pool=driver_pool, concurrency=PAGE_CONCURRENCY,
+                            min_interval=PAGE_MIN_INTERVAL, label="No Frills")
+        for page_num, page_items in pages:
             items_per_page[page_num] = len(page_items)
-
-            current_items_set = set(item['name'] for item in page_items if item['name'])
-            if len(page_items) == 0 or current_items_set == previous_page_items:
-                logging.info(f"No new items on page {page_num}, stopping pagination.")
-                break
-            previous_page_items = current_items_set
-
             flyers_data.extend(page_items)
-            time.sleep(1)
 
     except Exception as e:
         logging.error(f"Error during pagination: {str(e)}")
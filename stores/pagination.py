@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, wait
+from stores.progress import scrape_progress
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class _Politeness:
+    """Spaces out page requests for one store, shared by all of its workers"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self.min_interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _page_key(items):
+    return frozenset(item.get('name') for item in items if item.get('name'))
+
+
+def fetch_pages(driver, page_url, scrape_page, max_pages, driver_pool=None, concurrency=1,
+                min_interval=0.0, label="store"):
+    """
+    Scrapes numbered pages with several drivers at once and merges them in page order.
+
+    Workers claim page numbers from a shared counter, so at most `concurrency`
+    pages are in flight. Once a page comes back empty, fails, or repeats the
+    previous page's items, no page after it is claimed and anything past it
+    that was already fetched is dropped.
+
+    Args:
+        driver: The store's own WebDriver instance; it always takes part.
+        page_url: Callable returning the URL for a 1-based page number.
+        scrape_page: Callable (driver, url) returning the list of items on a page, or a
+            Future resolving to it when extraction is done off the driver's thread.
+        max_pages: Highest page number to try.
+        driver_pool: Optional pool to borrow extra drivers from. Extra drivers are
+            only taken if free, so a busy pool just means fewer workers.
+        concurrency: Maximum number of pages fetched at the same time.
+        min_interval: Minimum seconds between page requests to the store.
+        label: Store name used in log messages.
+
+    Returns:
+        A list of (page number, items) tuples in page order.
+    """
+    results = {}
+    parsing = []
+    state = {'next_page': 1, 'stop_at': max_pages + 1}
+    lock = threading.Lock()
+    politeness = _Politeness(min_interval)
+
+    def stop(page_num):
+        state['stop_at'] = min(state['stop_at'], page_num)
+
+    def record(page_num, items):
+        with lock:
+            first = page_num not in results
+            results[page_num] = items
+            if not items:
+                stop(page_num)
+            else:
+                # Compare against both neighbours; whichever arrives second decides
+                key = _page_key(items)
+                previous = results.get(page_num - 1)
+                if previous and _page_key(previous) == key:
+                    stop(page_num)
+                following = results.get(page_num + 1)
+                if following and _page_key(following) == key:
+                    stop(page_num + 1)
+        if first:
+            scrape_progress.report('page', label=label, page=page_num, items=len(items))
+
+    def record_future(page_num, future):
+        try:
+            items = future.result()
+        except Exception as e:
+            logging.error(f"Error parsing {label} page {page_num}: {e}")
+            items = []
+        record(page_num, items)
+
+    def worker(worker_driver):
+        while True:
+            with lock:
+                page_num = state['next_page']
+                if page_num >= state['stop_at']:
+                    return
+                state['next_page'] += 1
+
+            politeness.wait()
+            url = page_url(page_num)
+            logging.info(f"Scraping {label} page {page_num}: {url}")
+            try:
+                items = scrape_page(worker_driver, url)
+            except Exception as e:
+                logging.error(f"Error scraping {label} page {page_num}: {e}")
+                items = []
+            if isinstance(items, Future):
+                # Parsing continues on the parse pool while this driver loads the next page
+                with lock:
+                    parsing.append((page_num, items))
+                items.add_done_callback(lambda future, page_num=page_num: record_future(page_num, future))
+            else:
+                record(page_num, items)
+
+    extra_drivers = []
+    if driver_pool is not None:
+        for _ in range(concurrency - 1):
+            extra = driver_pool.try_acquire()
+            if extra is None:
+                break
+            extra_drivers.append(extra)
+
+    threads = [threading.Thread(target=worker, args=(extra,), name=f"{label}-pages-{i}", daemon=True)
+               for i, extra in enumerate(extra_drivers, start=1)]
+    for thread in threads:
+        thread.start()
+    try:
+        worker(driver)
+    finally:
+        for thread in threads:
+            thread.join()
+        # Callbacks may still be running when wait() returns; recording is idempotent
+        wait([future for _, future in parsing])
+        for page_num, future in parsing:
+            record_future(page_num, future)
+        for extra in extra_drivers:
+            driver_pool.release(extra)
+
+    logging.info(f"Fetched {len(results)} {label} pages with {1 + len(extra_drivers)} driver(s).")
+    return [(page_num, results[page_num]) for page_num in sorted(results) if page_num < state['stop_at']]
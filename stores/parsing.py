@@ -0,0 +1,122 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import soupsieve
+from bs4 import BeautifulSoup
+from bs4.filter import ElementFilter
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:  # html.parser is slower but always available
+    PARSER = 'html.parser'
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Extraction runs here so the threads driving Chrome can move on to the next page
+PARSE_WORKERS = int(os.environ.get('SCRAPER_PARSE_WORKERS', 2))
+_parse_executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix='parse')
+
+
+class TileFilter(ElementFilter):
+    """
+    Parse-time filter that only builds product tiles and their subtrees.
+
+    A top-level tag is kept if it has one of `classes` or one of the
+    `attrs` name/value pairs; everything else on the page (headers, scripts,
+    navigation, footers) is discarded by the parser without creating Tag
+    objects for it.
+    """
+
+    def __init__(self, classes=(), attrs=None):
+        super().__init__()
+        self.classes = frozenset(classes)
+        self.attrs = dict(attrs or {})
+
+    @property
+    def includes_everything(self):
+        return False
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        if not attrs:
+            return False
+        for attr, value in self.attrs.items():
+            if attrs.get(attr) == value:
+                return True
+        if self.classes:
+            class_value = attrs.get('class')
+            if isinstance(class_value, str):
+                class_value = class_value.split()
+            if class_value and self.classes.intersection(class_value):
+                return True
+        return False
+
+    def allow_string_creation(self, string):
+        return False
+
+
+def compile_selectors(selectors):
+    """Precompile a {key: css selector} mapping once per store"""
+    return {key: soupsieve.compile(css) for key, css in selectors.items()}
+
+
+def parse_tiles(html, tile_filter, tile_selector):
+    """
+    Parses only the product tiles out of a rendered page.
+
+    Args:
+        html: The page source.
+        tile_filter: A TileFilter describing the tile roots.
+        tile_selector: A compiled selector matching the tiles within the filtered tree.
+    """
+    soup = BeautifulSoup(html, PARSER, parse_only=tile_filter)
+    return tile_selector.select(soup)
+
+
+def submit_parse(parse_page, *args):
+    """Run a page parser on the shared parse pool and return its Future"""
+    return _parse_executor.submit(parse_page, *args)
+
+
+def _benchmark_page(tile_count=900):
+    # A synthetic No Frills-like page: product tiles buried in typical page chrome
+    chrome = ''.join(f'<nav><ul>{"<li><a href=#>link</a></li>" * 20}</ul></nav><script>var x = {i};</script>'
+                     for i in range(50))
+    tiles = ''.join(
+        f'<div data-testid="product-tile"><div data-testid="product-image"><img src="/img/{i}.png"></div>'
+        f'<h3 data-testid="product-title">Product {i}</h3><span data-testid="sale-price">sale $1.{i % 100:02d}</span>'
+        f'<span data-testid="was-price">was $2.{i % 100:02d}</span>'
+        f'<p data-testid="product-package-size">500 g, $0.{i % 100:02d}/100g</p></div>'
+        for i in range(tile_count)
+    )
+    return f'<html><head><title>Deals</title></head><body>{chrome}<main><div class="grid">{tiles}</div></main>{chrome}</body></html>'
+
+
+if __name__ == '__main__':
+    import sys
+
+    html = open(sys.argv[1], encoding='utf-8').read() if len(sys.argv) > 1 else _benchmark_page()
+    selector = 'div[data-testid="product-tile"], div.product-tile, div.css-yyn1h'
+    compiled = soupsieve.compile(selector)
+    tile_filter = TileFilter(classes=('product-tile', 'css-yyn1h'), attrs={'data-testid': 'product-tile'})
+    runs = 10
+
+    def per_page_ms(parse):
+        start = time.perf_counter()
+        for _ in range(runs):
+            result = parse()
+        return (time.perf_counter() - start) / runs * 1000, result
+
+    baseline_ms, baseline = per_page_ms(lambda: BeautifulSoup(html, 'html.parser').select(selector))
+    full_ms, _ = per_page_ms(lambda: compiled.select(BeautifulSoup(html, PARSER)))
+    strained_ms, tiles = per_page_ms(lambda: parse_tiles(html, tile_filter, compiled))
+
+    # Building the tiles' own Tag objects dominates once the parser is lxml, so the
+    # filter only pays off in proportion to the non-tile markup on the page
+    print(f"Page size: {len(html) / 1024:.0f} KB, tiles: {len(baseline)} (full parse) / {len(tiles)} (strained)")
+    print(f"html.parser, full page:      {baseline_ms:8.1f} ms/page")
+    print(f"{PARSER}, full page:{' ' * (18 - len(PARSER))}{full_ms:8.1f} ms/page")
+    print(f"{PARSER}, tiles only:{' ' * (17 - len(PARSER))}{strained_ms:8.1f} ms/page")
+    print(f"Speed-up: {baseline_ms / strained_ms:.1f}x overall, {full_ms / strained_ms:.1f}x from the tile filter")
@@ -0,0 +1,39 @@
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ProgressReporter:
+    """
+    Fans scraper progress events out to whoever is listening.
+
+    Scrapers call report() without knowing whether anyone listens; the
+    background update job subscribes for the duration of a run and turns the
+    events into its status and event stream.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def report(self, event, **data):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event, data)
+            except Exception as e:
+                logging.error(f"Error in progress listener: {e}")
+
+
+scrape_progress = ProgressReporter()
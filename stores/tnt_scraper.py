@@ -3,7 +3,6 @@ import requests
 import json
 import logging
 import re
-import time
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -11,10 +10,21 @@ from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup
+from stores.parsing import TileFilter, compile_selectors, parse_tiles
+from stores.waits import scroll_until_stable
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+TILE_FILTER = TileFilter(classes=('item-root-NyK',))
+SELECTORS = compile_selectors({
+    'tile': 'div.item-root-NyK',
+    'name': 'a.item-name-suo span',
+    'price_box': 'div.item-priceBox-ObD',
+    'new_price': 'div[class^="item-hasPrice-"]',
+    'original_price': 'div[class^="item-wasPrice-"]',
+    'image': 'a.item-images-Or3 img',
+})
+
 
 def scrape_tnt_flyer(driver, flyers_data):
     """
@@ -31,35 +41,23 @@ def scrape_tnt_flyer(driver, flyers_data):
         wait = WebDriverWait(driver, 30)
         wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div.category-grid-44X')))
 
-        # Scroll to load dynamic content until all items are loaded or we have at least 200 items.
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        while True:
-            # Scroll down to the bottom
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)  # Wait for new content to load
-
-            # Check if all content has been loaded
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
+        # Scroll to load dynamic content until a scroll brings in no new items
+        scroll_until_stable(driver, 'div.item-root-NyK', settle=2, max_scrolls=50, name='tnt.scroll')
 
-            # Final parse after scrolling is complete
-            page_source = driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
-            products = soup.select('div.item-root-NyK')
+        # Final parse after scrolling is complete, restricted to the product tiles
+        products = parse_tiles(driver.page_source, TILE_FILTER, SELECTORS['tile'])
 
-            if not products:
-                logging.warning("No product data found on the page.")
-                return
+        if not products:
+            logging.warning("No product data found on the page.")
+            return
 
         for product in products:
             try:
                 # Extract product name
-                item_name_tag = product.select_one('a.item-name-suo span')
+                item_name_tag = SELECTORS['name'].select_one(product)
                 item_name = item_name_tag.get_text(strip=True) if item_name_tag else 'N/A'
 
-                price_box = product.select_one('div.item-priceBox-ObD')
+                price_box = SELECTORS['price_box'].select_one(product)
                 unit = 'N/A'
                 new_price = 'N/A'
                 original_price = 'N/A'
@@ -72,7 +70,7 @@ def scrape_tnt_flyer(driver, flyers_data):
                         unit = f"/{unit_element.get_text(strip=True).lower().lstrip('/')}"
 
                     # Extract new price
-                    new_price_element = price_box.select_one('div[class^="item-hasPrice-"]')
+                    new_price_element = SELECTORS['new_price'].select_one(price_box)
                     if new_price_element:
                         # Concatenate all span text that is not the unit
                         new_price_spans = new_price_element.find_all('span')
@@ -80,7 +78,7 @@ def scrape_tnt_flyer(driver, flyers_data):
                                              not any('item-weightUom-' in c for c in span.get('class', []))])
 
                     # Extract original price
-                    original_price_element = price_box.select_one('div[class^="item-wasPrice-"]')
+                    original_price_element = SELECTORS['original_price'].select_one(price_box)
                     if original_price_element:
                         # Concatenate all span text that is not the unit
                         original_price_spans = original_price_element.find_all('span')
@@ -88,7 +86,7 @@ def scrape_tnt_flyer(driver, flyers_data):
                                                   not any('item-weightUom-' in c for c in span.get('class', []))])
 
                 # Extract image URL
-                image_tag = product.select_one('a.item-images-Or3 img')
+                image_tag = SELECTORS['image'].select_one(product)
                 image_url = image_tag.get('src') if image_tag else 'N/A'
 
                 if item_name and new_price != 'N/A':
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+POLL_INTERVAL = 0.1
+
+_TILE_COUNT_JS = "return document.querySelectorAll(arguments[0]).length;"
+_LOAD_STATE_JS = "return [document.readyState, performance.getEntriesByType('resource').length];"
+_SCROLL_JS = "window.scrollTo(0, document.body.scrollHeight); return document.body.scrollHeight;"
+
+
+class WaitTimings:
+    """Thread-safe record of how long each kind of wait actually took"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings = {}
+
+    def record(self, name, seconds, timed_out=False):
+        with self._lock:
+            entry = self._timings.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+            entry['count'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            if timed_out:
+                entry['timeouts'] += 1
+        logging.debug(f"Wait '{name}' took {seconds:.2f}s{' (timed out)' if timed_out else ''}")
+
+    def summary(self):
+        with self._lock:
+            return {
+                name: {
+                    'count': entry['count'],
+                    'total_s': round(entry['total'], 2),
+                    'avg_s': round(entry['total'] / entry['count'], 2),
+                    'max_s': round(entry['max'], 2),
+                    'timeouts': entry['timeouts'],
+                }
+                for name, entry in self._timings.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+
+
+wait_timings = WaitTimings()
+
+
+def _tile_count(driver, selector):
+    return driver.execute_script(_TILE_COUNT_JS, selector)
+
+
+def _network_state(driver):
+    ready_state, resources = driver.execute_script(_LOAD_STATE_JS)
+    return ready_state == 'complete', resources
+
+
+def wait_for_network_idle(driver, timeout=10, idle=0.5, name="network_idle"):
+    """
+    Waits until the document has loaded and no new resources were fetched for `idle` seconds.
+
+    Returns True if the page went idle, False if the timeout was reached first.
+    """
+    start = time.monotonic()
+    last_resources = None
+    quiet_since = start
+    while True:
+        now = time.monotonic()
+        complete, resources = _network_state(driver)
+        if resources != last_resources or not complete:
+            last_resources = resources
+            quiet_since = now
+        elif now - quiet_since >= idle:
+            wait_timings.record(name, now - start)
+            return True
+        if now - start >= timeout:
+            wait_timings.record(name, now - start, timed_out=True)
+            return False
+        time.sleep(POLL_INTERVAL)
+
+
+def wait_for_tiles(driver, selector, timeout=10, settle=0.5, name="tiles"):
+    """
+    Waits until the number of elements matching `selector` stops changing.
+
+    Returns as soon as the count has been non-zero and unchanged for `settle`
+    seconds. A page that finishes loading (network idle for `settle` seconds)
+    without any matching element returns 0 instead of running into the
+    timeout, so empty last pages are detected quickly.
+    """
+    start = time.monotonic()
+    last_count = None
+    last_resources = None
+    stable_since = start
+    while True:
+        now = time.monotonic()
+        count = _tile_count(driver, selector)
+        complete, resources = _network_state(driver)
+        if count != last_count or resources != last_resources or not complete:
+            last_count, last_resources = count, resources
+            stable_since = now
+        elif now - stable_since >= settle:
+            wait_timings.record(name, now - start)
+            return count
+        if now - start >= timeout:
+            wait_timings.record(name, now - start, timed_out=True)
+            return count
+        time.sleep(POLL_INTERVAL)
+
+
+def scroll_until_stable(driver, selector, settle=1.0, max_scrolls=50, timeout=60, name="scroll"):
+    """
+    Scrolls to the bottom repeatedly until a scroll yields no new tiles within `settle` seconds.
+
+    Each scroll returns as soon as new tiles (or a taller page) show up,
+    instead of sleeping for a fixed interval. Returns the final tile count.
+    """
+    start = time.monotonic()
+    count = _tile_count(driver, selector)
+    timed_out = False
+    for _ in range(max_scrolls):
+        height = driver.execute_script(_SCROLL_JS)
+        scrolled_at = time.monotonic()
+        grew = False
+        while time.monotonic() - scrolled_at < settle:
+            time.sleep(POLL_INTERVAL)
+            new_count = _tile_count(driver, selector)
+            new_height = driver.execute_script("return document.body.scrollHeight;")
+            if new_count != count or new_height != height:
+                count = new_count
+                grew = True
+                break
+        if not grew:
+            break
+        if time.monotonic() - start >= timeout:
+            timed_out = True
+            break
+    wait_timings.record(name, time.monotonic() - start, timed_out=timed_out)
+    return count
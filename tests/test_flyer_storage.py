@@ -0,0 +1,37 @@
+import pytest
+
+from utils.flyer_db import create_flyer_storage
+
+FLYERS = {
+    'galleria': [{'name': 'Korean Pear', 'price': '$1.99'}],
+    'nofrills': [{'name': 'Gala Apples', 'price': '$2.99', 'original_price': '$4.99'}],
+}
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def storage(request, tmp_path):
+    return create_flyer_storage(str(tmp_path), request.param)
+
+
+def test_unchanged_refresh_is_checked_without_an_update(storage):
+    storage.save(FLYERS, checked=False)
+    stat_key = storage.stat_key()
+    assert storage.last_checked() is None
+
+    diffs = storage.save({store: list(items) for store, items in FLYERS.items()})
+
+    assert not any(diff.changed for diff in diffs.values())
+    # Readers watching the stat key don't reload, but the check is recorded
+    assert storage.stat_key() == stat_key
+    assert storage.last_checked() is not None
+
+
+def test_changed_refresh_moves_both(storage):
+    storage.save(FLYERS)
+    first_checked = storage.last_checked()
+    stat_key = storage.stat_key()
+
+    storage.save(dict(FLYERS, galleria=[{'name': 'Korean Pear', 'price': '$1.49'}]))
+
+    assert storage.stat_key() != stat_key
+    assert storage.last_checked() >= first_checked
@@ -0,0 +1,30 @@
+import json
+import os
+
+import pytest
+
+from utils.prices import HAND_CHECKED, _expected, calculate_savings_percentage, parse_price
+
+with open(os.path.join('data', 'price_corpus.json'), encoding='utf-8') as f:
+    CORPUS = json.load(f)
+
+
+@pytest.mark.parametrize('value, expected', sorted(CORPUS.items()))
+def test_golden_corpus(value, expected):
+    assert parse_price(value) == pytest.approx(expected, abs=1e-9)
+
+
+def test_corpus_values_are_not_taken_from_the_parser():
+    assert {value: _expected(value) for value in CORPUS} == CORPUS
+    assert set(HAND_CHECKED) <= set(CORPUS)
+
+
+@pytest.mark.parametrize('value, expected', [('1.5c', 0.015), ('.5¢', 0.005), ('59 ¢', 0.59), ('2/$5.00', 2.5)])
+def test_cents_and_multi_buy(value, expected):
+    assert parse_price(value) == pytest.approx(expected)
+
+
+def test_savings_needs_a_lower_sale_price():
+    assert calculate_savings_percentage('$4.00', '$3.00') == 25.0
+    assert calculate_savings_percentage('$3.00', '$4.00') == 0
+    assert calculate_savings_percentage('N/A', '$3.00') == 0
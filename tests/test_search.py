@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from utils.catalog import CatalogSnapshot
+from utils.flyer_db import FlyerDatabase
+from utils.search_index import SearchIndex, item_search_text
+
+QUERIES = ['2%', '1/2', '2 for $5', '59¢', '/lb', '(', 'milk', 'chocolate milk', 'Green Onion', 'a', 'zzzz', ' ']
+
+
+@pytest.fixture(scope='module')
+def flyers():
+    with open(os.path.join('data', 'flyers.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def scan(items, query):
+    # The plain substring scan the index must agree with
+    return {row for row, item in enumerate(items) if query.lower() in item_search_text(item)}
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_index_matches_substring_scan(flyers, query):
+    for store, items in flyers.items():
+        assert SearchIndex(items).search(query) == scan(items, query), store
+
+
+def test_punctuation_is_not_dropped(flyers):
+    items = [item for items in flyers.values() for item in items]
+    index = SearchIndex(items)
+    # Before the fix '2%' was searched as the word '2'
+    assert index.search('2%') < index.search('2')
+    # Every row the name-only baseline returned is still returned
+    assert {row for row, item in enumerate(items) if '2%' in (item.get('name') or '').lower()} <= index.search('2%')
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_sql_matches_memory(flyers, tmp_path, query):
+    database = FlyerDatabase(str(tmp_path / 'flyers.db'))
+    database.save(flyers, record_changes=False)
+    snapshot = CatalogSnapshot('test', flyers)
+    for store in flyers:
+        _, items = database.query(store, search=query.lower(), sort_by='name', limit=10000)
+        expected = [snapshot.data[store][row] for row in snapshot.query(store, search=query.lower())]
+        assert sorted(item['name'] for item in items) == sorted(item['name'] for item in expected), store
+
+
+def test_compare_search_keeps_punctuation():
+    data = {
+        'nofrills': [{'name': 'Neilson 2% Milk 4 L', 'price': '$5.49'}, {'name': 'Neilson 1% Milk 4 L', 'price': '$5.49'}],
+        'foodbasics': [{'name': 'Neilson 2% Milk 4L', 'price': '$5.99'}, {'name': 'Neilson 1% Milk 4L', 'price': '$5.99'}],
+    }
+    groups = CatalogSnapshot('test', data).matcher.search('2%')
+    assert [group.name for group in groups] == ['Neilson 2% Milk 4L']
@@ -0,0 +1,33 @@
+import json
+
+from utils.shopping_lists import DEFAULT_LIST, ShoppingListService
+
+LEGACY = [{'id': 'milk', 'name': 'Milk', 'quantity': 2}]
+
+
+def service(tmp_path):
+    (tmp_path / 'shopping_list.json').write_text(json.dumps(LEGACY), encoding='utf-8')
+    return ShoppingListService(str(tmp_path))
+
+
+def test_legacy_list_is_not_handed_to_the_first_token(tmp_path):
+    lists = service(tmp_path)
+    assert lists.get('first-user-token-0001').items() == []
+    assert lists.get('second-user-token-002', DEFAULT_LIST).items() == []
+    # A restarted worker doesn't hand it over either
+    assert service(tmp_path).get('third-user-token-0003').items() == []
+
+
+def test_legacy_list_stays_on_the_token_less_path(tmp_path):
+    lists = service(tmp_path)
+    lists.get('first-user-token-0001').apply({'op': 'add', 'item': {'id': 'eggs', 'name': 'Eggs'}})
+    assert lists.get(None).items() == LEGACY
+    assert [item['id'] for item in lists.get('first-user-token-0001').items()] == ['eggs']
+
+
+def test_lists_are_isolated_per_token_and_name(tmp_path):
+    lists = service(tmp_path)
+    lists.get('first-user-token-0001', 'party').apply({'op': 'add', 'item': {'id': 'chips'}})
+    assert lists.get('first-user-token-0001').items() == []
+    assert lists.get('second-user-token-002', 'party').items() == []
+    assert lists.list_names('first-user-token-0001') == ['party']
@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+import utils.flyer_db
+import utils.update_data as update_data
+
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+
+def scrape_one(driver, items):
+    items.append({'name': 'Fresh Item', 'price': '$1.00'})
+
+
+def scrape_nothing(driver, items, driver_pool=None):
+    # Like the real scrapers: log the failure and return without raising
+    pass
+
+
+def scrape_error(driver, items):
+    items.append({'name': 'Partial Item', 'price': '$1.00'})
+    raise ValueError('page failed to load')
+
+
+@pytest.fixture
+def data_folder(tmp_path, monkeypatch):
+    previous = {
+        'galleria': [{'name': 'Old Galleria', 'price': '$2.00'}],
+        'foodbasics': [{'name': 'Old Food Basics', 'price': '$2.00'}],
+        'tnt_supermarket': [{'name': 'Old T&T', 'price': '$2.00'}],
+        'nofrills': [{'name': 'Old No Frills', 'price': '$2.00'}],
+    }
+    (tmp_path / 'flyers.json').write_text(json.dumps(previous), encoding='utf-8')
+    monkeypatch.setattr(update_data, 'DATA_FOLDER', str(tmp_path))
+    monkeypatch.setattr(utils.flyer_db, 'STORAGE', 'json')
+    monkeypatch.setattr(update_data, 'create_driver', FakeDriver)
+    return tmp_path
+
+
+def saved(folder):
+    data, _ = utils.flyer_db.create_flyer_storage(str(folder), 'json').load()
+    return data
+
+
+def test_empty_or_failed_selenium_scrape_keeps_the_stored_flyer(data_folder, monkeypatch):
+    monkeypatch.setattr(update_data, 'SCRAPERS', [
+        ('galleria', 'Galleria', scrape_one, False, None),
+        ('foodbasics', 'Foodbasics', scrape_nothing, True, None),
+        ('tnt_supermarket', 'Tnt Supermarket', scrape_error, False, None),
+        ('nofrills', 'No Frills', scrape_nothing, True, None),
+    ])
+    diffs = update_data.update_data(concurrency=2, fetch_mode='selenium')
+
+    data = saved(data_folder)
+    assert data['galleria'] == [{'name': 'Fresh Item', 'price': '$1.00'}]
+    assert data['foodbasics'] == [{'name': 'Old Food Basics', 'price': '$2.00'}]
+    assert data['tnt_supermarket'] == [{'name': 'Old T&T', 'price': '$2.00'}]
+    assert data['nofrills'] == [{'name': 'Old No Frills', 'price': '$2.00'}]
+    assert [store for store, diff in diffs.items() if diff.changed] == ['galleria']
+
+
+def test_http_only_mode_keeps_selenium_only_stores(data_folder, monkeypatch):
+    monkeypatch.setattr(update_data, 'SCRAPERS', [
+        ('galleria', 'Galleria', scrape_one, False, lambda fetcher, items: scrape_one(None, items)),
+        ('nofrills', 'No Frills', scrape_one, True, None),
+    ])
+    update_data.update_data(concurrency=2, fetch_mode='http')
+
+    data = saved(data_folder)
+    assert data['galleria'] == [{'name': 'Fresh Item', 'price': '$1.00'}]
+    assert data['nofrills'] == [{'name': 'Old No Frills', 'price': '$2.00'}]
+    assert os.path.exists(data_folder / 'price_history.db')
+
+
+def test_run_where_every_store_failed_is_not_a_check(data_folder, monkeypatch):
+    monkeypatch.setattr(update_data, 'SCRAPERS', [
+        ('galleria', 'Galleria', scrape_nothing, False, None),
+        ('nofrills', 'No Frills', scrape_error, True, None),
+    ])
+    update_data.update_data(concurrency=2, fetch_mode='selenium')
+
+    storage = utils.flyer_db.create_flyer_storage(str(data_folder), 'json')
+    assert storage.last_checked() is None
+    assert saved(data_folder)['galleria'] == [{'name': 'Old Galleria', 'price': '$2.00'}]
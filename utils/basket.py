@@ -0,0 +1,189 @@
+import itertools
+
+import numpy as np
+
+from utils.sizes import item_size
+
+# Stores a basket may be split across unless the request asks otherwise
+DEFAULT_MAX_STORES = 2
+# List entries optimized per request; the rest of a longer list is ignored
+MAX_BASKET_ITEMS = 200
+
+
+def _quantity(entry):
+    try:
+        return max(int(entry.get('quantity') or 1), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def _locate(snapshot, entry):
+    """The row of the catalog item a list entry was added from, or None once it left the flyer"""
+    store = entry.get('store')
+    if store not in snapshot.data:
+        return None
+    rows = snapshot.find_rows(store, entry.get('name'))
+    # A name listed twice in one flyer: prefer the row with the price the user saw
+    for row in rows:
+        if snapshot.data[store][row].get('price') == entry.get('price'):
+            return row
+    return rows[0] if rows else None
+
+
+def basket_offers(snapshot, entry):
+    """
+    The equivalent item of every store for one list entry, as {store: (row, match score)}.
+
+    An entry still in its store's flyer uses that item's product group, or
+    a name match from it if it isn't grouped; an entry that left the flyer
+    is matched by its own name, its store included.
+    """
+    store = entry.get('store')
+    row = _locate(snapshot, entry)
+    if row is None:
+        return snapshot.matcher.match(entry.get('name'), item_size(entry))
+    group_id = snapshot.matcher.group_of.get((store, row))
+    if group_id is not None:
+        group = snapshot.matcher.groups[group_id]
+        offers = {member: (member_row, group.score) for member, member_row in group.members}
+    else:
+        offers = snapshot.matcher.match(entry.get('name'), item_size(snapshot.data[store][row]), exclude_store=store)
+    offers[store] = (row, 1.0)
+    return offers
+
+
+def _plan(stores, costs, lines, columns):
+    subset = costs[:, columns]
+    choice = subset.argmin(axis=1)
+    best = subset[np.arange(len(lines)), choice]
+    covered = np.isfinite(best)
+    assignments = {}
+    missing = []
+    for line, column, cost in zip(lines, choice, best):
+        if np.isfinite(cost):
+            assignments.setdefault(stores[columns[column]], []).append(line['id'])
+        else:
+            missing.append(line['id'])
+    return {
+        'stores': [stores[column] for column in columns if stores[column] in assignments],
+        'total': round(float(best[covered].sum()), 2),
+        'covered': int(covered.sum()),
+        'missing': missing,
+        'assignments': assignments,
+    }
+
+
+def _rank(plan):
+    # Covering more of the list beats a lower total, which beats visiting fewer stores
+    return -plan['covered'], plan['total'], len(plan['stores'])
+
+
+def optimize_basket(snapshot, entries, max_stores=DEFAULT_MAX_STORES):
+    """
+    The cheapest way to buy a shopping list at one store and across at most max_stores stores.
+
+    Each entry is priced at every store through basket_offers() into an
+    entries x stores cost matrix (quantity times price, inf where a store
+    has no priced offer). Every combination of up to max_stores stores is
+    then scored in one vectorized pass, each entry going to the cheapest
+    store of the combination; with the four flyer stores that is at most
+    15 combinations, whatever the size of the catalog.
+    """
+    stores = list(snapshot.data)
+    entries = [entry for entry in entries if isinstance(entry, dict)][:MAX_BASKET_ITEMS]
+    max_stores = min(max(max_stores, 1), len(stores))
+    costs = np.full((len(entries), len(stores)), np.inf)
+    lines = []
+    for index, entry in enumerate(entries):
+        quantity = _quantity(entry)
+        offers = {}
+        for store, (row, score) in basket_offers(snapshot, entry).items():
+            price = float(snapshot.columns[store].numeric_price[row])
+            if price <= 0:
+                continue
+            costs[index, stores.index(store)] = price * quantity
+            item = snapshot.data[store][row]
+            offers[store] = {
+                'name': item.get('name'),
+                'price': item.get('price'),
+                'numeric_price': price,
+                'total': round(price * quantity, 2),
+                'match_score': round(score, 3),
+            }
+        lines.append({'id': entry.get('id'), 'name': entry.get('name'), 'quantity': quantity, 'offers': offers})
+
+    if not lines:
+        return {'items': [], 'single_store': [], 'best_single_store': None, 'best_split': None,
+                'max_stores': max_stores, 'unmatched': []}
+    if not stores:
+        # Nothing scraped yet (a fresh install): no store carries any entry
+        missing = [line['id'] for line in lines]
+        return {'items': lines, 'single_store': [], 'best_single_store': None,
+                'best_split': {'stores': [], 'total': 0, 'covered': 0, 'missing': missing, 'assignments': {},
+                               'savings_vs_single_store': None},
+                'max_stores': max_stores, 'unmatched': missing}
+    single = sorted((dict(_plan(stores, costs, lines, (column,)), store=stores[column])
+                     for column in range(len(stores))), key=_rank)
+    best_split = min((_plan(stores, costs, lines, columns)
+                      for size in range(1, max_stores + 1)
+                      for columns in itertools.combinations(range(len(stores)), size)), key=_rank)
+    # Only comparable when both plans buy the same number of entries
+    best_split['savings_vs_single_store'] = round(single[0]['total'] - best_split['total'], 2) \
+        if best_split['covered'] == single[0]['covered'] else None
+    return {
+        'items': lines,
+        'single_store': single,
+        'best_single_store': single[0],
+        'best_split': best_split,
+        'max_stores': max_stores,
+        'unmatched': [line['id'] for line in lines if not line['offers']],
+    }
+
+
+if __name__ == '__main__':
+    # Benchmark: python -m utils.basket [catalog items] [list entries]
+    # A synthetic catalog of the same products under different names and prices in four stores.
+    import random
+    import sys
+    import time
+
+    from utils.catalog import CatalogSnapshot
+
+    catalog_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    list_size = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = random.Random(7)
+    letters = 'bcdfghjklmnprstvwz'
+    words = sorted({''.join(rng.choice(letters) + rng.choice('aeiou') for _ in range(3)) for _ in range(20000)})
+    stores = ['nofrills', 'foodbasics', 'galleria', 'tnt_supermarket']
+    data = {store: [] for store in stores}
+    items = 0
+    while items < catalog_size:
+        name, grams, price = ' '.join(rng.sample(words, 3)), rng.choice((100, 250, 500, 750, 1000)), rng.uniform(1, 20)
+        for store in rng.sample(stores, rng.randint(1, len(stores))):
+            items += 1
+            words_in_store = name.split() if rng.random() < 0.8 else name.split()[:2] + [rng.choice(words)]
+            data[store].append({'name': f"{' '.join(words_in_store).title()} {grams} g",
+                                'price': f"${price * rng.uniform(0.8, 1.2):.2f}", 'store': store})
+
+    start = time.perf_counter()
+    snapshot = CatalogSnapshot(1, data)
+    print(f"{snapshot.item_count} items: snapshot with product groups built in {time.perf_counter() - start:.1f}s "
+          f"({snapshot.matcher.stats()['groups']} groups)")
+    entries = []
+    for index in range(list_size):
+        store = rng.choice(stores)
+        item = rng.choice(data[store])
+        entries.append(dict(item, id=f"{store}-{index}", quantity=rng.randint(1, 3)))
+    # Entries whose flyer item is gone are matched by name alone
+    for entry in entries[::10]:
+        entry['price'] = '$0.01'
+        entry['name'] += ' Value'
+
+    for label in ('first request (builds the name index)', 'warm'):
+        start = time.perf_counter()
+        result = optimize_basket(snapshot, entries, max_stores=2)
+        print(f"{label}: {list_size} entries in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"best single store: {result['best_single_store']['store']} {result['best_single_store']['total']} "
+          f"({result['best_single_store']['covered']}/{list_size} entries)")
+    print(f"best split: {result['best_split']['stores']} {result['best_split']['total']} "
+          f"({result['best_split']['covered']}/{list_size} entries)")
@@ -0,0 +1,348 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from utils.columns import StoreColumns
+from utils.http_cache import json_body
+from utils.matching import ProductMatcher
+from utils.pagination import project
+from utils.prices import calculate_savings_percentage, parse_price
+from utils.search_index import SearchIndex
+from utils.statistics import DEFAULT_PRICE_RANGE_BOUNDS, DEFAULT_SAVINGS_RANGE_BOUNDS, StatisticsAggregate
+from utils.unit_prices import UNIT_BASES, UNIT_PRICE_SOURCES, unit_price
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Recently replaced snapshots stay reachable by version so paging cursors
+# issued just before a reload keep returning consistent pages
+RETAINED_SNAPSHOTS = 2
+# Field projections whose encoded items a snapshot keeps; the UI uses one, API clients a few more
+MAX_FRAGMENT_PROJECTIONS = 4
+
+
+def enhance_item(item):
+    """Compute the fields used for filtering and sorting a single flyer item"""
+    # Determine if item is on sale
+    has_original = item.get('original_price') and item.get('original_price') != 'N/A'
+    has_sale = item.get('price') and item.get('price') != 'N/A'
+    on_sale = bool(has_original and has_sale and item['original_price'] != item['price'])
+
+    # Calculate savings percentage
+    if on_sale:
+        savings_percentage = calculate_savings_percentage(item.get('original_price'), item.get('price'))
+    else:
+        savings_percentage = 0
+
+    # Extract numeric price for range filtering
+    numeric_price = parse_price(item.get('price', '0'))
+    # Price per 100 g / 100 ml / item, for comparing package sizes
+    unit = unit_price(item, numeric_price)
+
+    return {
+        'on_sale': on_sale,
+        'savings_percentage': savings_percentage,
+        'numeric_price': numeric_price,
+        'unit_price': round(unit[0], 4) if unit else None,
+        'unit_basis': unit[1] if unit else '',
+        'unit_price_source': unit[2] if unit else '',
+    }
+
+
+def build_store_columns(store, items):
+    """Parse a store's items once into the columnar arrays used by queries"""
+    enhanced = [enhance_item(item) for item in items]
+    return StoreColumns(
+        store,
+        names=[item.get('name') or '' for item in items],
+        numeric_price=[fields['numeric_price'] for fields in enhanced],
+        original_price=[parse_price(item.get('original_price')) for item in items],
+        savings=[fields['savings_percentage'] for fields in enhanced],
+        on_sale=[fields['on_sale'] for fields in enhanced],
+        unit_price=[fields['unit_price'] for fields in enhanced],
+        unit_basis=[UNIT_BASES.index(fields['unit_basis']) for fields in enhanced],
+        unit_source=[UNIT_PRICE_SOURCES.index(fields['unit_price_source']) for fields in enhanced],
+    )
+
+
+class CatalogSnapshot:
+    """
+    An immutable view of the flyer data at one point in time.
+
+    Readers keep a reference to the snapshot they started with, so a reload
+    that swaps in a new snapshot never changes data under a running request.
+    """
+
+    def __init__(self, version, data, mtime=None, size=None, price_bounds=DEFAULT_PRICE_RANGE_BOUNDS,
+                 savings_bounds=DEFAULT_SAVINGS_RANGE_BOUNDS, segment_hashes=None, base=None, file_key=None):
+        self.version = version
+        self.data = data
+        self.mtime = mtime
+        self.size = size
+        self.file_key = file_key
+        self.segment_hashes = segment_hashes or {}
+        self.loaded_at = time.time()
+        self.columns = {}
+        self.search_indexes = {}
+        self.rebuilt_stores = []
+        self._fragments = OrderedDict()  # {fields: {store: [encoded item or None]}}
+        self._fragments_lock = threading.Lock()
+        self._rows_by_name = None  # {(store, lowercased name): [rows]}, built on first use
+        for store, items in data.items():
+            # Stores whose segment didn't change share their columns and index with the base snapshot
+            if base is not None and base.data.get(store) is items:
+                self.columns[store] = base.columns[store]
+                self.search_indexes[store] = base.search_indexes[store]
+            else:
+                self.columns[store] = build_store_columns(store, items)
+                self.search_indexes[store] = SearchIndex(items)
+                self.rebuilt_stores.append(store)
+        self.statistics = StatisticsAggregate(version, self.columns, price_bounds, savings_bounds)
+        # Cross-store groups depend on every store, so they are rebuilt whenever any segment changes
+        self.matcher = base.matcher if base is not None and not self.rebuilt_stores \
+            and list(data) == list(base.data) else ProductMatcher(data)
+
+    @property
+    def item_count(self):
+        return sum(len(items) for items in self.data.values())
+
+    def search(self, store, query):
+        """Return the sorted row positions of a store's items that match the query"""
+        index = self.search_indexes.get(store)
+        return sorted(index.search(query)) if index else []
+
+    def query(self, store, search=None, sale_filter='all', min_price=None, max_price=None,
+              min_savings=0, sort_by='name', sort_order='asc', unit_basis=None, min_unit_price=None,
+              max_unit_price=None):
+        """Return the rows of a store that pass the filters, in sorted order"""
+        columns = self.columns.get(store)
+        if columns is None:
+            return []
+        candidates = self.search(store, search) if search else None
+        mask = columns.mask(candidates, sale_filter, min_price, max_price, min_savings,
+                            unit_basis, min_unit_price, max_unit_price)
+        return columns.select(mask, sort_by, sort_order)
+
+    def compare(self, search=None, min_stores=2):
+        """
+        Cross-store product groups with every store's offer, cheapest first.
+
+        Groups are sorted by how much the cheapest offer saves over the most
+        expensive one; offers without a parseable price are listed last.
+        """
+        results = []
+        for group in self.matcher.search(search):
+            if len(group.members) < min_stores:
+                continue
+            offers = []
+            for store, row in group.members:
+                offer = self.item(store, row)
+                offer['store_key'] = store
+                offers.append(offer)
+            offers.sort(key=lambda offer: (offer['numeric_price'] <= 0, offer['numeric_price']))
+            priced = [offer['numeric_price'] for offer in offers if offer['numeric_price'] > 0]
+            spread = round((max(priced) - min(priced)) / max(priced) * 100, 1) if len(priced) > 1 else 0
+            results.append({
+                'id': group.id,
+                'name': group.name,
+                'size': group.size.to_dict() if group.size else None,
+                'match_score': group.score,
+                'stores': len(offers),
+                'cheapest': offers[0] if priced else None,
+                'offers': offers,
+                'savings_vs_highest': spread,
+            })
+        results.sort(key=lambda result: (-result['savings_vs_highest'], result['name'].lower()))
+        return results
+
+    def find_rows(self, store, name):
+        """Rows of a store's items with exactly this name, ignoring case"""
+        if self._rows_by_name is None:
+            # Concurrent first lookups may both build the index; either copy is complete
+            rows_by_name = {}
+            for store_key, items in self.data.items():
+                for row, item in enumerate(items):
+                    rows_by_name.setdefault((store_key, (item.get('name') or '').strip().lower()), []).append(row)
+            self._rows_by_name = rows_by_name
+        return self._rows_by_name.get((store, (name or '').strip().lower()), [])
+
+    def item(self, store, row):
+        """Build the JSON dict for one row, including its computed fields"""
+        columns = self.columns[store]
+        item = dict(self.data[store][row])
+        item['on_sale'] = bool(columns.on_sale[row])
+        item['savings_percentage'] = float(columns.savings[row])
+        item['numeric_price'] = float(columns.numeric_price[row])
+        basis = int(columns.unit_basis[row])
+        item['unit_price'] = float(columns.unit_price[row]) if basis else None
+        item['unit_basis'] = UNIT_BASES[basis] or None
+        return item
+
+    def encoded_items(self, store, rows, fields=None):
+        """
+        Yield the JSON bytes of each row's item, projected to fields.
+
+        Every (row, fields) is encoded at most once per snapshot, so repeated
+        streaming requests only join pre-encoded fragments.
+        """
+        with self._fragments_lock:
+            stores = self._fragments.get(fields)
+            if stores is None:
+                stores = self._fragments[fields] = {}
+                while len(self._fragments) > MAX_FRAGMENT_PROJECTIONS:
+                    self._fragments.popitem(last=False)
+            else:
+                self._fragments.move_to_end(fields)
+            fragments = stores.get(store)
+            if fragments is None:
+                fragments = stores[store] = [None] * len(self.data[store])
+        for row in rows:
+            fragment = fragments[row]
+            if fragment is None:
+                # Concurrent requests may encode the same row twice; both produce the same bytes
+                fragment = json_body(project(self.item(store, row), fields))
+                if isinstance(fragment, str):
+                    fragment = fragment.encode('utf-8')
+                fragments[row] = fragment
+            yield fragment
+
+    def unit_price_coverage(self):
+        """Share of items with a normalized unit price, per store and overall"""
+        stores = {store: columns.unit_price_coverage() for store, columns in self.columns.items()}
+        items = sum(entry['items'] for entry in stores.values())
+        parsed = sum(entry['parsed'] for entry in stores.values())
+        return {
+            'items': items,
+            'parsed': parsed,
+            'coverage': round(parsed / items * 100, 1) if items else 0,
+            'stores': stores,
+        }
+
+
+class FlyerCatalog:
+    """
+    Process-wide, in-memory cache of the flyer data and its derived columns.
+
+    The store's manifest (FlyerStore or FlyerDatabase) is only re-read when its mtime or size changes
+    (or when reload() is called explicitly, e.g. after update_data finishes).
+    Only the store segments whose hash changed are read and re-indexed; the
+    rest are carried over from the current snapshot. The new snapshot is
+    swapped in with a single assignment, so readers never see a half-built
+    catalog.
+    """
+
+    def __init__(self, flyer_store, price_bounds=DEFAULT_PRICE_RANGE_BOUNDS,
+                 savings_bounds=DEFAULT_SAVINGS_RANGE_BOUNDS):
+        self.flyer_store = flyer_store
+        self.price_bounds = tuple(price_bounds)
+        self.savings_bounds = tuple(savings_bounds)
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._file_key = None
+        self._recent = OrderedDict()
+        self._reload_listeners = []
+        self.hits = 0
+        self.reloads = 0
+        self.last_reload_seconds = 0.0
+        self.total_reload_seconds = 0.0
+        self.last_rebuilt_stores = []
+
+    def _stat_key(self):
+        return self.flyer_store.stat_key()
+
+    def _read_data(self):
+        """Read the manifest and only the segments that differ from the current snapshot"""
+        manifest = self.flyer_store.read_manifest()
+        current = self._snapshot
+        if manifest is None or current is None:
+            data, hashes = self.flyer_store.load()
+            return data, hashes, None
+
+        data = {}
+        hashes = {}
+        for store, entry in manifest['stores'].items():
+            hashes[store] = entry['hash']
+            if current.segment_hashes.get(store) == entry['hash'] and store in current.data:
+                data[store] = current.data[store]
+            else:
+                data[store] = self.flyer_store.read_segment(store)
+        return data, hashes, current
+
+    def _build_snapshot(self, file_key):
+        if file_key:
+            version = f"{file_key[0]:x}-{file_key[1]:x}"
+            mtime, size = file_key[0] / 1e9, file_key[1]
+        else:
+            version, mtime, size = 'empty', None, None
+        data, hashes, base = self._read_data()
+        return CatalogSnapshot(version, data, mtime, size, self.price_bounds, self.savings_bounds,
+                               segment_hashes=hashes, base=base, file_key=file_key)
+
+    def _load(self, file_key):
+        start = time.perf_counter()
+        snapshot = self._build_snapshot(file_key)
+        elapsed = time.perf_counter() - start
+
+        self._snapshot = snapshot
+        self._file_key = file_key
+        self._recent[snapshot.version] = snapshot
+        self._recent.move_to_end(snapshot.version)
+        while len(self._recent) > RETAINED_SNAPSHOTS:
+            self._recent.popitem(last=False)
+        self.reloads += 1
+        self.last_reload_seconds = elapsed
+        self.total_reload_seconds += elapsed
+        self.last_rebuilt_stores = snapshot.rebuilt_stores
+        logging.info(f"Flyer catalog loaded {snapshot.item_count} items (version {snapshot.version}, "
+                     f"rebuilt {len(snapshot.rebuilt_stores)}/{len(snapshot.data)} stores) "
+                     f"in {elapsed * 1000:.1f} ms.")
+
+        for listener in self._reload_listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logging.error(f"Error in catalog reload listener: {e}")
+        return snapshot
+
+    def add_reload_listener(self, listener):
+        """Register a callable that receives every newly loaded snapshot"""
+        self._reload_listeners.append(listener)
+
+    def get(self):
+        """Return the current snapshot, reloading first if the file changed on disk"""
+        file_key = self._stat_key()
+        snapshot = self._snapshot
+        if snapshot is None or file_key != self._file_key:
+            with self._lock:
+                # Another thread may have reloaded while we waited for the lock
+                if self._snapshot is None or file_key != self._file_key:
+                    return self._load(file_key)
+                snapshot = self._snapshot
+        self.hits += 1
+        return snapshot
+
+    def get_version(self, version):
+        """Return the snapshot with the given version if it is still retained"""
+        current = self.get()
+        if current.version == version:
+            return current
+        return self._recent.get(version)
+
+    def reload(self):
+        """Force a reload regardless of the file's mtime/size"""
+        with self._lock:
+            return self._load(self._stat_key())
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'items': snapshot.item_count if snapshot else 0,
+            'hits': self.hits,
+            'reloads': self.reloads,
+            'last_reload_ms': round(self.last_reload_seconds * 1000, 2),
+            'total_reload_ms': round(self.total_reload_seconds * 1000, 2),
+            'last_rebuilt_stores': self.last_rebuilt_stores,
+            'matching': snapshot.matcher.stats() if snapshot else None,
+            'unit_prices': snapshot.unit_price_coverage() if snapshot else None,
+        }
@@ -0,0 +1,120 @@
+import numpy as np
+
+from utils.unit_prices import UNIT_BASES, UNIT_PRICE_SOURCES
+
+# Stable numeric codes so rows from several stores can share one array
+STORE_CODES = {
+    "galleria": 1,
+    "tnt_supermarket": 2,
+    "foodbasics": 3,
+    "nofrills": 4,
+}
+
+SORT_KEYS = ('name', 'price', 'savings', 'unit_price')
+SORT_ORDERS = ('asc', 'desc')
+
+
+def _stable_argsort(values, descending):
+    # Python's sort(reverse=True) keeps equal items in their original order,
+    # so descending order is taken from the negated values rather than by
+    # flipping the ascending permutation. NaNs (unknown values) sort last
+    # either way.
+    if descending:
+        values = -values
+    return np.argsort(values, kind='stable')
+
+
+class StoreColumns:
+    """
+    Columnar, NumPy-backed copy of one store's computed flyer fields.
+
+    Filters are evaluated as boolean masks over these arrays, and the sort
+    permutations for every supported (sort_by, sort_order) pair are computed
+    once when the catalog loads, so a query never sorts at request time.
+    """
+
+    def __init__(self, store, names, numeric_price, original_price, savings, on_sale,
+                 unit_price=None, unit_basis=None, unit_source=None):
+        count = len(names)
+        self.store = store
+        self.numeric_price = np.asarray(numeric_price, dtype=np.float64)
+        self.original_price = np.asarray(original_price, dtype=np.float64)
+        self.savings = np.asarray(savings, dtype=np.float64)
+        self.on_sale = np.asarray(on_sale, dtype=bool)
+        self.store_code = np.full(count, STORE_CODES.get(store, 0), dtype=np.uint8)
+        # Normalized unit price (None becomes NaN), the index of its basis in UNIT_BASES and of its source
+        self.unit_price = np.asarray(unit_price if unit_price is not None else np.full(count, np.nan),
+                                     dtype=np.float64)
+        self.unit_basis = np.asarray(unit_basis if unit_basis is not None else np.zeros(count), dtype=np.uint8)
+        self.unit_source = np.asarray(unit_source if unit_source is not None else np.zeros(count), dtype=np.uint8)
+
+        lowered = [name.lower() for name in names]
+        by_name = sorted(range(count), key=lowered.__getitem__)
+        by_name_desc = sorted(range(count), key=lowered.__getitem__, reverse=True)
+        self.permutations = {
+            ('name', 'asc'): np.asarray(by_name, dtype=np.intp),
+            ('name', 'desc'): np.asarray(by_name_desc, dtype=np.intp),
+            ('price', 'asc'): _stable_argsort(self.numeric_price, False),
+            ('price', 'desc'): _stable_argsort(self.numeric_price, True),
+            ('savings', 'asc'): _stable_argsort(self.savings, False),
+            ('savings', 'desc'): _stable_argsort(self.savings, True),
+            ('unit_price', 'asc'): _stable_argsort(self.unit_price, False),
+            ('unit_price', 'desc'): _stable_argsort(self.unit_price, True),
+        }
+
+    def __len__(self):
+        return len(self.numeric_price)
+
+    def mask(self, candidates=None, sale_filter='all', min_price=None, max_price=None, min_savings=0,
+             unit_basis=None, min_unit_price=None, max_unit_price=None):
+        """Build the boolean row mask for the given filters"""
+        if candidates is None:
+            mask = np.ones(len(self), dtype=bool)
+        else:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[np.asarray(candidates, dtype=np.intp)] = True
+
+        if sale_filter == 'on_sale':
+            mask &= self.on_sale
+        elif sale_filter == 'not_on_sale':
+            mask &= ~self.on_sale
+
+        if min_price is not None:
+            mask &= self.numeric_price >= min_price
+        if max_price is not None:
+            mask &= self.numeric_price <= max_price
+        if min_savings:
+            mask &= self.savings >= min_savings
+        # Rows without a unit price are NaN, which fails every comparison
+        if unit_basis:
+            if unit_basis in UNIT_BASES:
+                mask &= self.unit_basis == UNIT_BASES.index(unit_basis)
+            else:
+                mask[:] = False
+        if min_unit_price is not None:
+            mask &= self.unit_price >= min_unit_price
+        if max_unit_price is not None:
+            mask &= self.unit_price <= max_unit_price
+        return mask
+
+    def select(self, mask, sort_by='name', sort_order='asc'):
+        """Return the rows selected by mask, in the requested order"""
+        if sort_by not in SORT_KEYS:
+            sort_by = 'name'
+        if sort_order not in SORT_ORDERS:
+            sort_order = 'asc'
+        permutation = self.permutations[(sort_by, sort_order)]
+        return permutation[mask[permutation]]
+
+    def unit_price_coverage(self):
+        """How many rows have a unit price, by basis and by source"""
+        parsed = int(np.count_nonzero(self.unit_basis))
+        return {
+            'items': len(self),
+            'parsed': parsed,
+            'coverage': round(parsed / len(self) * 100, 1) if len(self) else 0,
+            'by_basis': {basis: int(np.count_nonzero(self.unit_basis == code))
+                         for code, basis in enumerate(UNIT_BASES) if code},
+            'by_source': {source: int(np.count_nonzero(self.unit_source == code))
+                          for code, source in enumerate(UNIT_PRICE_SOURCES) if code},
+        }
@@ -0,0 +1,384 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from utils.catalog import enhance_item
+from utils.columns import SORT_KEYS, SORT_ORDERS
+from utils.flyer_store import FlyerStore, diff_store, segment_hash
+from utils.prices import parse_price
+from utils.search_index import _TOKEN_RE, item_search_text
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 'sqlite' (default) or 'json' for the per-store JSON segments
+STORAGE = os.environ.get('FLYER_STORAGE', 'sqlite')
+DATABASE_FILE = 'flyers.db'
+
+# FTS5's trigram tokenizer can only answer terms of at least this many characters
+MIN_FTS_TERM = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    store TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    search_text TEXT NOT NULL,
+    numeric_price REAL NOT NULL,
+    original_price REAL NOT NULL,
+    savings REAL NOT NULL,
+    on_sale INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    unit_price REAL,
+    unit_basis TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS items_store_position ON items(store, position);
+CREATE INDEX IF NOT EXISTS items_store_price ON items(store, numeric_price);
+CREATE INDEX IF NOT EXISTS items_store_savings ON items(store, savings);
+CREATE INDEX IF NOT EXISTS items_store_name ON items(store, name_key);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    search_text, content='items', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, search_text) VALUES (new.id, new.search_text);
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+END;
+
+CREATE TABLE IF NOT EXISTS segments (
+    store TEXT PRIMARY KEY,
+    ord INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY,
+    at TEXT NOT NULL,
+    store TEXT NOT NULL,
+    diff TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Created after _migrate() has added the unit price columns to older databases
+UNIT_PRICE_INDEX = "CREATE INDEX IF NOT EXISTS items_store_unit_price ON items(store, unit_basis, unit_price)"
+
+# ORDER BY clauses matching StoreColumns' permutations: ties keep scrape order
+ORDER_BY = {
+    ('name', 'asc'): 'name_key ASC, position ASC',
+    ('name', 'desc'): 'name_key DESC, position ASC',
+    ('price', 'asc'): 'numeric_price ASC, position ASC',
+    ('price', 'desc'): 'numeric_price DESC, position ASC',
+    ('savings', 'asc'): 'savings ASC, position ASC',
+    ('savings', 'desc'): 'savings DESC, position ASC',
+    # Items without a unit price (NULL) go last in both directions, like the NaNs in StoreColumns
+    ('unit_price', 'asc'): 'unit_price IS NULL, unit_price ASC, position ASC',
+    ('unit_price', 'desc'): 'unit_price IS NULL, unit_price DESC, position ASC',
+}
+
+
+def _item_row(store, position, item):
+    fields = enhance_item(item)
+    name = item.get('name') or ''
+    return (
+        store, position, name, name.lower(), item_search_text(item),
+        fields['numeric_price'], parse_price(item.get('original_price')), fields['savings_percentage'],
+        int(fields['on_sale']), json.dumps(item, ensure_ascii=False), fields['unit_price'], fields['unit_basis'],
+    )
+
+
+class FlyerDatabase:
+    """
+    Flyer data in a local SQLite database (WAL mode), one row per item.
+
+    Exposes the same interface as FlyerStore (stat_key, read_manifest,
+    read_segment, load, save, last_checked), so FlyerCatalog works on top of either, plus
+    query() for answering a filtered, sorted and limited flyer request
+    directly in SQL. Items are indexed on (store, price), (store, savings),
+    (store, name) and (store, unit basis, unit price), and their search
+    text in an FTS5 trigram index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+        self._migrate()
+        self._conn().execute(UNIT_PRICE_INDEX)
+
+    def _conn(self):
+        # sqlite3 connections can't be shared between threads, so each thread opens its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self):
+        """Add and fill the unit price columns in a database created before they existed"""
+        conn = self._conn()
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(items)")}
+        if 'unit_price' in columns:
+            return
+        with self._transaction(immediate=True) as conn:
+            conn.execute("ALTER TABLE items ADD COLUMN unit_price REAL")
+            conn.execute("ALTER TABLE items ADD COLUMN unit_basis TEXT NOT NULL DEFAULT ''")
+            rows = conn.execute("SELECT id, data FROM items").fetchall()
+            updates = []
+            for row in rows:
+                fields = enhance_item(json.loads(row['data']))
+                updates.append((fields['unit_price'], fields['unit_basis'], row['id']))
+            conn.executemany("UPDATE items SET unit_price = ?, unit_basis = ? WHERE id = ?", updates)
+        logging.info(f"Added unit prices to {len(updates)} items in {self.path}.")
+
+    def _transaction(self, immediate=False):
+        return _Transaction(self._conn(), 'BEGIN IMMEDIATE' if immediate else 'BEGIN')
+
+    def stat_key(self):
+        """(update time in ns, generation) of the last save, or None if nothing was saved yet"""
+        conn = self._conn()
+        rows = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('updated_ns', 'generation')"))
+        if 'generation' not in rows:
+            return None
+        return rows['updated_ns'], rows['generation']
+
+    def last_checked(self):
+        """When a scrape was last saved, changed or not, or None if no save recorded it"""
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'checked_ns'").fetchone()
+        return datetime.fromtimestamp(row[0] / 1e9) if row else None
+
+    def read_manifest(self):
+        conn = self._conn()
+        rows = conn.execute("SELECT store, hash, count, updated_at FROM segments ORDER BY ord").fetchall()
+        if not rows:
+            return None
+        return {'stores': {row['store']: {'hash': row['hash'], 'count': row['count'],
+                                          'updated_at': row['updated_at']} for row in rows}}
+
+    def read_segment(self, store):
+        conn = self._conn()
+        rows = conn.execute("SELECT data FROM items WHERE store = ? ORDER BY position", (store,))
+        return [json.loads(row[0]) for row in rows]
+
+    def load(self):
+        """Return ({store: items}, {store: segment hash}) for everything in the database"""
+        manifest = self.read_manifest()
+        if manifest is None:
+            return {}, {}
+        data = {store: self.read_segment(store) for store in manifest['stores']}
+        hashes = {store: entry['hash'] for store, entry in manifest['stores'].items()}
+        return data, hashes
+
+    def save(self, all_flyers_data, record_changes=True, updated_ns=None, checked=True):
+        """
+        Persist a full scrape, replacing only the stores whose content changed.
+
+        All inserts and deletes happen in one transaction, so readers see
+        either the previous data or the new data. updated_ns stamps when
+        the data was scraped, for imports of older files; it defaults to
+        now. The stat key only moves when something changed, while the
+        checked_ns meta key is stamped on every save unless checked is
+        False. Returns {store: StoreDiff}.
+        """
+        previous, hashes = self.load()
+        updated_ns = updated_ns or time.time_ns()
+        now = datetime.fromtimestamp(updated_ns / 1e9).isoformat(timespec='seconds')
+        diffs = {}
+        start = time.perf_counter()
+
+        with self._transaction(immediate=True) as conn:
+            for ord_, (store, items) in enumerate(all_flyers_data.items()):
+                diff = diff_store(store, previous.get(store, []), items)
+                diffs[store] = diff
+                if diff.changed or store not in hashes:
+                    conn.execute("DELETE FROM items WHERE store = ?", (store,))
+                    conn.executemany(
+                        "INSERT INTO items (store, position, name, name_key, search_text, numeric_price, "
+                        "original_price, savings, on_sale, data, unit_price, unit_basis) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (_item_row(store, position, item) for position, item in enumerate(items)),
+                    )
+                    conn.execute(
+                        "INSERT INTO segments (store, ord, hash, count, updated_at) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(store) DO UPDATE SET ord = excluded.ord, hash = excluded.hash, "
+                        "count = excluded.count, updated_at = excluded.updated_at",
+                        (store, ord_, segment_hash(items), len(items), now),
+                    )
+                    if record_changes and diff.changed:
+                        conn.execute("INSERT INTO changes (at, store, diff) VALUES (?, ?, ?)",
+                                     (now, store, json.dumps(diff.to_dict(), ensure_ascii=False)))
+                else:
+                    conn.execute("UPDATE segments SET ord = ? WHERE store = ?", (ord_, store))
+
+            dropped = [store for store in hashes if store not in all_flyers_data]
+            for store in dropped:
+                conn.execute("DELETE FROM items WHERE store = ?", (store,))
+                conn.execute("DELETE FROM segments WHERE store = ?", (store,))
+
+            if dropped or any(diff.changed for diff in diffs.values()) or set(hashes) != set(all_flyers_data):
+                conn.execute("INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                             "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+                conn.execute("INSERT INTO meta (key, value) VALUES ('updated_ns', ?) "
+                             "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (updated_ns,))
+            if checked:
+                conn.execute("INSERT INTO meta (key, value) VALUES ('checked_ns', ?) "
+                             "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (updated_ns,))
+
+        for store, diff in diffs.items():
+            if diff.changed:
+                summary = diff.summary()
+                logging.info(f"{store}: {summary['added']} added, {summary['removed']} removed, "
+                             f"{summary['price_changed']} price changes.")
+            else:
+                logging.info(f"{store}: unchanged, rows not rewritten.")
+        logging.info(f"Saved flyer data to {self.path} in {(time.perf_counter() - start) * 1000:.0f} ms.")
+        return diffs
+
+    def query(self, store, search=None, sale_filter='all', min_price=None, max_price=None, min_savings=0,
+              sort_by='name', sort_order='asc', limit=None, offset=0, stat_key=None, unit_basis=None,
+              min_unit_price=None, max_unit_price=None):
+        """
+        Filter, sort and page one store's items in SQL.
+
+        Matches CatalogSnapshot.query: `search` must occur as typed in the
+        item's name, unit or details. Returns (total, items), or None if the
+        database has been saved again since `stat_key`.
+        """
+        where = ["store = ?"]
+        params = [store]
+
+        if search:
+            search = search.lower()
+            terms = set(_TOKEN_RE.findall(search)) or {search}
+            fts_terms = [term for term in terms if len(term) >= MIN_FTS_TERM]
+            if fts_terms:
+                where.append("id IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)")
+                params.append(' AND '.join('"' + term.replace('"', '""') + '"' for term in fts_terms))
+            # The index only narrows by word; punctuation and spacing must match as typed
+            where.append("instr(search_text, ?) > 0")
+            params.append(search)
+
+        if sale_filter == 'on_sale':
+            where.append("on_sale = 1")
+        elif sale_filter == 'not_on_sale':
+            where.append("on_sale = 0")
+        if min_price is not None:
+            where.append("numeric_price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            where.append("numeric_price <= ?")
+            params.append(max_price)
+        if min_savings:
+            where.append("savings >= ?")
+            params.append(min_savings)
+        if unit_basis:
+            where.append("unit_basis = ?")
+            params.append(unit_basis)
+        if min_unit_price is not None:
+            where.append("unit_price >= ?")
+            params.append(min_unit_price)
+        if max_unit_price is not None:
+            where.append("unit_price <= ?")
+            params.append(max_unit_price)
+
+        if sort_by not in SORT_KEYS:
+            sort_by = 'name'
+        if sort_order not in SORT_ORDERS:
+            sort_order = 'asc'
+        order_by = ORDER_BY[(sort_by, sort_order)]
+        clause = ' AND '.join(where)
+
+        with self._transaction() as conn:
+            # Both statements read the same database snapshot inside the transaction
+            if stat_key is not None and self.stat_key() != stat_key:
+                return None
+            total = conn.execute(f"SELECT count(*) FROM items WHERE {clause}", params).fetchone()[0]
+            sql = (f"SELECT data, on_sale, savings, numeric_price, unit_price, unit_basis FROM items "
+                   f"WHERE {clause} ORDER BY {order_by}")
+            page_params = list(params)
+            if limit is not None:
+                sql += " LIMIT ? OFFSET ?"
+                page_params += [limit, offset]
+            elif offset:
+                sql += " LIMIT -1 OFFSET ?"
+                page_params.append(offset)
+            items = []
+            for row in conn.execute(sql, page_params):
+                item = json.loads(row['data'])
+                item['on_sale'] = bool(row['on_sale'])
+                item['savings_percentage'] = float(row['savings'])
+                item['numeric_price'] = float(row['numeric_price'])
+                item['unit_price'] = row['unit_price']
+                item['unit_basis'] = row['unit_basis'] or None
+                items.append(item)
+        return total, items
+
+    def export_json(self, path):
+        """Write the whole database in the legacy flyers.json format"""
+        data, _ = self.load()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return data
+
+
+class _Transaction:
+    """Context manager running a block in one SQLite transaction"""
+
+    def __init__(self, conn, begin='BEGIN'):
+        self.conn = conn
+        self.begin = begin
+
+    def __enter__(self):
+        self.conn.execute(self.begin)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def create_flyer_storage(data_folder, storage=None):
+    """
+    Open the configured flyer storage backend.
+
+    The SQLite database is seeded from the JSON segments (or a legacy
+    flyers.json) the first time it is opened, in a single transaction.
+    """
+    storage = storage or STORAGE
+    json_store = FlyerStore(data_folder)
+    if storage == 'json':
+        return json_store
+
+    database = FlyerDatabase(os.path.join(data_folder, DATABASE_FILE))
+    if database.read_manifest() is None:
+        data, _ = json_store.load()
+        if data:
+            logging.info(f"Importing {sum(len(items) for items in data.values())} items into {database.path}.")
+            # Keep the time the imported flyers were scraped, not the time of the import
+            database.save(data, record_changes=False, updated_ns=json_store.stat_key()[0])
+    return database
+
+
+if __name__ == '__main__':
+    # python -m utils.flyer_db export [path]: write the database out as flyers.json
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'export':
+        sys.exit("usage: python -m utils.flyer_db export [path]")
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.join('data', 'flyers.json')
+    exported = create_flyer_storage('data', 'sqlite').export_json(target)
+    print(f"Exported {sum(len(items) for items in exported.values())} items to {target}")
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SEGMENT_FOLDER = 'flyers'
+MANIFEST_FILE = 'manifest.json'
+CHANGE_LOG_FILE = 'changes.jsonl'
+CHECKED_FILE = 'checked.json'
+
+
+def item_key(item):
+    """Stable identity of a flyer item within its store: name, unit and image"""
+    return '|'.join(str(item.get(field) or '') for field in ('name', 'unit', 'image_url'))
+
+
+def segment_hash(items):
+    """Content hash of one store's items, used to detect changed segments"""
+    raw = json.dumps(items, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class StoreDiff:
+    """Items added, removed and repriced in one store between two snapshots"""
+
+    def __init__(self, store, added, removed, price_changed, changed):
+        self.store = store
+        self.added = added
+        self.removed = removed
+        self.price_changed = price_changed
+        self.changed = changed
+
+    def summary(self):
+        return {'added': len(self.added), 'removed': len(self.removed), 'price_changed': len(self.price_changed)}
+
+    def to_dict(self):
+        return {'added': self.added, 'removed': self.removed, 'price_changed': self.price_changed}
+
+
+def diff_store(store, old_items, new_items):
+    """
+    Compare two versions of a store's items by item_key.
+
+    Items sharing a key are paired up in order; unpaired ones count as
+    added or removed. `changed` is True whenever the segment differs at all,
+    including fields that are not tracked individually (e.g. details).
+    """
+    old_by_key = defaultdict(list)
+    for item in old_items:
+        old_by_key[item_key(item)].append(item)
+
+    added = []
+    price_changed = []
+    for item in new_items:
+        key = item_key(item)
+        previous = old_by_key.get(key)
+        if not previous:
+            added.append(item)
+            continue
+        old = previous.pop(0)
+        if old.get('price') != item.get('price') or old.get('original_price') != item.get('original_price'):
+            price_changed.append({
+                'key': key,
+                'name': item.get('name'),
+                'old_price': old.get('price'),
+                'new_price': item.get('price'),
+                'old_original_price': old.get('original_price'),
+                'new_original_price': item.get('original_price'),
+            })
+    removed = [item for items in old_by_key.values() for item in items]
+    changed = bool(added or removed or price_changed) or segment_hash(old_items) != segment_hash(new_items)
+    return StoreDiff(store, added, removed, price_changed, changed)
+
+
+def _write_atomic(path, data, indent=None):
+    folder = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        # mkstemp creates the file owner-only; give it the usual permissions of a data file
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class FlyerStore:
+    """
+    Flyer data persisted as one JSON segment per store plus a manifest.
+
+    The manifest records each segment's content hash, so an update only
+    rewrites the stores that actually changed and a reader can tell which
+    segments it needs to re-read. Each update's diff is appended to
+    changes.jsonl, and checked.json holds the time of the last scrape
+    even when it changed nothing. A legacy single flyers.json is read until the first
+    update writes the segmented layout.
+    """
+
+    def __init__(self, data_folder, legacy_file='flyers.json'):
+        self.folder = os.path.join(data_folder, SEGMENT_FOLDER)
+        self.manifest_path = os.path.join(self.folder, MANIFEST_FILE)
+        self.change_log_path = os.path.join(self.folder, CHANGE_LOG_FILE)
+        self.checked_path = os.path.join(self.folder, CHECKED_FILE)
+        self.legacy_path = os.path.join(data_folder, legacy_file)
+
+    def stat_key(self):
+        """(mtime_ns, size) of the file a reader should watch, or None if there is no data"""
+        for path in (self.manifest_path, self.legacy_path):
+            try:
+                stat = os.stat(path)
+                return stat.st_mtime_ns, stat.st_size
+            except OSError:
+                continue
+        return None
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def last_checked(self):
+        """When a scrape was last saved, changed or not, or None if no save recorded it"""
+        try:
+            with open(self.checked_path, 'r', encoding='utf-8') as f:
+                return datetime.fromisoformat(json.load(f)['checked_at'])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+            return None
+
+    def segment_path(self, store):
+        return os.path.join(self.folder, f"{store}.json")
+
+    def read_segment(self, store):
+        try:
+            with open(self.segment_path(store), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            logging.warning(f"Flyer segment for {store} is missing or corrupted.")
+            return []
+
+    def read_legacy(self):
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            logging.info("flyers.json not found or is empty/corrupted. Initializing with empty data.")
+            return {}
+
+    def load(self):
+        """Return ({store: items}, {store: segment hash}) for everything on disk"""
+        manifest = self.read_manifest()
+        if manifest is None:
+            data = self.read_legacy()
+            return data, {store: segment_hash(items) for store, items in data.items()}
+        data = {store: self.read_segment(store) for store in manifest['stores']}
+        hashes = {store: entry['hash'] for store, entry in manifest['stores'].items()}
+        return data, hashes
+
+    def save(self, all_flyers_data, checked=True):
+        """
+        Persist a full scrape, rewriting only the segments whose content changed.
+
+        The manifest, and so the last-updated time, only moves when a segment
+        changed; checked.json is stamped on every save unless checked is False
+        (a run in which every store failed). Returns {store: StoreDiff}
+        against the previously saved data.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        previous, _ = self.load()
+        manifest = self.read_manifest() or {'stores': {}}
+        now = datetime.now().isoformat(timespec='seconds')
+
+        diffs = {}
+        stores = {}
+        for store, items in all_flyers_data.items():
+            diff = diff_store(store, previous.get(store, []), items)
+            diffs[store] = diff
+            entry = manifest['stores'].get(store)
+            if diff.changed or entry is None or not os.path.exists(self.segment_path(store)):
+                _write_atomic(self.segment_path(store), items, indent=2)
+                entry = {'file': os.path.basename(self.segment_path(store)), 'hash': segment_hash(items),
+                         'count': len(items), 'updated_at': now}
+            stores[store] = entry
+
+        changed = [store for store, diff in diffs.items() if diff.changed]
+        if changed or set(stores) != set(manifest['stores']):
+            # The manifest is written last, so readers never see a hash whose segment isn't on disk
+            _write_atomic(self.manifest_path, {'updated_at': now, 'stores': stores}, indent=2)
+        if changed:
+            with open(self.change_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'at': now, 'stores': {store: diffs[store].to_dict() for store in changed}},
+                                   ensure_ascii=False) + '\n')
+        if checked:
+            _write_atomic(self.checked_path, {'checked_at': now})
+
+        for store, diff in diffs.items():
+            if diff.changed:
+                summary = diff.summary()
+                logging.info(f"{store}: {summary['added']} added, {summary['removed']} removed, "
+                             f"{summary['price_changed']} price changes.")
+            else:
+                logging.info(f"{store}: unchanged, segment not rewritten.")
+        return diffs
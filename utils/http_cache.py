@@ -0,0 +1,221 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder produces the same bytes
+    orjson = None
+
+# Bodies smaller than this are sent uncompressed; the framing overhead isn't worth it
+MIN_COMPRESS_SIZE = 512
+MAX_CACHED_BODIES = 256
+MAX_CACHED_BYTES = 64 * 1024 * 1024
+CACHE_TTL_SECONDS = 600
+
+
+def make_etag(*parts):
+    """Derive a strong ETag from the catalog version and normalized request parameters"""
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def json_body(data):
+    """Serialize data compactly with sorted keys, ready to be cached as a response body"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+        except TypeError:  # e.g. non-string keys, which the standard encoder converts
+            pass
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def negotiate_encoding():
+    """Pick the best compression the client accepts: br, then gzip, else identity"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+class CachedBody:
+    """A serialized response body with its compressed variants computed on first use"""
+
+    def __init__(self, body):
+        self.body = body if isinstance(body, bytes) else body.encode('utf-8')
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        if not encoding or len(self.body) < MIN_COMPRESS_SIZE:
+            return None, self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    if encoding == 'br':
+                        data = brotli.compress(self.body, quality=5)
+                    else:
+                        data = gzip.compress(self.body, compresslevel=6)
+                    self._encoded[encoding] = data
+        return encoding, data
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized (and precompressed) response bodies.
+
+    Keys combine the catalog version with the normalized query, so a new
+    flyers.json can never serve stale bytes; invalidate() additionally frees
+    the old version's entries as soon as the catalog reloads. Entries expire
+    after ttl seconds and the least recently used ones are evicted once
+    either max_entries or max_bytes is exceeded.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_BODIES, max_bytes=MAX_CACHED_BYTES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {(version, key): (expires_at, CachedBody)}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _remove(self, cache_key):
+        _, entry = self._entries.pop(cache_key)
+        self._bytes -= len(entry.body)
+
+    def get_or_build(self, version, key, build):
+        cache_key = (version, key)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(cache_key)
+            if cached is not None:
+                if cached[0] > now:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return cached[1]
+                self._remove(cache_key)
+                self.expirations += 1
+            self.misses += 1
+
+        # Build outside the lock; two concurrent misses may both build, which is harmless
+        entry = CachedBody(build())
+        with self._lock:
+            if cache_key in self._entries:
+                self._remove(cache_key)
+            self._entries[cache_key] = (now + self.ttl, entry)
+            self._bytes += len(entry.body)
+            while len(self._entries) > self.max_entries or (self._bytes > self.max_bytes and len(self._entries) > 1):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self):
+        """Drop every cached body, e.g. after the catalog reloads"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get('RESPONSE_CACHE_SIZE', MAX_CACHED_BODIES)),
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_BYTES', MAX_CACHED_BYTES)),
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', CACHE_TTL_SECONDS)),
+)
+
+
+def conditional_response(version, key, build, last_modified=None, mimetype='application/json'):
+    """
+    Serve a cached body for (version, key) with validators and compression.
+
+    A request whose If-None-Match already holds the ETag gets a 304 without
+    the body ever being built. Each content-coding gets its own strong ETag.
+    """
+    encoding = negotiate_encoding()
+    etag = f"{make_etag(version, key)}.{encoding or 'identity'}"
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        entry = response_cache.get_or_build(version, key, build)
+        encoding, data = entry.encoded(encoding)
+        response = Response(data, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response.make_conditional(request)
+
+
+def streaming_response(version, key, generate, mimetype='application/json'):
+    """
+    Stream the chunks of generate() with the same validators as conditional_response.
+
+    The body is never held in memory or cached. Identity bodies are
+    byte-identical to the cached ones and share their ETag; gzip is applied
+    chunk by chunk, flushing after each so clients can parse as it arrives.
+    """
+    encoding = 'gzip' if request.accept_encodings['gzip'] else None
+    etag = f"{make_etag(version, key)}.{'gzip-stream' if encoding else 'identity'}"
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        chunks = generate()
+        if encoding:
+            chunks = _gzip_chunks(chunks)
+        response = Response(chunks, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,151 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from stores.progress import scrape_progress
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Finished jobs kept around so clients can still read their final status
+MAX_JOB_HISTORY = 10
+# Seconds between SSE keep-alive comments while nothing happens
+HEARTBEAT_SECONDS = 15
+
+
+class UpdateJob:
+    """
+    One background run of the data update, with its progress and event log.
+
+    Every progress event gets an increasing sequence number, so event
+    stream clients can resume with Last-Event-ID after a reconnect.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = 'running'
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.error = None
+        self.result = None
+        self.requests = 1
+        self.stores = {}
+        self.pages = {}
+        self._events = []
+        self._cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status != 'running'
+
+    def publish(self, event, data):
+        with self._cond:
+            if event == 'store':
+                self.stores.setdefault(data['store'], {}).update(data)
+            elif event == 'page':
+                pages = self.pages.setdefault(data['label'], {'pages': 0, 'items': 0})
+                pages['pages'] += 1
+                pages['items'] += data['items']
+            self._events.append((len(self._events) + 1, event, data))
+            self._cond.notify_all()
+
+    def finish(self, result=None, error=None):
+        # Status and the final event change together, so a stream never sees one without the other
+        with self._cond:
+            self.status = 'failed' if error else 'succeeded'
+            self.result = result
+            self.error = error
+            self.finished_at = datetime.now()
+            self.publish('done', self.to_dict())
+
+    def events_after(self, seq, timeout=None):
+        """Return the events after seq, waiting up to timeout for one if there are none yet"""
+        with self._cond:
+            if len(self._events) <= seq and not self.done:
+                self._cond.wait(timeout)
+            return self._events[seq:]
+
+    def to_dict(self):
+        with self._cond:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'created_at': self.created_at.isoformat(),
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+                'requests': self.requests,
+                'stores': {store: dict(progress) for store, progress in self.stores.items()},
+                'pages': {label: dict(pages) for label, pages in self.pages.items()},
+                'result': self.result,
+                'error': self.error,
+            }
+
+
+class JobRunner:
+    """
+    Runs `target` on a background thread, one job at a time.
+
+    A start() while a job is running joins that job instead of starting a
+    second scrape, so concurrent refresh requests are coalesced into one run.
+    """
+
+    def __init__(self, target, history=MAX_JOB_HISTORY):
+        self.target = target
+        self.history = history
+        self._jobs = OrderedDict()
+        self._current = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Return (job, started), where started is False if an existing run was joined"""
+        with self._lock:
+            current = self._current
+            if current is not None and not current.done:
+                current.requests += 1
+                return current, False
+            job = UpdateJob()
+            self._current = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job,), name=f"update-{job.id}", daemon=True).start()
+        return job, True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def current(self):
+        return self._current
+
+    def _run(self, job):
+        listener = job.publish
+        scrape_progress.add_listener(listener)
+        start = time.perf_counter()
+        try:
+            result = self.target()
+        except Exception as e:
+            logging.error(f"Update job {job.id} failed: {e}")
+            job.finish(error=str(e))
+        else:
+            logging.info(f"Update job {job.id} finished in {time.perf_counter() - start:.1f}s.")
+            job.finish(result=result)
+        finally:
+            scrape_progress.remove_listener(listener)
+
+
+def sse_stream(job, last_event_id=0):
+    """Yield a job's events as Server-Sent Events until it has finished"""
+    seq = last_event_id
+    while True:
+        events = job.events_after(seq, timeout=HEARTBEAT_SECONDS)
+        if not events:
+            if job.done:
+                return
+            yield ": keep-alive\n\n"
+            continue
+        for seq, event, data in events:
+            yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+            if event == 'done':
+                return
@@ -0,0 +1,231 @@
+import math
+import re
+import time
+from collections import ChainMap, defaultdict
+
+from utils.search_index import _TOKEN_RE
+from utils.sizes import UNITS, item_size
+
+# Tokens carried by more items than this are too common to block on ("sauce", "tea");
+# they still count towards the similarity score of pairs found through rarer tokens.
+MAX_BLOCK_SIZE = 40
+# Weighted Jaccard needed to match two items whose sizes agree, and when either size is unknown
+MATCH_THRESHOLD = 0.5
+SIZELESS_THRESHOLD = 0.75
+# Items scored per lookup in match(); postings are taken rarest token first until this many are collected
+MAX_MATCH_CANDIDATES = 200
+
+_WORD_RE = re.compile(r'[a-z]+')
+_PERCENT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+
+STOPWORDS = {
+    'and', 'with', 'the', 'of', 'in', 'for', 'or', 'no', 'a', 'an', 'de', 'la', 'le', 'du', 'et',
+    'pack', 'multi', 'value', 'size', 'family', 'new', 'fresh', 'frozen', 'assorted', 'selected', 'variety',
+    'cold', 'box', 'bag', 'pouch', 'bottle', 'can', 'cans', 'tray', 'x',
+} | set(UNITS)
+
+SYNONYMS = {
+    'flavour': 'flavor',
+    'flavoured': 'flavor',
+    'flavored': 'flavor',
+    'colour': 'color',
+    'yoghurt': 'yogurt',
+    'ramyun': 'ramen',
+    'ramyeon': 'ramen',
+}
+
+
+def name_tokens(name):
+    """Normalized word tokens of a product name: lowercased, sizes and filler words dropped, light stemming"""
+    tokens = set()
+    for word in _WORD_RE.findall((name or '').lower()):
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        word = SYNONYMS.get(word, word)
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.add(word)
+    return frozenset(tokens)
+
+
+def name_percentages(name):
+    """Percentages in a name ('2%' milk fat, '70%' cocoa); differing ones mean different products"""
+    return frozenset(float(value) for value in _PERCENT_RE.findall(name or ''))
+
+
+class _Entry:
+    __slots__ = ('store', 'row', 'tokens', 'size', 'percentages')
+
+    def __init__(self, store, row, tokens, size, percentages):
+        self.store = store
+        self.row = row
+        self.tokens = tokens
+        self.size = size
+        self.percentages = percentages
+
+
+class ProductGroup:
+    """Likely-equivalent items from different stores, at most one per store"""
+
+    __slots__ = ('id', 'members', 'name', 'size', 'search_text', 'score')
+
+    def __init__(self, group_id, members, name, size, score):
+        self.id = group_id
+        self.members = members  # [(store, row)]
+        self.name = name
+        self.size = size
+        self.score = score
+        self.search_text = ''
+
+
+class ProductMatcher:
+    """
+    Groups equivalent items across stores.
+
+    Candidate pairs come from token blocking: an inverted index from each
+    normalized name token to the items carrying it, skipping tokens that are
+    too common, so only items sharing a rare-enough token are ever compared.
+    Pairs are scored by IDF-weighted Jaccard similarity and must have
+    compatible package sizes and no conflicting percentages. Accepted pairs
+    are merged greedily, best score first, never putting two items of the
+    same store in one group.
+    """
+
+    def __init__(self, data):
+        start = time.perf_counter()
+        entries = []
+        for store, items in data.items():
+            for row, item in enumerate(items):
+                tokens = name_tokens(item.get('name'))
+                if tokens:
+                    entries.append(_Entry(store, row, tokens, item_size(item), name_percentages(item.get('name'))))
+
+        postings = defaultdict(list)
+        for index, entry in enumerate(entries):
+            for token in entry.tokens:
+                postings[token].append(index)
+        total = max(len(entries), 1)
+        weights = {token: math.log(total / len(ids)) + 1.0 for token, ids in postings.items()}
+        # Kept for match(); a token the catalog has never seen weighs as much as one carried by a single item
+        self._entries = entries
+        self._postings = postings
+        self._weights = weights
+        self._unseen_weight = math.log(total) + 1.0
+
+        pairs = set()
+        for ids in postings.values():
+            if len(ids) > MAX_BLOCK_SIZE:
+                continue
+            for position, first in enumerate(ids):
+                for second in ids[position + 1:]:
+                    if entries[first].store != entries[second].store:
+                        pairs.add((first, second))
+        self.candidate_pairs = len(pairs)
+
+        edges = []
+        for first, second in pairs:
+            score = self._score(entries[first], entries[second], weights)
+            if score is not None:
+                edges.append((score, first, second))
+        edges.sort(key=lambda edge: (-edge[0], edge[1], edge[2]))
+
+        # Greedy clustering over the best edges; a cluster holds one item per store
+        cluster_of = {}
+        clusters = {}
+        for score, first, second in edges:
+            a = cluster_of.get(first, first)
+            b = cluster_of.get(second, second)
+            if a == b:
+                continue
+            members_a = clusters.get(a, {'members': [first], 'score': 1.0})
+            members_b = clusters.get(b, {'members': [second], 'score': 1.0})
+            stores_a = {entries[index].store for index in members_a['members']}
+            if any(entries[index].store in stores_a for index in members_b['members']):
+                continue
+            merged = {'members': members_a['members'] + members_b['members'],
+                      'score': min(members_a['score'], members_b['score'], score)}
+            clusters[a] = merged
+            clusters.pop(b, None)
+            for index in merged['members']:
+                cluster_of[index] = a
+
+        self.groups = []
+        self.group_of = {}
+        for cluster in sorted(clusters.values(), key=lambda cluster: min(cluster['members'])):
+            members = sorted((entries[index] for index in cluster['members']), key=lambda entry: entry.store)
+            names = [data[entry.store][entry.row].get('name') or '' for entry in members]
+            size = next((entry.size for entry in members if entry.size), None)
+            group = ProductGroup(len(self.groups), [(entry.store, entry.row) for entry in members],
+                                 min(names, key=len), size, round(cluster['score'], 3))
+            # One name per line, so a query can't match across two names
+            group.search_text = '\n'.join(names).lower()
+            self.groups.append(group)
+            for entry in members:
+                self.group_of[(entry.store, entry.row)] = group.id
+        self.build_seconds = time.perf_counter() - start
+
+    @staticmethod
+    def _score(first, second, weights):
+        shared = first.tokens & second.tokens
+        if not shared:
+            return None
+        if first.percentages and second.percentages and first.percentages != second.percentages:
+            return None
+        union = first.tokens | second.tokens
+        score = sum(weights[token] for token in shared) / sum(weights[token] for token in union)
+        if first.size and second.size:
+            if not first.size.compatible(second.size):
+                return None
+            threshold = MATCH_THRESHOLD
+        else:
+            threshold = SIZELESS_THRESHOLD
+        return score if score >= threshold else None
+
+    def match(self, name, size=None, exclude_store=None):
+        """
+        The best-matching item of every store for a product name, as {store: (row, score)}.
+
+        Uses the same blocking and scoring as grouping: only items sharing a
+        not-too-common token with the name are scored, at most
+        MAX_MATCH_CANDIDATES of them, taken from the rarest tokens first.
+        """
+        tokens = name_tokens(name)
+        if not tokens:
+            return {}
+        probe = _Entry(None, None, tokens, size, name_percentages(name))
+        candidates = set()
+        for token in sorted(tokens, key=lambda token: len(self._postings.get(token, ()))):
+            ids = self._postings.get(token)
+            if not ids or len(ids) > MAX_BLOCK_SIZE:
+                continue
+            candidates.update(ids[:MAX_MATCH_CANDIDATES - len(candidates)])
+            if len(candidates) >= MAX_MATCH_CANDIDATES:
+                break
+        weights = ChainMap(self._weights, dict.fromkeys(tokens, self._unseen_weight))
+        best = {}
+        for index in sorted(candidates):
+            entry = self._entries[index]
+            if entry.store == exclude_store:
+                continue
+            score = self._score(probe, entry, weights)
+            if score is not None and score > best.get(entry.store, (None, 0))[1]:
+                best[entry.store] = (entry.row, score)
+        return best
+
+    def search(self, query):
+        """Groups with a member name containing the query"""
+        query = (query or '').lower()
+        if not query:
+            return list(self.groups)
+        terms = _TOKEN_RE.findall(query)
+        # Words are checked first as a cheap filter; the query itself, punctuation included, must occur
+        return [group for group in self.groups
+                if all(term in group.search_text for term in terms) and query in group.search_text]
+
+    def stats(self):
+        return {
+            'groups': len(self.groups),
+            'matched_items': len(self.group_of),
+            'candidate_pairs': self.candidate_pairs,
+            'build_ms': round(self.build_seconds * 1000, 1),
+        }
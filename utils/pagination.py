@@ -0,0 +1,51 @@
+import base64
+import hashlib
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class CursorError(ValueError):
+    """Raised when a paging cursor is malformed or does not match the request"""
+
+
+def query_fingerprint(*values):
+    """Short, stable hash of the filter/sort parameters a cursor was issued for"""
+    raw = json.dumps(values, separators=(',', ':'), default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(version, store, offset, fingerprint):
+    payload = json.dumps({'v': version, 's': store, 'o': offset, 'h': fingerprint}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode an opaque cursor into a dict with version, store, offset and fingerprint"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return {
+            'version': str(payload['v']),
+            'store': str(payload['s']),
+            'offset': max(int(payload['o']), 0),
+            'fingerprint': str(payload['h']),
+        }
+    except (ValueError, TypeError, KeyError):
+        raise CursorError("Invalid cursor.")
+
+
+def parse_fields(fields_param):
+    """Turn a comma-separated fields parameter into a tuple of field names, or None"""
+    if not fields_param:
+        return None
+    fields = tuple(field.strip() for field in fields_param.split(',') if field.strip())
+    return fields or None
+
+
+def project(item, fields):
+    """Keep only the requested fields of an item"""
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields if field in item}
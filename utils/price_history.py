@@ -0,0 +1,270 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from utils.flyer_store import item_key
+from utils.prices import parse_price
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+HISTORY_FILE = 'price_history.db'
+MEDIAN_WINDOW_DAYS = 30
+
+# One row per product per day, clustered by (product_id, day): a product's
+# whole series is a single range scan however many days are stored.
+# Prices are integer cents; original_cents is NULL when the store shows none.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    store TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (store, key)
+);
+CREATE INDEX IF NOT EXISTS products_store_name ON products(store, name);
+CREATE TABLE IF NOT EXISTS prices (
+    product_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    price_cents INTEGER NOT NULL,
+    original_cents INTEGER,
+    PRIMARY KEY (product_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS runs (
+    day INTEGER PRIMARY KEY,
+    recorded_at TEXT NOT NULL,
+    items INTEGER NOT NULL
+);
+"""
+
+
+def _to_cents(price_str):
+    value = parse_price(price_str)
+    return int(round(value * 100)) if value > 0 else None
+
+
+def _day_number(day):
+    return day.toordinal()
+
+
+def _day_date(number):
+    return date.fromordinal(number).isoformat()
+
+
+def _dollars(cents):
+    return round(cents / 100, 2) if cents is not None else None
+
+
+def _summary(current, low, window_cents, days_tracked):
+    """
+    Current price, all-time low and real discount vs the median of the preceding window.
+
+    current is (day, cents, original cents) and low is (cents, day).
+    """
+    current_day, current_cents, original_cents = current
+    median_cents = float(np.median(window_cents)) if len(window_cents) else None
+    real_discount = None
+    if median_cents:
+        real_discount = round((median_cents - current_cents) / median_cents * 100, 1)
+
+    claimed_discount = None
+    if original_cents and original_cents > current_cents:
+        claimed_discount = round((original_cents - current_cents) / original_cents * 100, 1)
+
+    return {
+        'current_price': _dollars(current_cents),
+        'current_date': _day_date(current_day),
+        'all_time_low': _dollars(low[0]),
+        'all_time_low_date': _day_date(low[1]),
+        'median_30d': _dollars(median_cents),
+        'real_discount_vs_median_30d': real_discount,
+        'claimed_discount': claimed_discount,
+        'days_tracked': days_tracked,
+    }
+
+
+def _series_summary(series, today):
+    low = min(series, key=lambda row: row[1])
+    current = series[-1]
+    window = [cents for day, cents, _ in series if today - MEDIAN_WINDOW_DAYS <= day < current[0]]
+    return _summary(current, (low[1], low[0]), window, len(series))
+
+
+class PriceHistory:
+    """
+    Append-only daily price history of every scraped item, in SQLite.
+
+    record() stores one price point per item per day (a second run on the
+    same day replaces that day's points). Items are identified by store and
+    item_key, the same identity the delta updates use.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def record(self, all_flyers_data, day=None):
+        """Append today's price of every item with a parseable price, in one transaction"""
+        day = _day_number(day or date.today())
+        start = time.perf_counter()
+        conn = self._conn()
+        count = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for store, items in all_flyers_data.items():
+                rows = []
+                for item in items:
+                    cents = _to_cents(item.get('price'))
+                    if cents is not None:
+                        rows.append((item_key(item), item.get('name') or '', cents, _to_cents(item.get('original_price'))))
+                if not rows:
+                    continue
+                conn.executemany("INSERT OR IGNORE INTO products (store, key, name) VALUES (?, ?, ?)",
+                                 ((store, key, name) for key, name, _, _ in rows))
+                ids = dict(conn.execute("SELECT key, id FROM products WHERE store = ?", (store,)))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO prices (product_id, day, price_cents, original_cents) VALUES (?, ?, ?, ?)",
+                    ((ids[key], day, cents, original) for key, _, cents, original in rows),
+                )
+                count += len(rows)
+            conn.execute("INSERT OR REPLACE INTO runs (day, recorded_at, items) VALUES (?, datetime('now'), ?)",
+                         (day, count))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        logging.info(f"Recorded {count} prices for {_day_date(day)} in {(time.perf_counter() - start) * 1000:.0f} ms.")
+        return count
+
+    def find_products(self, store, key=None, name=None):
+        """Return [(id, key, name)] of a store's products matching the key, or else the exact name"""
+        conn = self._conn()
+        if key is not None:
+            return conn.execute("SELECT id, key, name FROM products WHERE store = ? AND key = ?",
+                                (store, key)).fetchall()
+        return conn.execute("SELECT id, key, name FROM products WHERE store = ? AND name = ?",
+                            (store, name)).fetchall()
+
+    def series(self, product_id, since=None):
+        """[(day number, price cents, original cents)] of one product, oldest first"""
+        return self._conn().execute(
+            "SELECT day, price_cents, original_cents FROM prices WHERE product_id = ? AND day >= ? ORDER BY day",
+            (product_id, _day_number(since) if since else 0),
+        ).fetchall()
+
+    def item_history(self, store, key=None, name=None, since=None, today=None):
+        """Price series plus summary for each product of a store matching key (or name)"""
+        today = _day_number(today or date.today())
+        results = []
+        for product_id, product_key, product_name in self.find_products(store, key, name):
+            series = self.series(product_id)
+            if not series:
+                continue
+            summary = _series_summary(series, today)
+            if since:
+                series = [row for row in series if row[0] >= _day_number(since)]
+            results.append(dict(summary, store=store, key=product_key, name=product_name, series=[
+                {'date': _day_date(day), 'price': _dollars(cents), 'original_price': _dollars(original)}
+                for day, cents, original in series
+            ]))
+        return results
+
+    def store_summaries(self, store, today=None):
+        """Summary (no series) of every product seen in the store's latest run, keyed by item_key"""
+        today = _day_number(today or date.today())
+        conn = self._conn()
+        # Correlated lookups stay on the (product_id, day) primary key instead of scanning every price
+        latest = conn.execute(
+            "SELECT max((SELECT max(day) FROM prices WHERE product_id = products.id)) FROM products WHERE store = ?",
+            (store,),
+        ).fetchone()[0]
+        if latest is None:
+            return {}
+
+        current = {}
+        for product_id, key, cents, original in conn.execute(
+                "SELECT products.id, products.key, prices.price_cents, prices.original_cents FROM products "
+                "JOIN prices ON prices.product_id = products.id AND prices.day = ? WHERE products.store = ?",
+                (latest, store)):
+            current[product_id] = (key, (latest, cents, original))
+
+        # SQLite takes the bare `day` column from the row holding min(price_cents)
+        lows = {}
+        for product_id, cents, day, count in conn.execute(
+                "SELECT product_id, min(price_cents), day, count(*) FROM prices WHERE product_id IN "
+                "(SELECT id FROM products WHERE store = ?) GROUP BY product_id", (store,)):
+            lows[product_id] = ((cents, day), count)
+
+        windows = {}
+        for product_id, cents in conn.execute(
+                "SELECT product_id, price_cents FROM prices WHERE product_id IN "
+                "(SELECT id FROM products WHERE store = ?) AND day >= ? AND day < ?",
+                (store, today - MEDIAN_WINDOW_DAYS, latest)):
+            windows.setdefault(product_id, []).append(cents)
+
+        return {
+            key: _summary(point, lows[product_id][0], windows.get(product_id, []), lows[product_id][1])
+            for product_id, (key, point) in current.items()
+        }
+
+    def stats(self):
+        conn = self._conn()
+        products = conn.execute("SELECT count(*) FROM products").fetchone()[0]
+        points = conn.execute("SELECT count(*) FROM prices").fetchone()[0]
+        first, last, runs = conn.execute("SELECT min(day), max(day), count(*) FROM runs").fetchone()
+        return {
+            'products': products,
+            'price_points': points,
+            'runs': runs,
+            'first_day': _day_date(first) if first else None,
+            'last_day': _day_date(last) if last else None,
+        }
+
+
+if __name__ == '__main__':
+    # Benchmark: a year of daily snapshots of the current catalog with random price moves
+    import json
+    import os
+    import random
+    import sys
+    import tempfile
+
+    source = sys.argv[1] if len(sys.argv) > 1 else os.path.join('data', 'flyers.json')
+    with open(source, encoding='utf-8') as f:
+        data = json.load(f)
+    path = os.path.join(tempfile.mkdtemp(), HISTORY_FILE)
+    history = PriceHistory(path)
+    random.seed(1)
+
+    start = time.perf_counter()
+    first_day = date.today() - timedelta(days=364)
+    for offset in range(365):
+        day_data = {store: [dict(item, price=f"${parse_price(item.get('price')) * random.uniform(0.7, 1.2):.2f}")
+                            for item in items] for store, items in data.items()}
+        history.record(day_data, first_day + timedelta(days=offset))
+    print(f"Recorded 365 days in {time.perf_counter() - start:.1f}s, "
+          f"{os.path.getsize(path) / 1024 / 1024:.1f} MB, {history.stats()['price_points']} points")
+
+    store = max(data, key=lambda name: len(data[name]))
+    key = next(item_key(item) for item in data[store] if _to_cents(item.get('price')))
+    runs = 200
+    start = time.perf_counter()
+    for _ in range(runs):
+        history.item_history(store, key=key)
+    print(f"item_history (365 points): {(time.perf_counter() - start) / runs * 1000:.2f} ms")
+    start = time.perf_counter()
+    summaries = history.store_summaries(store)
+    print(f"store_summaries ({len(summaries)} items): {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,163 @@
+import re
+from functools import lru_cache
+
+# Distinct raw price strings remembered; flyers repeat the same few hundred strings heavily
+MEMO_SIZE = 8192
+
+# "2/$5.00", "2 for $5", "3 for 10": the price of one
+_MULTI_BUY = re.compile(r'(?<![\d.$])(\d+)\s*(?:/\s*\$|for\s+\$?)\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+# "59¢", "99c", "45 cents", "1.5c"
+_CENTS = re.compile(r'(?<![\d.$])(\d+(?:\.\d+)?|\.\d+)\s*(?:¢|c\b|cents?\b)', re.IGNORECASE)
+# French decimal comma: "1,99 $"
+_DECIMAL_COMMA = re.compile(r'(?<![\d.,])(\d+),(\d{2})(?![\d,])')
+# "$1,299.99", "$1.99/lb", "about $0.26", "$3.99 - $5.99" (the lowest, first, amount)
+_AMOUNT = re.compile(r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+')
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _parse(text):
+    match = _MULTI_BUY.search(text)
+    if match:
+        count = int(match.group(1))
+        return round(float(match.group(2)) / count, 2) if count else 0
+    match = _CENTS.search(text)
+    if match:
+        return float(match.group(1)) / 100
+    if '.' not in text:
+        match = _DECIMAL_COMMA.search(text)
+        if match:
+            return float(f"{match.group(1)}.{match.group(2)}")
+    match = _AMOUNT.search(text)
+    if match:
+        return float(match.group(0).replace(',', ''))
+    return 0
+
+
+def parse_price(price_str):
+    """Extract the numeric value of a price string, or 0 if there is none"""
+    if not price_str or price_str == 'N/A':
+        return 0
+    if isinstance(price_str, (int, float)):
+        return float(price_str)
+    return _parse(str(price_str))
+
+
+def calculate_savings_percentage(original_price, sale_price):
+    """Calculate savings percentage between original and sale price"""
+    original = parse_price(original_price)
+    sale = parse_price(sale_price)
+    if original > 0 and 0 < sale < original:
+        return round(((original - sale) / original) * 100, 1)
+    return 0
+
+
+def price_parser_stats():
+    info = _parse.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'memo_size': info.currsize,
+        'memo_max': info.maxsize,
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': round(info.hits / lookups * 100, 1) if lookups else 0,
+    }
+
+
+# Values worked out by hand, not by the parser: every format beyond a plain "$4.99"
+# the golden corpus holds, including ones the scrapers don't produce today
+HAND_CHECKED = {
+    '2/$5.00': 2.5,
+    '2 for $5': 2.5,
+    '3 for 10': 3.33,
+    '3/$10': 3.33,
+    '59¢': 0.59,
+    '99c': 0.99,
+    '45 cents': 0.45,
+    '1.5c': 0.015,
+    '$1.99/lb': 1.99,
+    '$8.80/kg': 8.8,
+    '$4.39/1kg $1.99/1lb': 4.39,
+    '$3.99 - $5.99': 3.99,
+    '$2.99-$3.49': 2.99,
+    '$1,299.99': 1299.99,
+    '1,99 $': 1.99,
+    '.99': 0.99,
+    'N/A': 0,
+    'Free': 0,
+}
+
+# Strings with only one possible reading, whose value is taken from the digits directly
+_PLAIN = re.compile(r'(?:about )?\$(\d+\.\d{2})')
+
+
+def _expected(value):
+    """The corpus value of a price string, worked out without the parser, or None if it needs checking by hand"""
+    if value in HAND_CHECKED:
+        return HAND_CHECKED[value]
+    match = _PLAIN.fullmatch(value)
+    return float(match.group(1)) if match else None
+
+
+def _legacy_parse(price_str):
+    # The character filter this module replaced, for the benchmark
+    try:
+        if price_str and price_str != 'N/A':
+            return float(''.join(filter(lambda x: x.isdigit() or x == '.', str(price_str))))
+    except (ValueError, TypeError):
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    # python -m utils.prices build|check|bench [flyers.json]
+    import json
+    import os
+    import sys
+    import time
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    source = sys.argv[2] if len(sys.argv) > 2 else os.path.join('data', 'flyers.json')
+    corpus_path = os.path.join('data', 'price_corpus.json')
+
+    with open(source, encoding='utf-8') as f:
+        data = json.load(f)
+    raw = [item.get(field) for items in data.values() for item in items for field in ('price', 'original_price')]
+
+    if command == 'build':
+        # Every distinct string in the flyers plus HAND_CHECKED, with values that don't come from the parser
+        values = {value for value in raw if value} | set(HAND_CHECKED)
+        corpus = {value: _expected(value) for value in sorted(values)}
+        unchecked = [value for value, expected in corpus.items() if expected is None]
+        if unchecked:
+            for value in unchecked:
+                print(f"{value!r}: add its value to HAND_CHECKED")
+            sys.exit(1)
+        with open(corpus_path, 'w', encoding='utf-8') as f:
+            json.dump(corpus, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Wrote {len(corpus)} cases to {corpus_path}")
+    elif command == 'check':
+        with open(corpus_path, encoding='utf-8') as f:
+            corpus = json.load(f)
+        failures = [(value, expected, parse_price(value)) for value, expected in corpus.items()
+                    if abs(parse_price(value) - expected) > 1e-9]
+        for value, expected, got in failures:
+            print(f"{value!r}: expected {expected}, got {got}")
+        print(f"{len(corpus) - len(failures)}/{len(corpus)} cases pass")
+        sys.exit(1 if failures else 0)
+    elif command == 'bench':
+        rounds = 20
+        for name, parse in (('character filter', _legacy_parse), ('regex, memoized', parse_price)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for value in raw:
+                    parse(value)
+            elapsed = time.perf_counter() - start
+            print(f"{name}: {elapsed / (rounds * len(raw)) * 1e9:.0f} ns per price ({len(raw)} prices x {rounds})")
+        _parse.cache_clear()
+        start = time.perf_counter()
+        for value in raw:
+            parse_price(value)
+        print(f"regex, cold memo: {(time.perf_counter() - start) / len(raw) * 1e9:.0f} ns per price")
+        print(price_parser_stats())
+    else:
+        sys.exit("usage: python -m utils.prices build|check|bench [flyers.json]")
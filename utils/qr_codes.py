@@ -0,0 +1,168 @@
+import hashlib
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import qrcode
+
+QR_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+QR_BOX_SIZE = 10
+QR_BORDER = 4
+# Rendering is CPU-bound; a small pool keeps bursts of new lists from tying up every request thread
+QR_RENDER_WORKERS = int(os.environ.get('QR_RENDER_WORKERS', 2))
+MAX_CACHED_QR_CODES = 512
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def content_key(data, fmt):
+    """Hash identifying one rendering of data; also used as the image's ETag"""
+    return hashlib.sha1(f"{fmt}|{QR_BOX_SIZE}|{QR_BORDER}|{data}".encode('utf-8')).hexdigest()[:20]
+
+
+def qr_matrix(data):
+    """The QR modules of data, border included, as a boolean array (True = dark)"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=QR_BOX_SIZE,
+        border=QR_BORDER,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return np.asarray(qr.get_matrix(), dtype=bool)
+
+
+def _png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def png_1bit(modules, box_size=QR_BOX_SIZE):
+    """Encode a module matrix as a 1-bit grayscale PNG, without going through PIL"""
+    pixels = ~np.repeat(np.repeat(modules, box_size, axis=0), box_size, axis=1)  # 1 = white
+    height, width = pixels.shape
+    rows = np.packbits(pixels, axis=1)
+    # Every scanline starts with filter type 0 (None)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rows]).tobytes()
+    return (_PNG_SIGNATURE
+            + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 1, 0, 0, 0, 0))
+            + _png_chunk(b'IDAT', zlib.compress(raw, 9))
+            + _png_chunk(b'IEND', b''))
+
+
+def svg(modules, box_size=QR_BOX_SIZE):
+    """Encode a module matrix as an SVG with one path, one rectangle per horizontal run of dark modules"""
+    size = len(modules)
+    runs = []
+    for y, row in enumerate(modules):
+        # Run boundaries are where the row changes between light and dark
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], row, [False])).astype(np.int8)))
+        for start, end in zip(edges[::2], edges[1::2]):
+            runs.append(f"M{start} {y}h{end - start}v1h-{end - start}z")
+    pixels = size * box_size
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" width="{pixels}" '
+            f'height="{pixels}" shape-rendering="crispEdges"><rect width="{size}" height="{size}" fill="#fff"/>'
+            f'<path d="{"".join(runs)}" fill="#000"/></svg>').encode('utf-8')
+
+
+def render_qr(data, fmt='png'):
+    modules = qr_matrix(data)
+    return svg(modules) if fmt == 'svg' else png_1bit(modules)
+
+
+class QrRenderer:
+    """
+    Renders QR codes on a worker pool and caches the output by content hash.
+
+    The cache holds futures, so concurrent requests for an image that is
+    still rendering wait for that one render instead of starting their own.
+    """
+
+    def __init__(self, workers=QR_RENDER_WORKERS, max_entries=MAX_CACHED_QR_CODES):
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qr')
+        self._cache = OrderedDict()  # {content key: Future of bytes}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def submit(self, data, fmt='png'):
+        """Return (content key, Future of the image bytes), starting a render if it isn't cached"""
+        key = content_key(data, fmt)
+        with self._lock:
+            future = self._cache.get(key)
+            if future is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return key, future
+            self.misses += 1
+            future = self._executor.submit(render_qr, data, fmt)
+            self._cache[key] = future
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return key, future
+
+    def render(self, data, fmt='png'):
+        """Return (content key, image bytes)"""
+        key, future = self.submit(data, fmt)
+        try:
+            return key, future.result()
+        except Exception:
+            # Don't keep serving a failed render
+            with self._lock:
+                if self._cache.get(key) is future:
+                    del self._cache[key]
+            raise
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._cache),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0,
+        }
+
+
+qr_renderer = QrRenderer()
+
+
+if __name__ == '__main__':
+    # Benchmark: QR generations per second for the old PIL + base64 data URI path and the new encoders
+    import base64
+    import io
+    import time
+    import uuid
+
+    urls = [f"http://localhost:5000/list-page/{uuid.uuid4()}" for _ in range(200)]
+
+    def legacy(url):
+        qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L,
+                           box_size=QR_BOX_SIZE, border=QR_BORDER)
+        qr.add_data(url)
+        qr.make(fit=True)
+        buffer = io.BytesIO()
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+        return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}".encode('ascii')
+
+    renderer = QrRenderer(max_entries=len(urls) * 2)
+    cases = [
+        ('PIL PNG + base64 data URI', legacy),
+        ('matrix only', qr_matrix),
+        ('1-bit PNG', lambda url: render_qr(url, 'png')),
+        ('SVG', lambda url: render_qr(url, 'svg')),
+        ('cached PNG', lambda url: renderer.render(url, 'png')[1]),
+    ]
+    for url in urls:
+        renderer.render(url, 'png')
+    for name, generate in cases:
+        start = time.perf_counter()
+        output = [generate(url) for url in urls]
+        elapsed = time.perf_counter() - start
+        size = len(output[0]) if isinstance(output[0], bytes) else output[0].size
+        print(f"{name}: {len(urls) / elapsed:,.0f}/s ({size} {'bytes' if isinstance(output[0], bytes) else 'modules'})")
@@ -0,0 +1,242 @@
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 'sqlite' (default) shares QR lists between worker processes and restarts; 'memory' keeps them per process
+STORAGE = os.environ.get('QR_LIST_STORAGE', 'sqlite')
+DATABASE_FILE = 'qr_lists.db'
+QR_LIST_TTL_SECONDS = 3600
+# Once either cap is exceeded the lists closest to expiring are evicted first
+MAX_QR_LISTS = int(os.environ.get('MAX_QR_LISTS', 10000))
+MAX_QR_LIST_STORE_BYTES = int(os.environ.get('MAX_QR_LIST_STORE_BYTES', 32 * 1024 * 1024))
+# A single list larger than this is refused outright
+MAX_QR_LIST_BYTES = 64 * 1024
+SWEEP_INTERVAL_SECONDS = 60
+
+
+class ListTooLarge(ValueError):
+    pass
+
+
+def _encode(content):
+    return json.dumps(content, ensure_ascii=False)
+
+
+class MemoryListStore:
+    """
+    QR lists in a dict, expired through a min-heap of (expires_at, id).
+
+    Reads check the entry's own expiry, so an expired list is never served
+    even before the sweeper gets to it; sweep() and eviction only pop from
+    the heap, O(log n) per list, instead of scanning every list.
+    """
+
+    def __init__(self, max_lists=MAX_QR_LISTS, max_bytes=MAX_QR_LIST_STORE_BYTES):
+        self.max_lists = max_lists
+        self.max_bytes = max_bytes
+        self._lists = {}  # {list_id: (expires_at, content, size)}
+        self._heap = []
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _pop(self):
+        # Heap entries of lists already removed or replaced are skipped
+        expires_at, list_id = heapq.heappop(self._heap)
+        entry = self._lists.get(list_id)
+        if entry is None or entry[0] != expires_at:
+            return False
+        del self._lists[list_id]
+        self._bytes -= entry[2]
+        return True
+
+    def put(self, list_id, content, ttl=QR_LIST_TTL_SECONDS):
+        size = len(_encode(content).encode('utf-8'))
+        if size > MAX_QR_LIST_BYTES:
+            raise ListTooLarge(f"List is larger than {MAX_QR_LIST_BYTES} bytes.")
+        expires_at = time.time() + ttl
+        with self._lock:
+            old = self._lists.pop(list_id, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._lists[list_id] = (expires_at, content, size)
+            self._bytes += size
+            heapq.heappush(self._heap, (expires_at, list_id))
+            while self._heap and (len(self._lists) > self.max_lists or self._bytes > self.max_bytes):
+                if self._pop():
+                    self.evictions += 1
+        return expires_at
+
+    def get(self, list_id):
+        with self._lock:
+            entry = self._lists.get(list_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                # Lazy expiry; the heap entry is dropped when the sweeper reaches it
+                del self._lists[list_id]
+                self._bytes -= entry[2]
+                self.expirations += 1
+                return None
+            return entry[1]
+
+    def sweep(self):
+        """Remove every expired list, returning how many were removed"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                if self._pop():
+                    removed += 1
+            self.expirations += removed
+        return removed
+
+    def stats(self):
+        return {
+            'storage': 'memory',
+            'lists': len(self._lists),
+            'bytes': self._bytes,
+            'max_lists': self.max_lists,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class SqliteListStore:
+    """
+    QR lists in SQLite, so every worker process sees the same lists and they survive restarts.
+
+    Rows are indexed on expires_at: sweeping and cap eviction delete a
+    range from the front of that index rather than scanning the table. The
+    list count and byte total the caps are checked against live in a
+    one-row table kept current by triggers, in the same transaction as
+    every insert and delete.
+    """
+
+    def __init__(self, path, max_lists=MAX_QR_LISTS, max_bytes=MAX_QR_LIST_STORE_BYTES):
+        self.path = path
+        self.max_lists = max_lists
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.evictions = 0
+        self.expirations = 0
+        self._conn().executescript("""
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS qr_lists (
+                id TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS qr_lists_expires_at ON qr_lists(expires_at);
+            CREATE TABLE IF NOT EXISTS qr_list_totals (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                lists INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            );
+            -- Counted once, for databases created before the totals table existed
+            INSERT INTO qr_list_totals (id, lists, bytes)
+                SELECT 1, (SELECT count(*) FROM qr_lists), (SELECT coalesce(sum(size), 0) FROM qr_lists)
+                WHERE NOT EXISTS (SELECT 1 FROM qr_list_totals);
+            CREATE TRIGGER IF NOT EXISTS qr_lists_count_insert AFTER INSERT ON qr_lists BEGIN
+                UPDATE qr_list_totals SET lists = lists + 1, bytes = bytes + new.size WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS qr_lists_count_delete AFTER DELETE ON qr_lists BEGIN
+                UPDATE qr_list_totals SET lists = lists - 1, bytes = bytes - old.size WHERE id = 1;
+            END;
+            COMMIT;
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def put(self, list_id, content, ttl=QR_LIST_TTL_SECONDS):
+        encoded = _encode(content)
+        size = len(encoded.encode('utf-8'))
+        if size > MAX_QR_LIST_BYTES:
+            raise ListTooLarge(f"List is larger than {MAX_QR_LIST_BYTES} bytes.")
+        expires_at = time.time() + ttl
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # An explicit delete rather than INSERT OR REPLACE, whose implicit delete doesn't fire triggers
+            conn.execute("DELETE FROM qr_lists WHERE id = ?", (list_id,))
+            conn.execute("INSERT INTO qr_lists (id, content, size, expires_at) VALUES (?, ?, ?, ?)",
+                         (list_id, encoded, size, expires_at))
+            count, total = conn.execute("SELECT lists, bytes FROM qr_list_totals WHERE id = 1").fetchone()
+            evicted = 0
+            while count > self.max_lists or total > self.max_bytes:
+                row = conn.execute("SELECT id, size FROM qr_lists ORDER BY expires_at LIMIT 1").fetchone()
+                conn.execute("DELETE FROM qr_lists WHERE id = ?", (row[0],))
+                count -= 1
+                total -= row[1]
+                evicted += 1
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self.evictions += evicted
+        return expires_at
+
+    def get(self, list_id):
+        row = self._conn().execute("SELECT content FROM qr_lists WHERE id = ? AND expires_at > ?",
+                                   (list_id, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def sweep(self):
+        """Remove every expired list, returning how many were removed"""
+        removed = self._conn().execute("DELETE FROM qr_lists WHERE expires_at <= ?", (time.time(),)).rowcount
+        self.expirations += removed
+        return removed
+
+    def stats(self):
+        count, total = self._conn().execute("SELECT lists, bytes FROM qr_list_totals WHERE id = 1").fetchone()
+        return {
+            'storage': 'sqlite',
+            'lists': count,
+            'bytes': total,
+            'max_lists': self.max_lists,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def start_sweeper(store, interval=SWEEP_INTERVAL_SECONDS):
+    """Sweep expired lists from the store every interval seconds on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                removed = store.sweep()
+            except sqlite3.Error as e:
+                logging.error(f"QR list sweep failed: {e}")
+                continue
+            if removed:
+                logging.info(f"Cleaned up {removed} expired QR lists.")
+
+    thread = threading.Thread(target=run, name='qr-list-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+
+def create_list_store(data_folder, storage=None):
+    """Open the configured QR list store backend"""
+    storage = storage or STORAGE
+    if storage == 'memory':
+        return MemoryListStore()
+    return SqliteListStore(os.path.join(data_folder, DATABASE_FILE))
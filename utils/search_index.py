@@ -0,0 +1,98 @@
+import re
+from collections import defaultdict
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Every 1-, 2- and 3-gram of each token is indexed, so a query term of any
+# length can be answered from posting lists without scanning every item.
+MAX_GRAM = 3
+
+SEARCH_FIELDS = ('name', 'unit', 'details')
+
+
+def item_search_text(item):
+    """Build the lowercased text that search queries are matched against"""
+    parts = []
+    for field in SEARCH_FIELDS:
+        value = item.get(field)
+        if value and value != 'N/A':
+            parts.append(str(value))
+    return ' '.join(parts).lower()
+
+
+def _token_grams(token):
+    grams = set()
+    length = len(token)
+    for size in range(1, min(MAX_GRAM, length) + 1):
+        for start in range(length - size + 1):
+            grams.add(token[start:start + size])
+    return grams
+
+
+def _term_grams(term):
+    if len(term) <= MAX_GRAM:
+        return [term]
+    return [term[start:start + MAX_GRAM] for start in range(len(term) - MAX_GRAM + 1)]
+
+
+class SearchIndex:
+    """
+    Inverted n-gram index over one store's items.
+
+    Each word of the query is resolved by intersecting the posting lists of
+    its n-grams (smallest first), and the words' candidates are ANDed. The
+    whole lowercased query, punctuation and spacing included, is then
+    confirmed as a substring on the few surviving candidates, so results
+    match a plain substring scan. Rows are positions in the store's item list.
+    """
+
+    def __init__(self, items):
+        self._texts = [item_search_text(item) for item in items]
+        postings = defaultdict(list)
+        token_grams = {}  # tokens repeat heavily across items, so their grams are memoized
+        for row, text in enumerate(self._texts):
+            row_grams = set()
+            for token in set(_TOKEN_RE.findall(text)):
+                grams = token_grams.get(token)
+                if grams is None:
+                    grams = token_grams[token] = _token_grams(token)
+                row_grams |= grams
+            for gram in row_grams:
+                postings[gram].append(row)
+        self._postings = {gram: frozenset(rows) for gram, rows in postings.items()}
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _match_term(self, term):
+        lists = []
+        for gram in _term_grams(term):
+            rows = self._postings.get(gram)
+            if not rows:
+                return set()
+            lists.append(rows)
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for rows in lists[1:]:
+            candidates &= rows
+            if not candidates:
+                return candidates
+        return candidates
+
+    def search(self, query):
+        """Return the set of rows whose search text contains the query"""
+        query = query.lower()
+        terms = sorted(set(_TOKEN_RE.findall(query)), key=len, reverse=True)
+        if not terms:
+            # Punctuation-only queries have no n-grams to look up
+            return {row for row, text in enumerate(self._texts) if query in text}
+
+        matches = None
+        for term in terms:
+            rows = self._match_term(term)
+            matches = rows if matches is None else matches & rows
+            if not matches:
+                return set()
+        # Posting lists only narrow the candidates: they see words, not the punctuation and
+        # spacing of queries like '2%' or '2 for $5', which must occur as typed
+        return {row for row in matches if query in self._texts[row]}
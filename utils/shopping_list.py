@@ -0,0 +1,272 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from utils.flyer_store import _write_atomic
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; only threads of one process are serialized there
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# The journal is folded into the snapshot once it holds this many operations or bytes
+COMPACT_AFTER_OPS = 500
+COMPACT_AFTER_BYTES = 1024 * 1024
+
+OPERATIONS = ('add', 'remove', 'update', 'replace', 'clear')
+
+
+class InvalidOperation(ValueError):
+    pass
+
+
+class ItemNotFound(LookupError):
+    pass
+
+
+def _file_key(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class ShoppingListStore:
+    """
+    The shopping list, held in memory and indexed by item id.
+
+    Changes are operations (add, remove, update, replace, clear) applied
+    in O(1) through the id index and appended to a journal next to the
+    JSON snapshot; once the journal grows past COMPACT_AFTER_OPS or
+    COMPACT_AFTER_BYTES it is folded into the snapshot, which is replaced
+    atomically. Every write holds an exclusive flock on a lock file and
+    first replays what other processes appended, so concurrent workers
+    never lose each other's updates. A crash during compaction, after
+    the new snapshot is written but before the journal is swapped, leaves a
+    journal the snapshot already covers; replaying it over that snapshot
+    ends in the same list, since every operation sets state rather than
+    incrementing it, as long as operations that no longer apply (removing
+    or updating an item a later operation already dropped) are skipped.
+    """
+
+    def __init__(self, data_folder, name='shopping_list'):
+        self.path = os.path.join(data_folder, f'{name}.json')
+        self.journal_path = os.path.join(data_folder, f'{name}.journal')
+        self.lock_path = os.path.join(data_folder, f'{name}.lock')
+        self._lock = threading.RLock()
+        self._items = {}  # {id: item}, in list order
+        self._loaded_from = None  # (snapshot key, journal inode) the memory copy is based on
+        self._journal_offset = 0
+        self._journal_ops = 0
+        self._unkeyed = 0
+        self._summary = None  # (version, summary)
+        self.compactions = 0
+
+    @contextmanager
+    def _locked(self, exclusive):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            # A new open file per operation: flock locks belong to the open file,
+            # which forked workers would otherwise share
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _key(self, item):
+        item_id = item.get('id')
+        if item_id is None:
+            # Items without an id can't be addressed, but still keep their place in the list
+            self._unkeyed += 1
+            return ('unkeyed', self._unkeyed)
+        return item_id
+
+    def _journal_state(self):
+        journal = _file_key(self.journal_path)
+        return (_file_key(self.path), journal[0] if journal else None), journal[2] if journal else 0
+
+    def _sync(self):
+        """Bring the memory copy up to date with the snapshot and the journal; caller holds the file lock"""
+        state, journal_size = self._journal_state()
+        if state != self._loaded_from:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    items = json.load(f)
+            except FileNotFoundError:
+                logging.info("shopping_list.json not found. Starting with an empty list.")
+                items = []
+            self._items = {self._key(item): item for item in items if isinstance(item, dict)}
+            self._loaded_from = state
+            self._journal_offset = 0
+            self._journal_ops = 0
+        if journal_size > self._journal_offset:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # a write cut short by a crash; the next writer truncates it
+                    try:
+                        self._apply(json.loads(line))
+                    except (InvalidOperation, ItemNotFound) as e:
+                        # Only possible when the snapshot already includes this operation's effects
+                        logging.warning(f"Skipped journaled operation already covered by {self.path}: {e!r}")
+                    self._journal_offset += len(line)
+                    self._journal_ops += 1
+
+    def _apply(self, op):
+        kind = op.get('op')
+        if kind == 'add':
+            item = op.get('item')
+            if not isinstance(item, dict) or item.get('id') is None:
+                raise InvalidOperation("add needs an item with an id.")
+            # Re-adding an existing id replaces it in place
+            self._items[item['id']] = item
+        elif kind == 'remove':
+            if self._items.pop(op.get('id'), None) is None:
+                raise ItemNotFound(op.get('id'))
+        elif kind == 'update':
+            fields = op.get('fields')
+            if not isinstance(fields, dict) or 'id' in fields:
+                raise InvalidOperation("update needs a fields object, which can't change the id.")
+            item = self._items.get(op.get('id'))
+            if item is None:
+                raise ItemNotFound(op.get('id'))
+            self._items[op['id']] = dict(item, **fields)
+        elif kind == 'replace':
+            items = op.get('items')
+            if not isinstance(items, list):
+                raise InvalidOperation("replace needs a list of items.")
+            self._items = {self._key(item): item for item in items if isinstance(item, dict)}
+        elif kind == 'clear':
+            self._items = {}
+        else:
+            raise InvalidOperation(f"Unknown operation {kind!r}; expected one of {', '.join(OPERATIONS)}.")
+
+    def _refresh(self):
+        # Two stats when nothing changed; the shared lock is only taken to replay other writers' changes
+        with self._lock:
+            state, journal_size = self._journal_state()
+            if state == self._loaded_from and journal_size == self._journal_offset:
+                return
+        with self._locked(exclusive=False):
+            self._sync()
+
+    def items(self):
+        """The current list"""
+        self._refresh()
+        with self._lock:
+            return list(self._items.values())
+
+    def summary(self):
+        """Item count and total quantity, overall and per store; recomputed only after the list changes"""
+        self._refresh()
+        with self._lock:
+            version = (self._loaded_from, self._journal_offset)
+            if self._summary is None or self._summary[0] != version:
+                quantities = {}
+                for item in self._items.values():
+                    try:
+                        quantity = int(item.get('quantity') or 1)
+                    except (TypeError, ValueError):
+                        quantity = 1
+                    store = item.get('store') or 'Uncategorized'
+                    quantities[store] = quantities.get(store, 0) + quantity
+                self._summary = (version, {
+                    'items': len(self._items),
+                    'quantity': sum(quantities.values()),
+                    'stores': quantities,
+                })
+            return self._summary[1]
+
+    def apply(self, ops):
+        """
+        Apply operations atomically and journal them; returns the new list.
+
+        Raises InvalidOperation or ItemNotFound, with nothing applied, if any
+        operation can't be.
+        """
+        if isinstance(ops, dict):
+            ops = [ops]
+        if not isinstance(ops, list) or not ops or not all(isinstance(op, dict) for op in ops):
+            raise InvalidOperation("Expected an operation or a list of operations.")
+        with self._locked(exclusive=True):
+            self._sync()
+            previous = self._items
+            if len(ops) > 1:
+                self._items = dict(previous)
+            try:
+                for op in ops:
+                    self._apply(op)
+            except (InvalidOperation, ItemNotFound):
+                self._items = previous
+                raise
+
+            lines = b''.join(json.dumps(op, ensure_ascii=False).encode('utf-8') + b'\n' for op in ops)
+            with open(self.journal_path, 'ab') as f:
+                if f.tell() > self._journal_offset:
+                    f.truncate(self._journal_offset)
+                f.write(lines)
+            self._journal_offset += len(lines)
+            self._journal_ops += len(ops)
+            self._loaded_from, _ = self._journal_state()
+
+            if self._journal_ops >= COMPACT_AFTER_OPS or self._journal_offset >= COMPACT_AFTER_BYTES:
+                self._compact()
+            return list(self._items.values())
+
+    def _compact(self):
+        """Write the list as a new snapshot and start an empty journal; caller holds the exclusive lock"""
+        _write_atomic(self.path, list(self._items.values()))
+        # A new (empty) journal file, so other processes see a different inode and reload the snapshot
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.journal_path), prefix='.tmp-', suffix='.journal')
+        os.close(fd)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.journal_path)
+        logging.info(f"Compacted {self._journal_ops} shopping list operations into {self.path}.")
+        self._loaded_from, _ = self._journal_state()
+        self._journal_offset = 0
+        self._journal_ops = 0
+        self.compactions += 1
+
+    def stats(self):
+        return {
+            'items': len(self._items),
+            'journal_ops': self._journal_ops,
+            'journal_bytes': self._journal_offset,
+            'compactions': self.compactions,
+        }
+
+
+if __name__ == '__main__':
+    # Crash check: python -m utils.shopping_list
+    # Compaction stops after writing the snapshot but before swapping the journal; the list must still load.
+    import shutil
+
+    folder = tempfile.mkdtemp()
+    try:
+        store = ShoppingListStore(folder)
+        store.apply({'op': 'add', 'item': {'id': 'x', 'quantity': 1}})
+        store.apply({'op': 'add', 'item': {'id': 'y', 'quantity': 1}})
+        store._compact()
+        store.apply([{'op': 'update', 'id': 'x', 'fields': {'quantity': 2}}, {'op': 'remove', 'id': 'x'},
+                     {'op': 'update', 'id': 'y', 'fields': {'quantity': 3}}])
+        with store._locked(exclusive=True):
+            _write_atomic(store.path, list(store._items.values()))
+
+        restarted = ShoppingListStore(folder)
+        assert restarted.items() == [{'id': 'y', 'quantity': 3}], restarted.items()
+        restarted.apply({'op': 'add', 'item': {'id': 'z', 'quantity': 1}})
+        assert [item['id'] for item in ShoppingListStore(folder).items()] == ['y', 'z']
+        print("Journal replayed over a newer snapshot: OK")
+    finally:
+        shutil.rmtree(folder)
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import re
+import secrets
+import threading
+from collections import OrderedDict
+
+from utils.shopping_list import ShoppingListStore
+
+LIST_TOKEN_COOKIE = 'list_token'
+LIST_TOKEN_HEADER = 'X-List-Token'
+LIST_TOKEN_MAX_AGE = 400 * 24 * 3600
+DEFAULT_LIST = 'default'
+# Lists kept open in memory; a closed list is simply reloaded from its files on next use
+MAX_OPEN_LISTS = 1024
+
+_TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{16,128}$')
+_LIST_NAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,40}$')
+
+
+def new_token():
+    return secrets.token_urlsafe(24)
+
+
+def valid_token(token):
+    return bool(token) and _TOKEN_RE.match(token) is not None
+
+
+def valid_list_name(name):
+    return bool(name) and _LIST_NAME_RE.match(name) is not None
+
+
+class ShoppingListService:
+    """
+    Shopping lists scoped by user token, each user with any number of named lists.
+
+    Every list is its own ShoppingListStore with its own snapshot, journal
+    and lock file under data/shopping_lists/<shard>/<user>/, so writes to
+    different lists never wait on each other. Users are identified on disk
+    by a hash of their token, sharded into 256 folders. Requests without a
+    token keep using the original shared data/shopping_list.json, which is
+    never copied into a user's list: on a shared deployment there is no
+    telling which token, if any, it belongs to.
+    """
+
+    def __init__(self, data_folder, max_open=MAX_OPEN_LISTS):
+        self.root = os.path.join(data_folder, 'shopping_lists')
+        self.legacy = ShoppingListStore(data_folder)
+        self.max_open = max_open
+        self._stores = OrderedDict()  # {(user hash, list name): ShoppingListStore}, least recently used first
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def user_folder(self, token):
+        digest = hashlib.sha256(token.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.root, digest[:2], digest)
+
+    def get(self, token, list_name=DEFAULT_LIST):
+        """The store of one user's list, or the shared legacy list if token is None"""
+        if token is None:
+            return self.legacy
+        folder = self.user_folder(token)
+        key = (folder, list_name)
+        with self._lock:
+            store = self._stores.get(key)
+            if store is not None:
+                self._stores.move_to_end(key)
+                return store
+        # Creating the folder happens outside the service lock; a racing duplicate store is
+        # harmless since both instances coordinate through the list's lock file
+        os.makedirs(folder, exist_ok=True)
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None:
+                store = self._stores[key] = ShoppingListStore(folder, list_name)
+                self.opened += 1
+                while len(self._stores) > self.max_open:
+                    self._stores.popitem(last=False)
+            return store
+
+    def list_names(self, token):
+        """Names of the lists a user has written to"""
+        try:
+            files = os.listdir(self.user_folder(token))
+        except FileNotFoundError:
+            return []
+        names = {name.rsplit('.', 1)[0] for name in files
+                 if name.endswith(('.json', '.journal')) and not name.startswith('.')}
+        return sorted(names)
+
+    def stats(self):
+        return {
+            'open_lists': len(self._stores),
+            'max_open': self.max_open,
+            'opened': self.opened,
+            'legacy': self.legacy.stats(),
+        }
+
+
+if __name__ == '__main__':
+    # Load test: python -m utils.shopping_lists [users] [concurrency]
+    # Every simulated user edits their own list over HTTP against a threaded server on a temporary data folder.
+    import http.client
+    import json
+    import sys
+    import tempfile
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+    from werkzeug.serving import make_server
+
+    import app as flyer_app
+
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    flyer_app.shopping_lists = ShoppingListService(tempfile.mkdtemp())
+    server = make_server('127.0.0.1', 0, flyer_app.app, threaded=True)
+    server.request_queue_size = concurrency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    latencies = []
+
+    def call(conn, token, method, path, body=None):
+        start = time.perf_counter()
+        headers = {LIST_TOKEN_HEADER: token, 'Content-Type': 'application/json'}
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path}: {response.status} {data[:200]}")
+        return json.loads(data)
+
+    def session(user):
+        token = f"loadtest-user-{user:08d}"
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        for index in range(5):
+            item = {'id': f"item-{index}", 'name': f"Item {index}", 'store': 'nofrills', 'quantity': 1}
+            call(conn, token, 'PATCH', '/api/shopping-list', {'op': 'add', 'item': item})
+        call(conn, token, 'PATCH', '/api/shopping-list', [
+            {'op': 'update', 'id': 'item-0', 'fields': {'quantity': 3}},
+            {'op': 'remove', 'id': 'item-4'},
+        ])
+        summary = call(conn, token, 'GET', '/api/shopping-list/summary')
+        items = call(conn, token, 'GET', '/api/shopping-list')
+        conn.close()
+        return summary['items'] == 4 and summary['quantity'] == 6 and len(items) == 4
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(session, range(users)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    latency_ms = np.asarray(latencies) * 1000
+    print(f"{users} users, {concurrency} concurrent: {len(latencies)} requests in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:,.0f} req/s)")
+    print(f"latency p50 {np.percentile(latency_ms, 50):.1f} ms, p95 {np.percentile(latency_ms, 95):.1f} ms, "
+          f"p99 {np.percentile(latency_ms, 99):.1f} ms")
+    print(f"lists with the expected final state: {sum(results)}/{users}")
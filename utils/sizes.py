@@ -0,0 +1,95 @@
+import re
+
+# Conversion of every recognised unit to its base unit: grams, millilitres or items
+UNITS = {
+    'mg': ('g', 0.001),
+    'g': ('g', 1.0),
+    'gr': ('g', 1.0),
+    'kg': ('g', 1000.0),
+    'lb': ('g', 453.592),
+    'lbs': ('g', 453.592),
+    'oz': ('g', 28.3495),
+    'ml': ('ml', 1.0),
+    'cl': ('ml', 10.0),
+    'l': ('ml', 1000.0),
+    'ea': ('ea', 1.0),
+    'each': ('ea', 1.0),
+    'un': ('ea', 1.0),
+    'pk': ('ea', 1.0),
+    'pcs': ('ea', 1.0),
+}
+
+_UNIT = r'(mg|gr|g|kg|lbs|lb|oz|ml|cl|l|each|ea|un|pk|pcs)\b'
+_NUMBER = r'(\d+(?:[.,]\d+)?)'
+
+# "12x100 g", "4 x 250ml"
+_COUNT_FIRST = re.compile(rf'\b(\d+)\s*[x×*]\s*{_NUMBER}\s*{_UNIT}', re.IGNORECASE)
+# "130G*4", "100gx5", "190ML*24"
+_COUNT_LAST = re.compile(rf'{_NUMBER}\s*{_UNIT}\s*[x×*]\s*(\d+)\b', re.IGNORECASE)
+_SINGLE = re.compile(rf'(?<![\w.]){_NUMBER}\s*{_UNIT}', re.IGNORECASE)
+
+
+class Size:
+    """A parsed package size: total quantity in a base unit ('g', 'ml' or 'ea') and the pack count"""
+
+    __slots__ = ('quantity', 'unit', 'count', 'text')
+
+    def __init__(self, quantity, unit, count=1, text=''):
+        self.quantity = quantity
+        self.unit = unit
+        self.count = count
+        self.text = text
+
+    def compatible(self, other, tolerance=0.1):
+        """Whether two sizes are the same unit and within tolerance of each other"""
+        if self.unit != other.unit or not self.quantity or not other.quantity:
+            return False
+        return abs(self.quantity - other.quantity) <= tolerance * max(self.quantity, other.quantity)
+
+    def to_dict(self):
+        return {'quantity': round(self.quantity, 3), 'unit': self.unit, 'count': self.count}
+
+
+def _number(text):
+    return float(text.replace(',', '.'))
+
+
+def parse_size(text):
+    """
+    Find the first package size in text, e.g. '1.65KG', '190ML*24' or '12x100 g'.
+
+    Returns a Size, or None if there is no recognisable quantity.
+    """
+    if not text:
+        return None
+    match = _COUNT_FIRST.search(text)
+    if match:
+        count, amount, unit = int(match.group(1)), _number(match.group(2)), match.group(3).lower()
+    else:
+        match = _COUNT_LAST.search(text)
+        if match:
+            amount, unit, count = _number(match.group(1)), match.group(2).lower(), int(match.group(3))
+        else:
+            match = _SINGLE.search(text)
+            if not match:
+                return None
+            amount, unit, count = _number(match.group(1)), match.group(2).lower(), 1
+    base, factor = UNITS[unit]
+    if not amount or not count:
+        return None
+    return Size(amount * factor * count, base, count, match.group(0))
+
+
+def item_size_text(item):
+    """The text a store puts an item's package size in: name, amount and the unit field"""
+    parts = [item.get('name') or '']
+    for field in ('amount', 'unit'):
+        value = item.get(field)
+        if value and value != 'N/A':
+            # No Frills' unit field is "<size>, <unit price>"; the unit price is not a size
+            parts.append(str(value).split(',')[0].split('$')[0])
+    return ' '.join(parts)
+
+
+def item_size(item):
+    return parse_size(item_size_text(item))
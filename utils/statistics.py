@@ -0,0 +1,119 @@
+import hashlib
+import json
+
+import numpy as np
+
+# Bucket edges for the price-range histogram and the per-store savings
+# distributions. Labels follow the original keys: under_5, 5_to_10, ...
+DEFAULT_PRICE_RANGE_BOUNDS = (5, 10, 20)
+DEFAULT_SAVINGS_RANGE_BOUNDS = (10, 25, 50)
+
+
+def _format_bound(bound):
+    return f"{bound:g}"
+
+
+def make_buckets(bounds):
+    """Turn sorted bucket edges into (key, lower, upper) tuples covering [0, inf)"""
+    bounds = sorted(float(bound) for bound in bounds)
+    if not bounds:
+        return [('all', 0.0, None)]
+    buckets = [(f"under_{_format_bound(bounds[0])}", 0.0, bounds[0])]
+    for lower, upper in zip(bounds, bounds[1:]):
+        buckets.append((f"{_format_bound(lower)}_to_{_format_bound(upper)}", lower, upper))
+    buckets.append((f"over_{_format_bound(bounds[-1])}", bounds[-1], None))
+    return buckets
+
+
+def parse_bounds(value, default):
+    """Parse a comma-separated list of bucket edges, e.g. from an environment variable"""
+    if not value:
+        return default
+    try:
+        return tuple(float(bound) for bound in value.split(',') if bound.strip())
+    except ValueError:
+        return default
+
+
+def _histogram(values, buckets):
+    counts = {}
+    for key, lower, upper in buckets:
+        in_bucket = values >= lower
+        if upper is not None:
+            in_bucket &= values < upper
+        counts[key] = int(np.count_nonzero(in_bucket))
+    return counts
+
+
+def _percentile(values, q):
+    if len(values) == 0:
+        return 0
+    return round(float(np.percentile(values, q)), 2)
+
+
+def compute_statistics(columns_by_store, price_bounds=DEFAULT_PRICE_RANGE_BOUNDS,
+                       savings_bounds=DEFAULT_SAVINGS_RANGE_BOUNDS):
+    """
+    Aggregate totals, averages, percentiles and histograms over all stores.
+
+    This runs once per catalog snapshot, so /api/statistics only has to
+    return the precomputed result.
+    """
+    price_buckets = make_buckets(price_bounds)
+    savings_buckets = make_buckets(savings_bounds)
+
+    stats = {
+        'total_items': 0,
+        'items_on_sale': 0,
+        'average_savings': 0,
+        'stores': {},
+        'price_ranges': {key: 0 for key, _, _ in price_buckets},
+        'price_range_buckets': [{'key': key, 'min': lower, 'max': upper} for key, lower, upper in price_buckets],
+        'price_percentiles': {'median': 0, 'p90': 0},
+    }
+
+    all_prices = []
+    all_savings = []
+
+    for store, columns in columns_by_store.items():
+        prices = columns.numeric_price[columns.numeric_price > 0]
+        savings = columns.savings[columns.on_sale]
+
+        store_stats = {
+            'total': len(columns),
+            'on_sale': len(savings),
+            'avg_price': round(float(prices.sum()) / len(prices), 2) if len(prices) > 0 else 0,
+            'median_price': _percentile(prices, 50),
+            'p90_price': _percentile(prices, 90),
+            'average_savings': round(float(savings.sum()) / len(savings), 1) if len(savings) > 0 else 0,
+            'median_savings': _percentile(savings, 50),
+            'savings_distribution': _histogram(savings, savings_buckets),
+        }
+        stats['stores'][store] = store_stats
+
+        stats['total_items'] += store_stats['total']
+        stats['items_on_sale'] += store_stats['on_sale']
+        for key, count in _histogram(prices, price_buckets).items():
+            stats['price_ranges'][key] += count
+        all_prices.append(prices)
+        all_savings.append(savings)
+
+    if all_prices:
+        prices = np.concatenate(all_prices)
+        stats['price_percentiles'] = {'median': _percentile(prices, 50), 'p90': _percentile(prices, 90)}
+        savings = np.concatenate(all_savings)
+        if len(savings) > 0:
+            stats['average_savings'] = round(float(savings.sum()) / len(savings), 1)
+
+    return stats
+
+
+class StatisticsAggregate:
+    """Precomputed statistics plus their serialized body and ETag for one catalog version"""
+
+    def __init__(self, version, columns_by_store, price_bounds=DEFAULT_PRICE_RANGE_BOUNDS,
+                 savings_bounds=DEFAULT_SAVINGS_RANGE_BOUNDS):
+        self.data = compute_statistics(columns_by_store, price_bounds, savings_bounds)
+        self.body = json.dumps(self.data, sort_keys=True)
+        config = json.dumps([list(price_bounds), list(savings_bounds)])
+        self.etag = f"stats-{version}-{hashlib.sha1(config.encode('utf-8')).hexdigest()[:8]}"
@@ -0,0 +1,62 @@
+import re
+
+from utils.sizes import UNITS, item_size
+
+# Every unit price is normalized to one of these bases: price per 100 g,
+# per 100 ml or per item. Index 0 means no unit price could be worked out.
+UNIT_BASES = ('', '100g', '100ml', 'each')
+# Where a unit price came from: printed by the store, a price sold by weight, or price / package size
+UNIT_PRICE_SOURCES = ('', 'listed', 'rate', 'size')
+
+_BASIS_OF = {'g': ('100g', 100.0), 'ml': ('100ml', 100.0), 'ea': ('each', 1.0)}
+
+_UNIT = r'(mg|gr|g|kg|lbs|lb|oz|ml|cl|l|each|ea|un|pk|pcs)\b'
+_AMOUNT = r'(\d+(?:\.\d+)?)?'
+# No Frills prints unit prices next to the size: "288 g, $1.91/100g", "$4.39/1kg $1.99/1lb"
+_LISTED = re.compile(rf'\$\s*(\d+(?:\.\d+)?)\s*/\s*{_AMOUNT}\s*{_UNIT}', re.IGNORECASE)
+# A unit field like "/lb" or "/kg" means the price itself is per that quantity
+_RATE = re.compile(rf'^\s*/\s*{_AMOUNT}\s*{_UNIT}', re.IGNORECASE)
+
+
+def normalize(price, amount, unit):
+    """Convert price per `amount` of `unit` to (price per basis, basis), or None"""
+    base, factor = UNITS[unit.lower()]
+    quantity = amount * factor
+    if price <= 0 or quantity <= 0:
+        return None
+    basis, per = _BASIS_OF[base]
+    return price / quantity * per, basis
+
+
+def _unit_text(item):
+    unit = item.get('unit')
+    return str(unit) if unit and unit != 'N/A' else ''
+
+
+def unit_price(item, price):
+    """
+    Work out an item's normalized unit price from its fields and numeric price.
+
+    Returns (value, basis, source) with basis one of '100g', '100ml' or
+    'each', or None when neither a printed unit price, a by-weight price
+    nor a package size is available.
+    """
+    unit = _unit_text(item)
+    if unit:
+        match = _LISTED.search(unit)
+        if match:
+            result = normalize(float(match.group(1)), float(match.group(2) or 1), match.group(3))
+            if result:
+                return result + ('listed',)
+        match = _RATE.match(unit)
+        if match and UNITS[match.group(2).lower()][0] != 'ea':
+            result = normalize(price, float(match.group(1) or 1), match.group(2))
+            if result:
+                return result + ('rate',)
+
+    size = item_size(item)
+    if size is not None:
+        result = normalize(price, size.quantity, size.unit)
+        if result:
+            return result + ('size',)
+    return None
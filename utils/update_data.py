@@ -1,14 +1,23 @@
-import json
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.service import Service
 from contextlib import contextmanager
 import os
 from webdriver_manager.chrome import ChromeDriverManager
-from stores.galleria_scraper import scrape_galleria_flyer
-from stores.foodbasics_scraper import scrape_foodbasics_flyer
+from stores.galleria_scraper import scrape_galleria_flyer, scrape_galleria_http
+from stores.foodbasics_scraper import scrape_foodbasics_flyer, scrape_foodbasics_http
+from stores.http_fetch import FETCH_MODE, FIXTURE_DIR, create_fetcher
 from stores.tnt_scraper import scrape_tnt_flyer
 from stores.nofrills_scraper import scrape_nofrills_flyer
+from stores.progress import scrape_progress
+from stores.waits import wait_timings
+from utils.flyer_db import create_flyer_storage
+from utils.price_history import HISTORY_FILE, PriceHistory
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -16,6 +25,49 @@ DATA_FOLDER = 'data'
 os.makedirs(DATA_FOLDER, exist_ok=True)
 
 
+# Scrapers in the order they are submitted:
+# (key in flyers.json, log label, Selenium scraper, paginated, HTTP scraper or None).
+# Paginated scrapers may borrow extra drivers from the pool to fetch pages in parallel.
+# Stores with an HTTP scraper are fetched without a browser first; T&T and No Frills
+# render their product grids client-side, so they always need Selenium.
+SCRAPERS = [
+    ("galleria", "Galleria", scrape_galleria_flyer, False, scrape_galleria_http),
+    ("foodbasics", "Foodbasics", scrape_foodbasics_flyer, True, scrape_foodbasics_http),
+    ("tnt_supermarket", "Tnt Supermarket", scrape_tnt_flyer, False, None),
+    ("nofrills", "No Frills", scrape_nofrills_flyer, True, None),
+]
+
+# Number of stores scraped at once
+SCRAPER_CONCURRENCY = int(os.environ.get('SCRAPER_CONCURRENCY', 2))
+
+# Upper bound on headless Chrome instances, including extra page-fetch drivers
+SCRAPER_MAX_DRIVERS = int(os.environ.get('SCRAPER_MAX_DRIVERS', 4))
+
+# Wall-clock budget per store in seconds, after which its driver is killed
+DEFAULT_STORE_TIMEOUT = 600
+STORE_TIMEOUTS = {
+    "galleria": 120,
+    "tnt_supermarket": 300,
+    "foodbasics": 900,
+    "nofrills": 900,
+}
+
+
+def create_driver():
+    """
+    Starts a new headless Chrome WebDriver instance.
+    """
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+
+    chromedriver_path = '/usr/bin/chromedriver'
+    service = Service(executable_path=chromedriver_path)
+    return webdriver.Chrome(service=service, options=options)
+
+
 @contextmanager
 def get_driver():
     """
@@ -23,69 +75,324 @@ def get_driver():
     """
     driver = None
     try:
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--window-size=1920,1080")
-
-        chromedriver_path = '/usr/bin/chromedriver'
-        service = Service(executable_path=chromedriver_path)
-        driver = webdriver.Chrome(service=service, options=options)
+        driver = create_driver()
         yield driver
     finally:
         if driver:
             driver.quit()
 
 
-def update_data():
+class DriverPool:
     """
-    Runs all scrapers sequentially using a single WebDriver instance and saves data to a JSON file.
+    A bounded pool of headless Chrome instances shared by the scrapers.
+
+    Drivers are created lazily up to `size` and reused between stores. A
+    driver that raised a WebDriver error, or was killed because its store
+    timed out, is discarded rather than returned to the pool. Every driver
+    handed out is attributed to the owner set by owned_by() on the borrowing
+    thread, so a timed-out store's extra page drivers can be quit with its
+    own, and close() quits borrowed drivers as well as idle ones.
     """
-    logging.info("Starting data collection...")
-    all_flyers_data = {
-        "galleria": [],
-        "tnt_supermarket": [],
-        "foodbasics": [],
-        "nofrills": []
-    }
-
-    with get_driver() as driver:
-        # Galleria Scraper
+
+    def __init__(self, size):
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._drivers = {}  # {live driver: owner while borrowed, None while idle}
+        self._closed = False
+        self._abandoned = set()  # owners whose drivers were discarded; they get no new ones
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def owned_by(self, owner):
+        """Attribute the drivers this thread acquires to owner"""
+        self._local.owner = owner
         try:
-            logging.info("Attempting to fetch Galleria flyer data...")
-            scrape_galleria_flyer(driver, all_flyers_data["galleria"])
-        except Exception as e:
-            logging.error(f"Error scraping Galleria: {e}")
+            yield
+        finally:
+            self._local.owner = None
+
+    def _check_open(self, owner):
+        # Caller holds the lock
+        if self._closed:
+            raise RuntimeError("Driver pool is closed.")
+        if owner is not None and owner in self._abandoned:
+            raise RuntimeError(f"Drivers of {owner} were discarded.")
 
-        # Food Basics Scraper
+    def _borrow(self, driver):
+        owner = getattr(self._local, 'owner', None)
+        with self._lock:
+            if driver not in self._drivers:
+                return None  # quit by close() while idle
+            if owner is not None and owner in self._abandoned:
+                self._idle.put(driver)
+            self._check_open(owner)
+            self._drivers[driver] = owner
+        return driver
+
+    def _create(self):
+        owner = getattr(self._local, 'owner', None)
+        with self._lock:
+            self._check_open(owner)
+            if self._created >= self.size:
+                return None
+            self._created += 1
         try:
-            logging.info("Attempting to fetch Foodbasics flyer data...")
-            scrape_foodbasics_flyer(driver, all_flyers_data["foodbasics"])
-        except Exception as e:
-            logging.error(f"Error scraping Foodbasics: {e}")
+            driver = create_driver()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            try:
+                self._check_open(owner)
+            except RuntimeError:
+                self._created -= 1
+                closed = True
+            else:
+                self._drivers[driver] = owner
+                closed = False
+        if closed:
+            _quit(driver)
+            raise RuntimeError("Driver pool is closed.")
+        return driver
 
-        # T&T Supermarket Scraper
+    def _take_idle(self, timeout):
         try:
-            logging.info("Attempting to fetch Tnt Supermarket flyer data...")
-            scrape_tnt_flyer(driver, all_flyers_data["tnt_supermarket"])
-        except Exception as e:
-            logging.error(f"Error scraping Tnt Supermarket: {e}")
+            driver = self._idle.get(timeout=timeout) if timeout else self._idle.get_nowait()
+        except queue.Empty:
+            return None
+        return self._borrow(driver)
+
+    def acquire(self, timeout=None):
+        """Return an idle driver, starting a new one if the pool isn't full yet"""
+        driver = self._take_idle(None) or self._create()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while driver is None:
+            # Polled, so waiters notice close() instead of blocking on the queue forever
+            if self._closed:
+                raise RuntimeError("Driver pool is closed.")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise queue.Empty
+            driver = self._take_idle(1 if deadline is None else min(1, max(deadline - time.monotonic(), 0.01)))
+        return driver
+
+    def try_acquire(self):
+        """Like acquire(), but return None instead of waiting when no driver is free"""
+        driver = self._take_idle(None)
+        if driver is not None or self._closed:
+            return driver
+        return self._create()
 
-        # No Frills Scraper
+    def release(self, driver, discard=False):
+        with self._lock:
+            if driver not in self._drivers:
+                return  # already quit by discard_owned() or close()
+            if not discard and not self._closed:
+                self._drivers[driver] = None
+                self._idle.put(driver)
+                return
+            del self._drivers[driver]
+            self._created -= 1
+        _quit(driver)
+
+    def discard_owned(self, owner):
+        """Quit every driver borrowed under owner and refuse it new ones; returns how many were quit"""
+        with self._lock:
+            self._abandoned.add(owner)
+            drivers = [driver for driver, borrower in self._drivers.items() if borrower == owner]
+            for driver in drivers:
+                del self._drivers[driver]
+            self._created -= len(drivers)
+        for driver in drivers:
+            _quit(driver)
+        return len(drivers)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        driver = self.acquire(timeout)
+        discard = False
         try:
-            logging.info("Attempting to fetch No Frills flyer data...")
-            scrape_nofrills_flyer(driver, all_flyers_data["nofrills"])
+            yield driver
+        except WebDriverException:
+            discard = True
+            raise
+        finally:
+            self.release(driver, discard)
+
+    def close(self):
+        """Quit every driver, idle or still borrowed by a scraper that outlived its timeout"""
+        with self._lock:
+            self._closed = True
+            drivers = list(self._drivers)
+            self._drivers.clear()
+            self._created = 0
+        for driver in drivers:
+            _quit(driver)
+
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def _fetch_http(fetcher, label, http_scraper):
+    items = []
+    try:
+        http_scraper(fetcher, items)
+    except Exception as e:
+        logging.warning(f"HTTP fetch for {label} failed: {e}")
+        return []
+    return items
+
+
+def _run_scraper(pool, store, label, scraper, paginated, results, fetcher=None,
+                 http_scraper=None, fetch_mode=FETCH_MODE):
+    """Scrape one store into results[store]; returns (seconds, whether the store produced new data)"""
+    items = results[store]
+    start = time.perf_counter()
+    scrape_progress.report('store', store=store, label=label, status='started')
+
+    if http_scraper is not None and fetch_mode != 'selenium':
+        http_items = _fetch_http(fetcher, label, http_scraper)
+        if http_items:
+            logging.info(f"{label}: {len(http_items)} items over HTTP, no browser needed.")
+            items.extend(http_items)
+            return time.perf_counter() - start, True
+        if fetch_mode == 'http':
+            # A flyer is never empty; nothing at all means every page failed
+            logging.warning(f"{label}: HTTP fetch returned nothing in HTTP-only mode; keeping the stored flyer.")
+            return time.perf_counter() - start, False
+        logging.info(f"{label}: HTTP fetch returned nothing, falling back to Selenium.")
+    elif fetch_mode == 'http':
+        logging.info(f"{label}: no HTTP backend, skipping in HTTP-only mode; keeping the stored flyer.")
+        return time.perf_counter() - start, False
+
+    driver = None
+    discard = False
+    # Every driver taken for this store, page drivers included, can be quit by its timeout
+    with pool.owned_by(store):
+        try:
+            # Inside the try, so a browser that fails to start only fails this store
+            driver = pool.acquire()
+            logging.info(f"Attempting to fetch {label} flyer data...")
+            if paginated:
+                scraper(driver, items, driver_pool=pool)
+            else:
+                scraper(driver, items)
         except Exception as e:
-            logging.error(f"Error scraping No Frills: {e}")
+            discard = True
+            logging.error(f"Error scraping {label}: {e}")
+        finally:
+            # A no-op for a driver the timeout watchdog already quit
+            if driver is not None:
+                pool.release(driver, discard)
+    # A failed scrape may have stopped part-way; a partial flyer isn't new data either
+    if discard:
+        return time.perf_counter() - start, False
+    if not items:
+        # Most scrapers log and swallow their own errors, so an empty flyer means the scrape failed
+        logging.warning(f"{label}: scrape returned nothing; keeping the stored flyer.")
+        return time.perf_counter() - start, False
+    return time.perf_counter() - start, True
+
+
+def update_data(concurrency=None, timeouts=None, fetch_mode=None):
+    """
+    Runs all scrapers concurrently on a bounded pool of WebDriver instances and saves the changed store segments.
+
+    Args:
+        concurrency: Maximum number of stores scraped at once.
+        timeouts: Optional {store: seconds} overrides for STORE_TIMEOUTS.
+        fetch_mode: 'auto', 'http' or 'selenium'; defaults to SCRAPER_FETCH_MODE.
+    """
+    concurrency = concurrency or SCRAPER_CONCURRENCY
+    timeouts = {**STORE_TIMEOUTS, **(timeouts or {})}
+    # Recorded fixtures are offline by definition, so never start a browser for them
+    fetch_mode = fetch_mode or ('http' if FIXTURE_DIR else FETCH_MODE)
+
+    logging.info(f"Starting data collection with up to {concurrency} concurrent scrapers...")
+    wait_timings.reset()
+    all_flyers_data = {store: [] for store, _, _, _, _ in SCRAPERS}
+    # Stores skipped, failed or timed out this run; they keep their stored flyer and get no price point
+    stale = set()
+    pool = DriverPool(max(concurrency, SCRAPER_MAX_DRIVERS))
+    fetcher = create_fetcher()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='scraper')
+
+    futures = {}
+    started = {}
+    for store, label, scraper, paginated, http_scraper in SCRAPERS:
+        future = executor.submit(_run_scraper, pool, store, label, scraper, paginated, all_flyers_data,
+                                 fetcher, http_scraper, fetch_mode)
+        futures[future] = (store, label)
+
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                store, label = futures[future]
+                seconds, fresh = future.result()
+                if not fresh:
+                    stale.add(store)
+                logging.info(f"{label} finished in {seconds:.1f}s with {len(all_flyers_data[store])} items.")
+                scrape_progress.report('store', store=store, label=label, status='finished',
+                                       items=len(all_flyers_data[store]), seconds=round(seconds, 1),
+                                       kept_previous=not fresh)
+
+            now = time.monotonic()
+            for future in list(pending):
+                store, label = futures[future]
+                if not future.running():
+                    continue
+                started.setdefault(store, now)
+                if now - started[store] > timeouts.get(store, DEFAULT_STORE_TIMEOUT):
+                    # Quitting its drivers makes the hung scraper's next WebDriver call fail
+                    quit_drivers = pool.discard_owned(store)
+                    logging.error(f"{label} timed out after {timeouts.get(store, DEFAULT_STORE_TIMEOUT)}s; "
+                                  f"quit {quit_drivers} driver(s) and keeping the stored flyer.")
+                    stale.add(store)
+                    scrape_progress.report('store', store=store, label=label, status='timed_out',
+                                           items=len(all_flyers_data[store]))
+                    pending.discard(future)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        # Also quits drivers still borrowed by scrapers that outlived their timeout
+        pool.close()
+        fetcher.close()
+
+    for name, timing in sorted(wait_timings.summary().items()):
+        logging.info(f"Wait {name}: {timing['count']}x, avg {timing['avg_s']}s, max {timing['max_s']}s, "
+                     f"total {timing['total_s']}s, {timing['timeouts']} timeouts")
+
+    scrape_progress.report('saving', stores=len(all_flyers_data))
+    fresh_data = {store: items for store, items in all_flyers_data.items() if store not in stale}
+    try:
+        # Every run adds a daily price point, even for stores whose flyer didn't change
+        if fresh_data:
+            PriceHistory(os.path.join(DATA_FOLDER, HISTORY_FILE)).record(fresh_data)
+    except Exception as e:
+        logging.error(f"Error recording price history: {e}")
 
     try:
-        file_path = os.path.join(DATA_FOLDER, 'flyers.json')
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(all_flyers_data, f, ensure_ascii=False, indent=2)
-        logging.info("Data collection complete. flyers.json has been updated.")
+        storage = create_flyer_storage(DATA_FOLDER)
+        if stale:
+            # Saving drops stores missing from the data, so stale stores are saved with their previous items
+            previous, _ = storage.load()
+            for store in stale:
+                all_flyers_data[store] = previous.get(store, [])
+            logging.info(f"Keeping the stored flyers of {', '.join(sorted(stale))}.")
+        # A run in which every store failed checked nothing
+        diffs = storage.save(all_flyers_data, checked=bool(fresh_data))
+        changed = [store for store, diff in diffs.items() if diff.changed]
+        logging.info(f"Data collection complete. {len(changed)} of {len(diffs)} store segments updated.")
+        return diffs
     except Exception as e:
-        logging.error(f"Error writing to {file_path}: {e}")
+        logging.error(f"Error saving flyer data: {e}")
 
 if __name__ == '__main__':
     update_data()
\ No newline at end of file